@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the vectorized Tonnetz transform against the original
+loop-based implementation, for single chromagrams of different lengths and
+for a batch of chromagrams.
+
+Examples:
+
+    Default lengths:
+        >> ./bench_chroma_to_tonnetz.py
+
+    Custom lengths (in frames):
+        >> ./bench_chroma_to_tonnetz.py -N 1000 100000 -n 5
+"""
+
+import argparse
+import numpy as np
+import time
+
+# Local stuff
+from msaf import utils
+
+
+def loop_chroma_to_tonnetz(C):
+    """Original loop-based implementation of the Tonnetz transform."""
+    N = C.shape[0]
+    T = np.zeros((N, 6))
+
+    r1 = 1      # Fifths
+    r2 = 1      # Minor
+    r3 = 0.5    # Major
+
+    # Generate Transformation matrix
+    phi = np.zeros((6, 12))
+    for i in range(6):
+        for j in range(12):
+            if i % 2 == 0:
+                fun = np.sin
+            else:
+                fun = np.cos
+
+            if i < 2:
+                phi[i, j] = r1 * fun(j * 7 * np.pi / 6.)
+            elif i >= 2 and i < 4:
+                phi[i, j] = r2 * fun(j * 3 * np.pi / 2.)
+            else:
+                phi[i, j] = r3 * fun(j * 2 * np.pi / 3.)
+
+    # Do the transform to tonnetz
+    for i in range(N):
+        for d in range(6):
+            denom = float(C[i, :].sum())
+            if denom == 0:
+                T[i, d] = 0
+            else:
+                T[i, d] = 1 / denom * (phi[d, :] * C[i, :]).sum()
+
+    return T
+
+
+def best_time(fun, n_runs, *args):
+    """Gets the minimum running time of the function, in seconds."""
+    times = []
+    for i in range(n_runs):
+        start_time = time.time()
+        fun(*args)
+        times.append(time.time() - start_time)
+    return np.min(times)
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the vectorized Tonnetz transform",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-N",
+                        action="store",
+                        dest="n_frames",
+                        nargs="+",
+                        type=int,
+                        help="Number of frames of the chromagrams",
+                        default=[500, 5000, 50000])
+    parser.add_argument("-b",
+                        action="store",
+                        dest="batch_size",
+                        type=int,
+                        help="Number of chromagrams in the batch",
+                        default=32)
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of runs",
+                        default=3)
+    args = parser.parse_args()
+
+    print("%-20s %10s %14s %10s %10s" % (
+        "chromagram", "loop (s)", "vectorized (s)", "speedup", "max err"))
+    for N in args.n_frames:
+        C = np.random.random((N, 12))
+        t_loop = best_time(loop_chroma_to_tonnetz, args.n_runs, C)
+        t_vec = best_time(utils.chroma_to_tonnetz, args.n_runs, C)
+        err = np.abs(loop_chroma_to_tonnetz(C) -
+                     utils.chroma_to_tonnetz(C)).max()
+        print("%-20s %10.4f %14.6f %9.1fx %10.1e" % (
+            "%d frames" % N, t_loop, t_vec, t_loop / t_vec, err))
+
+    # Batch of chromagrams, one at a time vs. all at once
+    N = args.n_frames[0]
+    Cs = np.random.random((args.batch_size, N, 12))
+    t_loop = best_time(lambda: [loop_chroma_to_tonnetz(C) for C in Cs],
+                       args.n_runs)
+    t_vec = best_time(utils.chroma_to_tonnetz, args.n_runs, Cs)
+    print("%-20s %10.4f %14.6f %9.1fx" % (
+        "%dx%d frames" % (args.batch_size, N), t_loop, t_vec, t_loop / t_vec))
+
+
+if __name__ == '__main__':
+    main()
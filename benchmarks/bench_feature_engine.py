@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Benchmarks the shared time-frequency feature extraction engine against
+computing every feature with its own transform (as MSAF used to do).
+
+Examples:
+
+    Default tracks (the test fixture and a long track from Sargon):
+        >> ./bench_feature_engine.py
+
+    Custom tracks:
+        >> ./bench_feature_engine.py track1.mp3 track2.mp3 -n 5
+"""
+
+import argparse
+import logging
+import numpy as np
+import os
+import time
+
+import librosa
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import utils
+
+# Default audio files
+root_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+default_files = [os.path.join(root_dir, "tests", "fixtures", "chirp.mp3"),
+                 os.path.join(root_dir, "datasets", "Sargon", "audio",
+                              "01-Sargon-Mindless.mp3")]
+
+
+def separate_transforms(audio, y_harmonic):
+    """Computes the features as MSAF used to, each with its own transform."""
+    S = librosa.feature.melspectrogram(audio,
+                                       sr=msaf.Anal.sample_rate,
+                                       n_fft=msaf.Anal.frame_size,
+                                       hop_length=msaf.Anal.hop_size,
+                                       n_mels=msaf.Anal.n_mels)
+    cqt = librosa.logamplitude(np.abs(
+        librosa.cqt(audio,
+                    sr=msaf.Anal.sample_rate,
+                    hop_length=msaf.Anal.hop_size,
+                    n_bins=msaf.Anal.cqt_bins,
+                    real=False)) ** 2,
+        ref_power=np.max).T
+    log_S = librosa.logamplitude(S, ref_power=np.max)
+    mfcc = librosa.feature.mfcc(S=log_S, n_mfcc=msaf.Anal.mfcc_coeff).T
+    hpcp = librosa.feature.chroma_cqt(y=y_harmonic,
+                                      sr=msaf.Anal.sample_rate,
+                                      hop_length=msaf.Anal.hop_size,
+                                      n_octaves=msaf.Anal.n_octaves,
+                                      fmin=msaf.Anal.f_min).T
+    tonnetz = utils.chroma_to_tonnetz(hpcp)
+    return mfcc, hpcp, tonnetz, cqt
+
+
+def shared_transforms(audio, y_harmonic, chroma_from_cqt):
+    """Computes the features with the shared feature engine."""
+    prev_chroma_from_cqt = msaf.Anal.chroma_from_cqt
+    msaf.Anal.chroma_from_cqt = chroma_from_cqt
+    try:
+        return featextract.compute_features(audio, y_harmonic)
+    finally:
+        msaf.Anal.chroma_from_cqt = prev_chroma_from_cqt
+
+
+def best_time(fun, n_runs, *args):
+    """Gets the minimum running time of the function, in seconds."""
+    times = []
+    for i in range(n_runs):
+        start_time = time.time()
+        fun(*args)
+        times.append(time.time() - start_time)
+    return np.min(times)
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the shared feature extraction engine",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("audio_files",
+                        nargs="*",
+                        help="Audio files to benchmark",
+                        default=default_files)
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of runs per track",
+                        default=3)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    print("%-30s %8s %12s %10s %14s %10s" % (
+        "track", "dur (s)", "separate (s)", "shared (s)", "shared-cqt (s)",
+        "speedup"))
+    for audio_file in args.audio_files:
+        audio, sr = librosa.load(audio_file, sr=msaf.Anal.sample_rate)
+        y_harmonic, y_percussive = librosa.effects.hpss(audio)
+        t_sep = best_time(separate_transforms, args.n_runs, audio, y_harmonic)
+        t_shared = best_time(shared_transforms, args.n_runs, audio,
+                             y_harmonic, False)
+        t_shared_cqt = best_time(shared_transforms, args.n_runs, audio,
+                                 y_harmonic, True)
+        print("%-30s %8.1f %12.3f %10.3f %14.3f %9.2fx" % (
+            os.path.basename(audio_file)[:30], len(audio) / float(sr), t_sep,
+            t_shared, t_shared_cqt, t_sep / t_shared_cqt))
+
+
+if __name__ == '__main__':
+    main()
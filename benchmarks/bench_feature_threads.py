@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmarks the latency of the feature extraction of a single track when
+computing the independent stages of the feature engine in parallel threads.
+
+Examples:
+
+    Default tracks (the test fixture and a long track from Sargon):
+        >> ./bench_feature_threads.py
+
+    Custom tracks and number of threads:
+        >> ./bench_feature_threads.py track1.mp3 track2.mp3 -t 1 2 4 8 -n 5
+"""
+
+import argparse
+import logging
+import numpy as np
+import os
+import time
+
+import librosa
+
+# Local stuff
+import msaf
+from msaf import featextract
+
+# Default audio files
+root_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+default_files = [os.path.join(root_dir, "tests", "fixtures", "chirp.mp3"),
+                 os.path.join(root_dir, "datasets", "Sargon", "audio",
+                              "01-Sargon-Mindless.mp3")]
+
+
+def extract(audio, n_threads):
+    """Computes all the features and the beats of the given signal."""
+    engine = featextract.FeatureEngine(audio)
+    engine.compute(msaf.AVAILABLE_FEATS + ["beats"], n_threads)
+
+
+def best_time(fun, n_runs, *args):
+    """Gets the minimum running time of the function, in seconds."""
+    times = []
+    for i in range(n_runs):
+        start_time = time.time()
+        fun(*args)
+        times.append(time.time() - start_time)
+    return np.min(times)
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the thread-parallel feature extraction",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("audio_files",
+                        nargs="*",
+                        help="Audio files to benchmark",
+                        default=default_files)
+    parser.add_argument("-t",
+                        action="store",
+                        dest="n_threads",
+                        type=int,
+                        nargs="+",
+                        help="Numbers of threads to benchmark",
+                        default=[1, 2, 4])
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of runs per track",
+                        default=3)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    print("%-30s %8s %8s %10s %9s" % (
+        "track", "dur (s)", "threads", "time (s)", "speedup"))
+    for audio_file in args.audio_files:
+        audio, sr = librosa.load(audio_file, sr=msaf.Anal.sample_rate)
+        t_serial = None
+        for n_threads in args.n_threads:
+            t = best_time(extract, args.n_runs, audio, n_threads)
+            if t_serial is None:
+                t_serial = t
+            print("%-30s %8.1f %8d %10.3f %8.2fx" % (
+                os.path.basename(audio_file)[:30], len(audio) / float(sr),
+                n_threads, t, t_serial / t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Benchmarks the storages of the features (`msaf.Dataset.features_storage`)
+against the legacy JSON files: their footprint on disk, their read throughput,
+and the accuracy of the algorithms run on the features read from them.
+
+The features of the dataset are copied into a temporary dataset for each
+storage, so the original ones are left untouched.
+
+Examples:
+
+    Sargon dataset (the features are computed if needed):
+        >> ./bench_features_storage.py ../datasets/Sargon
+
+    Custom algorithms:
+        >> ./bench_features_storage.py my_dataset -b sf foote -n 5
+"""
+
+import argparse
+import json
+import logging
+import mir_eval
+import numpy as np
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import input_output as io
+from msaf import run
+from msaf import utils
+
+# Storages to benchmark (JSON for the legacy files)
+STORAGES = ["json"] + io.FEATURES_STORAGES
+
+
+def write_storage(file_structs, out_dir, storage):
+    """Writes the features of the dataset into a temporary dataset with the
+    given storage, and returns the paths to its (fake) audio files."""
+    prev_storage = msaf.Dataset.features_storage
+    msaf.Dataset.features_storage = "float64" if storage == "json" \
+        else storage
+    try:
+        features_dir = os.path.join(out_dir, msaf.Dataset.features_dir)
+        utils.ensure_dir(features_dir)
+        audio_files = []
+        for file_struct in file_structs:
+            feats = io.read_features_file(file_struct.features_file)
+            for section in io.FEATURES_SECTIONS:
+                if section in feats:
+                    feats[section] = dict(
+                        (name, np.array(values))
+                        for name, values in feats[section].items())
+            name = os.path.basename(file_struct.audio_file)
+            features_file = os.path.join(features_dir,
+                                         os.path.splitext(name)[0])
+            if storage == "json":
+                write_json(features_file + msaf.Dataset.legacy_features_ext,
+                           feats)
+            else:
+                io.write_features_store(
+                    features_file + msaf.Dataset.features_ext, feats)
+            audio_files.append(os.path.join(out_dir, msaf.Dataset.audio_dir,
+                                            name))
+        return audio_files
+    finally:
+        msaf.Dataset.features_storage = prev_storage
+
+
+def write_json(json_file, feats):
+    """Writes the features as a legacy JSON file."""
+    json_feats = {}
+    for key, value in feats.items():
+        if key in ["beats"] + io.FEATURES_SECTIONS:
+            value = dict((name, np.asarray(values).tolist())
+                         for name, values in value.items())
+        json_feats[key] = value
+    with open(json_file, "w") as f:
+        json.dump(json_feats, f)
+
+
+def read_all(audio_files):
+    """Reads all the features of the given tracks."""
+    for audio_file in audio_files:
+        for framesync in [False, True]:
+            features = io.get_features(audio_file, framesync=framesync)
+            for feat_name in msaf.AVAILABLE_FEATS:
+                if feat_name in features:
+                    np.sum(features[feat_name])
+
+
+def best_time(fun, n_runs, *args):
+    """Gets the minimum running time of the function, in seconds."""
+    times = []
+    for i in range(n_runs):
+        start_time = time.time()
+        fun(*args)
+        times.append(time.time() - start_time)
+    return np.min(times)
+
+
+def get_size(path):
+    """Gets the size of a file or directory, in bytes."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, dirs, names in os.walk(path) for name in names)
+
+
+def evaluate(ref_times, est_times):
+    """Computes the hit rates at 3 and 0.5 seconds."""
+    ref_inter = utils.times_to_intervals(ref_times)
+    est_inter = utils.times_to_intervals(est_times)
+    return [mir_eval.segment.detection(ref_inter, est_inter, window=window,
+                                       trim=False)[2]
+            for window in [3, .5]]
+
+
+def segment(audio_file, boundaries_id, feature):
+    """Runs a boundary algorithm on the stored features of a track."""
+    np.random.seed(123)
+    random.seed(0)
+    config = io.get_configuration(feature, False, False, boundaries_id, None)
+    config["hier"] = False
+    return run.run_algorithms(audio_file, boundaries_id, None, config)[0]
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the storages of the features",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("ds_path",
+                        action="store",
+                        help="Path to the dataset")
+    parser.add_argument("-b",
+                        action="store",
+                        dest="boundaries_ids",
+                        nargs="+",
+                        help="Boundary algorithms",
+                        default=["sf", "foote", "cnmf"])
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of read runs per storage",
+                        default=3)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    # Compute the features if needed
+    file_structs = io.get_dataset_files(args.ds_path)
+    for file_struct in file_structs:
+        utils.ensure_dir(os.path.dirname(file_struct.features_file))
+        featextract.compute_all_features(
+            file_struct, feat_names=msaf.AVAILABLE_FEATS)
+    ref_times = [io.read_references(file_struct.audio_file)
+                 for file_struct in file_structs]
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print("%-8s %10s %8s %10s %-10s %8s %8s %9s" % (
+            "storage", "size (KB)", "ratio", "read (s)", "algorithm", "HR3F",
+            "HR.5F", "agree.5F"))
+        json_size = None
+        base_times = {}
+        for storage in STORAGES:
+            out_dir = os.path.join(tmp_dir, storage)
+            audio_files = write_storage(file_structs, out_dir, storage)
+            size = get_size(os.path.join(out_dir, msaf.Dataset.features_dir))
+            if json_size is None:
+                json_size = size
+            t = best_time(read_all, args.n_runs, audio_files)
+            for boundaries_id in args.boundaries_ids:
+                res, agreement = [], []
+                for i, audio_file in enumerate(audio_files):
+                    est_times = segment(audio_file, boundaries_id,
+                                        args.feature)
+                    if ref_times[i]:
+                        res.append(evaluate(ref_times[i][0], est_times))
+                    key = (boundaries_id, i)
+                    if key not in base_times:
+                        base_times[key] = est_times
+                    agreement.append(evaluate(base_times[key], est_times)[1])
+                res = np.mean(res, axis=0) if res else [np.nan] * 2
+                print("%-8s %10.1f %7.1fx %10.3f %-10s %8.3f %8.3f %9.3f" % (
+                    storage, size / 1024., json_size / float(size), t,
+                    boundaries_id, res[0], res[1], np.mean(agreement)))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
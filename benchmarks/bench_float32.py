@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Reports the accuracy regression of running the algorithms in float32
+(`msaf.Anal.dtype = "float32"`) instead of float64: the evaluation metrics
+against the references of the dataset with both precisions, and the agreement
+between the boundaries estimated with each of them.
+
+Examples:
+
+    Sargon dataset (the features are computed if needed):
+        >> ./bench_float32.py ../datasets/Sargon
+
+    Custom algorithms and framesync features:
+        >> ./bench_float32.py my_dataset -b sf foote -l fmc2d -fs
+"""
+
+import argparse
+import jams
+import logging
+import mir_eval
+import numpy as np
+import os
+import random
+import time
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import input_output as io
+from msaf import run
+from msaf import utils
+
+
+def read_references(file_struct):
+    """Reads the reference intervals and labels (`None` if not found)."""
+    if not os.path.isfile(file_struct.ref_file):
+        return None, None
+    jam = jams.load(file_struct.ref_file, validate=False)
+    ann = jam.search(namespace="segment_.*")[0]
+    return ann.data.to_interval_values()
+
+
+def estimate(file_struct, boundaries_id, labels_id, args, dtype):
+    """Runs the algorithms on a track with the given precision (with the same
+    random initializations for both precisions)."""
+    np.random.seed(0)
+    random.seed(0)
+    prev_dtype = msaf.Anal.dtype
+    msaf.Anal.dtype = dtype
+    try:
+        config = io.get_configuration(args.feature, False, args.framesync,
+                                      boundaries_id, labels_id)
+        config["features"] = io.get_features(file_struct.audio_file, False,
+                                             args.framesync)
+        config["hier"] = False
+        start_time = time.time()
+        est_times, est_labels = run.run_algorithms(
+            file_struct.audio_file, boundaries_id, labels_id, config)
+        return est_times, est_labels, time.time() - start_time
+    finally:
+        msaf.Anal.dtype = prev_dtype
+
+
+def evaluate(ref_inter, ref_labels, est_times, est_labels):
+    """Computes the hit rates and (if labels are estimated) the pairwise
+    frame clustering F-measures."""
+    est_inter = utils.times_to_intervals(est_times)
+    res = [mir_eval.segment.detection(ref_inter, est_inter, window=3,
+                                      trim=False)[2],
+           mir_eval.segment.detection(ref_inter, est_inter, window=.5,
+                                      trim=False)[2]]
+    if est_labels is not None and np.any(np.asarray(est_labels) != -1):
+        ref_inter, ref_labels = mir_eval.util.adjust_intervals(
+            ref_inter, ref_labels, t_min=0)
+        est_inter, est_labels = mir_eval.util.adjust_intervals(
+            est_inter, est_labels, t_min=0, t_max=ref_inter.max())
+        res.append(mir_eval.segment.pairwise(ref_inter, ref_labels,
+                                             est_inter, est_labels)[2])
+    else:
+        res.append(np.nan)
+    return res
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Reports the accuracy of the algorithms in float32",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("ds_path",
+                        action="store",
+                        help="Path to the dataset")
+    parser.add_argument("-b",
+                        action="store",
+                        dest="boundaries_ids",
+                        nargs="+",
+                        help="Boundary algorithms",
+                        default=["sf", "foote", "cnmf", "scluster"])
+    parser.add_argument("-l",
+                        action="store",
+                        dest="labels_ids",
+                        nargs="+",
+                        help="Label algorithms ('None' for no labels)",
+                        default=["None", "scluster"])
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    parser.add_argument("-fs",
+                        action="store_true",
+                        dest="framesync",
+                        help="Use frame-synchronous features",
+                        default=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    # Compute the features (in float64) if needed
+    file_structs = io.get_dataset_files(args.ds_path)
+    for file_struct in file_structs:
+        utils.ensure_dir(os.path.dirname(file_struct.features_file))
+        featextract.compute_all_features(
+            file_struct, feat_names=msaf.AVAILABLE_FEATS)
+
+    print("%-20s %8s %8s %8s %8s %8s %8s %9s %8s" % (
+        "algorithms", "HR3F-64", "HR3F-32", "HR.5F-64", "HR.5F-32",
+        "PWF-64", "PWF-32", "agree.5F", "speedup"))
+    for boundaries_id in args.boundaries_ids:
+        for labels_id in args.labels_ids:
+            labels_id = None if labels_id == "None" else labels_id
+            res64, res32, agreement = [], [], []
+            t64, t32 = 0, 0
+            for file_struct in file_structs:
+                times64, labels64, t = estimate(
+                    file_struct, boundaries_id, labels_id, args, "float64")
+                t64 += t
+                times32, labels32, t = estimate(
+                    file_struct, boundaries_id, labels_id, args, "float32")
+                t32 += t
+                agreement.append(mir_eval.segment.detection(
+                    utils.times_to_intervals(times64),
+                    utils.times_to_intervals(times32), window=.5,
+                    trim=False)[2])
+                ref_inter, ref_labels = read_references(file_struct)
+                if ref_inter is not None:
+                    res64.append(evaluate(ref_inter, ref_labels, times64,
+                                          labels64))
+                    res32.append(evaluate(ref_inter, ref_labels, times32,
+                                          labels32))
+            res64 = np.mean(res64, axis=0) if res64 else [np.nan] * 3
+            res32 = np.mean(res32, axis=0) if res32 else [np.nan] * 3
+            print("%-20s %8.3f %8.3f %8.3f %8.3f %8.3f %8.3f %9.3f %7.2fx" % (
+                "%s+%s" % (boundaries_id, labels_id), res64[0], res32[0],
+                res64[1], res32[1], res64[2], res32[2], np.mean(agreement),
+                t64 / t32))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Benchmarks the time saved per track by keeping the harmonic-percussive
+separation in the spectral domain (`msaf.Anal.hpss_mode = "spectral"`),
+instead of resynthesizing the harmonic and percussive signals to analyze them
+again.
+
+Examples:
+
+    Default tracks (the test fixture and a long track from Sargon):
+        >> ./bench_hpss_mode.py
+
+    Custom tracks:
+        >> ./bench_hpss_mode.py track1.mp3 track2.mp3 -n 5
+"""
+
+import argparse
+import logging
+import numpy as np
+import os
+import time
+
+import librosa
+
+# Local stuff
+import msaf
+from msaf import featextract
+
+# Default audio files
+root_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+default_files = [os.path.join(root_dir, "tests", "fixtures", "chirp.mp3"),
+                 os.path.join(root_dir, "datasets", "Sargon", "audio",
+                              "01-Sargon-Mindless.mp3")]
+
+
+def extract(audio, hpss_mode):
+    """Computes all the features and the beats of the given signal."""
+    prev_hpss_mode = msaf.Anal.hpss_mode
+    msaf.Anal.hpss_mode = hpss_mode
+    try:
+        engine = featextract.FeatureEngine(audio)
+        engine.compute(msaf.AVAILABLE_FEATS + ["beats"])
+    finally:
+        msaf.Anal.hpss_mode = prev_hpss_mode
+
+
+def best_time(fun, n_runs, *args):
+    """Gets the minimum running time of the function, in seconds."""
+    times = []
+    for i in range(n_runs):
+        start_time = time.time()
+        fun(*args)
+        times.append(time.time() - start_time)
+    return np.min(times)
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the spectral harmonic-percussive "
+        "separation",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("audio_files",
+                        nargs="*",
+                        help="Audio files to benchmark",
+                        default=default_files)
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of runs per track",
+                        default=3)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    print("%-30s %8s %10s %12s %10s %9s" % (
+        "track", "dur (s)", "signal (s)", "spectral (s)", "saved (s)",
+        "speedup"))
+    for audio_file in args.audio_files:
+        audio, sr = librosa.load(audio_file, sr=msaf.Anal.sample_rate)
+        t_signal = best_time(extract, args.n_runs, audio, "signal")
+        t_spectral = best_time(extract, args.n_runs, audio, "spectral")
+        print("%-30s %8.1f %10.3f %12.3f %10.3f %8.2fx" % (
+            os.path.basename(audio_file)[:30], len(audio) / float(sr),
+            t_signal, t_spectral, t_signal - t_spectral,
+            t_signal / t_spectral))
+
+if __name__ == '__main__':
+    main()
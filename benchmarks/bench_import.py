@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Benchmarks the startup time of MSAF: the time to import it in a new
+interpreter, and to access the submodules and algorithms that are imported
+lazily. It can be used to guard against regressions, since it exits with an
+error if `import msaf` takes longer than `--max-time`.
+
+Examples:
+
+    Default statements:
+        >> ./bench_import.py
+
+    Fail if `import msaf` takes longer than 50 ms:
+        >> ./bench_import.py --max-time 0.05
+
+    Also list the slowest modules imported by each statement:
+        >> ./bench_import.py -t 5
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# Statements to time, the first one is the one guarded by --max-time
+STATEMENTS = [
+    "import msaf",
+    "import msaf; msaf.io",
+    "import msaf; msaf.run",
+    "import msaf; msaf.run.get_boundaries_module('foote')",
+    "import msaf; msaf.io.get_all_boundary_algorithms()",
+    "import msaf; msaf.eval"
+]
+
+
+def time_statement(statement):
+    """Times the statement in a new interpreter, in seconds (without the
+    startup of the interpreter itself)."""
+    code = "import time; start_time = time.time(); %s; " \
+        "print(time.time() - start_time)" % statement
+    out = subprocess.check_output([sys.executable, "-W", "ignore", "-c",
+                                   code])
+    return float(out.decode().strip().split("\n")[-1])
+
+
+def best_time(statement, n_runs):
+    """Gets the minimum time of the statement, in seconds."""
+    return min(time_statement(statement) for i in range(n_runs))
+
+
+def import_times(statement):
+    """Gets the cumulative import time (in seconds) of the top-level modules
+    imported by the statement, using `-X importtime`."""
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", "-X",
+                             "importtime", "-c", statement],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    err = proc.communicate()[1].decode()
+    modules = {}
+    for line in err.split("\n"):
+        match = re.match(r"import time:\s*\d+ \|\s*(\d+) \| (\s*)(\S+)",
+                         line)
+        if match and len(match.group(2)) <= 1:
+            modules[match.group(3)] = int(match.group(1)) / 1e6
+    return modules
+
+
+def slowest_modules(statement, n_modules):
+    """Gets the modules with the largest cumulative import time (in
+    seconds) imported by the statement, besides the ones imported at the
+    startup of the interpreter."""
+    startup_modules = import_times("pass")
+    modules = [(t, module) for module, t in import_times(statement).items()
+               if module not in startup_modules]
+    return sorted(modules, reverse=True)[:n_modules]
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the startup time of MSAF",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-s",
+                        action="store",
+                        dest="statements",
+                        nargs="+",
+                        help="Statements to time",
+                        default=STATEMENTS)
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_runs",
+                        type=int,
+                        help="Number of runs per statement",
+                        default=5)
+    parser.add_argument("-t",
+                        action="store",
+                        dest="n_modules",
+                        type=int,
+                        help="Number of slowest modules to list per "
+                        "statement (Python >= 3.7)",
+                        default=0)
+    parser.add_argument("--max-time",
+                        action="store",
+                        dest="max_time",
+                        type=float,
+                        help="Maximum time of the first statement, in "
+                        "seconds (no limit if not set)",
+                        default=None)
+    args = parser.parse_args()
+
+    print("%10s  %s" % ("time (s)", "statement"))
+    times = []
+    for statement in args.statements:
+        times.append(best_time(statement, args.n_runs))
+        print("%10.3f  %s" % (times[-1], statement))
+        if args.n_modules > 0:
+            for t, module in slowest_modules(statement, args.n_modules):
+                print("%10s  %8.3f  %s" % ("", t, module))
+
+    if args.max_time is not None and times[0] > args.max_time:
+        sys.exit("%s took %.3f seconds (maximum: %.3f)" % (
+            args.statements[0], times[0], args.max_time))
+
+if __name__ == '__main__':
+    main()
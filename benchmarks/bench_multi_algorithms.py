@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmarks running several algorithms on a dataset in a single pass
+(`msaf.run.process_algorithms`), which reads the features and updates the
+estimations file of each track only once, against calling `msaf.run.process`
+once per algorithm.
+
+The dataset is copied into a temporary directory for each mode, so its
+estimations are left untouched.
+
+Examples:
+
+    Sargon dataset (the features are computed if needed):
+        >> ./bench_multi_algorithms.py ../datasets/Sargon
+
+    Custom combinations of algorithms (boundaries:labels), in parallel:
+        >> ./bench_multi_algorithms.py my_dataset -a sf foote:fmc2d -j 4
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import input_output as io
+from msaf import run
+from msaf import utils
+
+
+def parse_algorithms(algorithms):
+    """Parses combinations of algorithms like "foote:fmc2d" into tuples of
+    (boundaries_id, labels_id, config)."""
+    combinations = []
+    for algorithm in algorithms:
+        boundaries_id, _, labels_id = algorithm.partition(":")
+        combinations.append((boundaries_id, labels_id or None, None))
+    return combinations
+
+
+def copy_dataset(ds_path, out_dir):
+    """Copies the audio, features and references of a dataset."""
+    for dir_name in [msaf.Dataset.audio_dir, msaf.Dataset.features_dir,
+                     msaf.Dataset.references_dir]:
+        if os.path.isdir(os.path.join(ds_path, dir_name)):
+            shutil.copytree(os.path.join(ds_path, dir_name),
+                            os.path.join(out_dir, dir_name))
+
+
+def run_separately(ds_path, algorithms, args):
+    """Runs `run.process` once per combination of algorithms."""
+    for boundaries_id, labels_id, _ in algorithms:
+        run.process(ds_path, feature=args.feature, framesync=args.framesync,
+                    boundaries_id=boundaries_id, labels_id=labels_id,
+                    n_jobs=args.n_jobs)
+
+
+def run_single_pass(ds_path, algorithms, args):
+    """Runs all the combinations of algorithms in a single pass."""
+    run.process_algorithms(ds_path, algorithms, feature=args.feature,
+                           framesync=args.framesync, n_jobs=args.n_jobs)
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks running several algorithms in a single pass",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("ds_path",
+                        action="store",
+                        help="Path to the dataset")
+    parser.add_argument("-a",
+                        action="store",
+                        dest="algorithms",
+                        nargs="+",
+                        help="Combinations of algorithms (boundaries:labels)",
+                        default=["sf", "foote", "olda", "cnmf", "scluster"])
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    parser.add_argument("-fs",
+                        action="store_true",
+                        dest="framesync",
+                        help="Use frame-synchronous features",
+                        default=False)
+    parser.add_argument("-j",
+                        action="store",
+                        dest="n_jobs",
+                        type=int,
+                        help="Number of processes",
+                        default=1)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+    algorithms = parse_algorithms(args.algorithms)
+
+    # Compute the features if needed
+    file_structs = io.get_dataset_files(args.ds_path)
+    for file_struct in file_structs:
+        utils.ensure_dir(os.path.dirname(file_struct.features_file))
+        featextract.compute_all_features(
+            file_struct, feat_names=msaf.AVAILABLE_FEATS)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print("%-12s %10s %8s %12s %8s" % (
+            "mode", "time (s)", "tracks", "algos/s", "speedup"))
+        base_time = None
+        for mode, fun in [("separate", run_separately),
+                          ("single pass", run_single_pass)]:
+            out_dir = os.path.join(tmp_dir, mode.replace(" ", "_"))
+            copy_dataset(args.ds_path, out_dir)
+            start_time = time.time()
+            fun(out_dir, algorithms, args)
+            t = time.time() - start_time
+            if base_time is None:
+                base_time = t
+            print("%-12s %10.3f %8d %12.2f %7.2fx" % (
+                mode, t, len(file_structs),
+                len(file_structs) * len(algorithms) / t, base_time / t))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Benchmarks each resampling strategy of the feature extraction
+(`msaf.Anal.resample_type`): the throughput of resampling and extracting the
+features of the tracks of a dataset, and the accuracy of the segmentations
+obtained from these features.
+
+Examples:
+
+    Sargon dataset:
+        >> ./bench_resample.py ../datasets/Sargon
+
+    Custom algorithms and strategies:
+        >> ./bench_resample.py my_dataset -b sf foote -r kaiser_best polyphase
+"""
+
+import argparse
+import logging
+import mir_eval
+import numpy as np
+import os
+import random
+import time
+
+import librosa
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import input_output as io
+from msaf import run
+from msaf import utils
+
+
+def extract(audio, sr, resample_type):
+    """Resamples the signal and computes all the features with the given
+    resampling strategy."""
+    prev_resample_type = msaf.Anal.resample_type
+    msaf.Anal.resample_type = resample_type
+    try:
+        start_time = time.time()
+        features = featextract.compute_features_for_signal(audio, sr)
+        return features, time.time() - start_time
+    finally:
+        msaf.Anal.resample_type = prev_resample_type
+
+
+def evaluate(ref_times, est_times):
+    """Computes the hit rates at 3 and 0.5 seconds."""
+    ref_inter = utils.times_to_intervals(ref_times)
+    est_inter = utils.times_to_intervals(est_times)
+    return [mir_eval.segment.detection(ref_inter, est_inter, window=window,
+                                       trim=False)[2]
+            for window in [3, .5]]
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the resampling strategies",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("ds_path",
+                        action="store",
+                        help="Path to the dataset")
+    parser.add_argument("-r",
+                        action="store",
+                        dest="resample_types",
+                        nargs="+",
+                        help="Resampling strategies",
+                        default=["kaiser_best", "kaiser_fast", "polyphase"])
+    parser.add_argument("-b",
+                        action="store",
+                        dest="boundaries_ids",
+                        nargs="+",
+                        help="Boundary algorithms",
+                        default=["sf", "foote", "cnmf"])
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    # Decode the tracks once, at their native sample rate
+    tracks = []
+    for file_struct in io.get_dataset_files(args.ds_path):
+        audio, sr = librosa.load(file_struct.audio_file, sr=None)
+        references = io.read_references(file_struct.audio_file)
+        tracks.append((audio, sr, references[0] if references else None))
+    total_dur = np.sum([len(audio) / float(sr) for audio, sr, _ in tracks])
+
+    print("%-12s %10s %11s %-10s %8s %8s %9s" % (
+        "resampler", "time (s)", "x realtime", "algorithm", "HR3F",
+        "HR.5F", "agree.5F"))
+    best_times = {}
+    for resample_type in args.resample_types:
+        # Extraction throughput
+        all_features = []
+        t = 0
+        for audio, sr, _ in tracks:
+            features, t_track = extract(audio, sr, resample_type)
+            all_features.append(features)
+            t += t_track
+
+        # Downstream segmentation accuracy
+        for boundaries_id in args.boundaries_ids:
+            res, agreement = [], []
+            for (audio, sr, ref_times), features in zip(tracks, all_features):
+                random.seed(0)
+                est_times = run.process_signal(
+                    audio, sr, feature=args.feature,
+                    boundaries_id=boundaries_id, labels_id=None,
+                    features=features)[0]
+                if ref_times is not None:
+                    res.append(evaluate(ref_times, est_times))
+
+                # Agreement with the first (reference) strategy
+                key = (boundaries_id, len(agreement))
+                if key not in best_times:
+                    best_times[key] = est_times
+                agreement.append(evaluate(best_times[key], est_times)[1])
+            res = np.mean(res, axis=0) if res else [np.nan] * 2
+            print("%-12s %10.3f %10.1fx %-10s %8.3f %8.3f %9.3f" % (
+                resample_type, t, total_dur / t, boundaries_id, res[0],
+                res[1], np.mean(agreement)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+"""
+Load test of the segmentation server (see `msaf.server`): it sends
+segmentation requests with several concurrent clients and reports the
+percentiles of their latency and the throughput of the server.
+
+The latency is reported for:
+
+    - cold: segmenting each track in a new interpreter (i.e., the cost of
+      running MSAF once per track, without a server).
+    - first: the first request of each track to the server (its features
+      are computed by the warm processes, or read from its features file if
+      it is a track of an MSAF dataset).
+    - warm: the rest of requests (their features are cached by the server).
+
+If the server is started by the benchmark, it also reports the size of the
+cached features of each track and the time to pickle and unpickle them,
+which is paid by each warm request to send them to the processes of the
+pool.
+
+Examples:
+
+    Start a server with 4 processes and send it 100 requests:
+        >> ./bench_server.py ../datasets/Sargon/audio/*.mp3 -n 100 -j 4
+
+    Upload the samples instead of the paths, with 8 clients:
+        >> ./bench_server.py track.wav --pcm -c 8
+
+    Test a running server (e.g., `../examples/run_server.py -p 8000`):
+        >> ./bench_server.py track.wav --url http://localhost:8000
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import numpy as np
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+# Local stuff
+import msaf
+from msaf import input_output as io
+from msaf import server
+
+
+def make_request(url, audio_file, params, samples=None):
+    """Makes the segmentation request of a track, with its path or with its
+    samples (a tuple with the samples and their sampling rate)."""
+    if samples is None:
+        body = dict(params, path=os.path.abspath(audio_file))
+        return Request(url + "/segment", json.dumps(body).encode("utf-8"),
+                       {"Content-Type": "application/json"})
+    audio, sr = samples
+    query = urlencode(dict(params, sr=sr, labels_id=params["labels_id"] or
+                           "none"))
+    return Request(url + "/segment?" + query, audio.tobytes(),
+                   {"Content-Type": "application/octet-stream"})
+
+
+def send(request):
+    """Sends a request, and returns its latency, in seconds."""
+    start_time = time.time()
+    urlopen(request).read()
+    return time.time() - start_time
+
+
+def run_clients(requests, n_clients):
+    """Sends the requests with concurrent clients, and returns their
+    latencies and the elapsed time of the whole run, in seconds."""
+    latencies = []
+    pending = iter(requests)
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            latency = send(request)
+            with lock:
+                latencies.append(latency)
+
+    start_time = time.time()
+    threads = [threading.Thread(target=client) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.time() - start_time
+
+
+def segment_cold(audio_file, params):
+    """Segments a track in a new interpreter, and returns the elapsed time,
+    in seconds."""
+    code = "import msaf; audio, sr = msaf.io.load_audio(%r, None); " \
+        "msaf.process_signal(audio, sr, feature=%r, boundaries_id=%r, " \
+        "labels_id=%r)" % (audio_file, params["feature"],
+                           params["boundaries_id"], params["labels_id"])
+    start_time = time.time()
+    subprocess.check_call([sys.executable, "-W", "ignore", "-c", code])
+    return time.time() - start_time
+
+
+def measure_ipc(features):
+    """Measures the cost of sending the features of the tracks to a process
+    (i.e., pickling and unpickling them), and returns their mean size, in
+    bytes, and time, in seconds."""
+    sizes, times = [], []
+    for track_features in features:
+        start_time = time.time()
+        data = pickle.dumps(track_features, pickle.HIGHEST_PROTOCOL)
+        pickle.loads(data)
+        times.append(time.time() - start_time)
+        sizes.append(len(data))
+    return np.mean(sizes), np.mean(times)
+
+
+def print_row(mode, latencies, n_clients, wall_time):
+    """Prints the latency percentiles and throughput of a run."""
+    print("%-6s %9d %8d %9.3f %9.3f %9.3f %8.2f" % (
+        mode, len(latencies), n_clients, np.percentile(latencies, 50),
+        np.percentile(latencies, 99), np.mean(latencies),
+        len(latencies) / wall_time))
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Load test of the segmentation server",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("audio_files",
+                        action="store",
+                        nargs="+",
+                        help="Audio files to segment")
+    parser.add_argument("-b",
+                        action="store",
+                        dest="boundaries_id",
+                        help="Boundary algorithm",
+                        default="sf")
+    parser.add_argument("-l",
+                        action="store",
+                        dest="labels_id",
+                        help="Label algorithm",
+                        default=None)
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    parser.add_argument("-n",
+                        action="store",
+                        dest="n_requests",
+                        type=int,
+                        help="Number of warm requests",
+                        default=50)
+    parser.add_argument("-c",
+                        action="store",
+                        dest="n_clients",
+                        type=int,
+                        help="Number of concurrent clients",
+                        default=4)
+    parser.add_argument("-j",
+                        action="store",
+                        dest="n_jobs",
+                        type=int,
+                        help="Number of processes of the server (if it is "
+                        "started by the benchmark)",
+                        default=4)
+    parser.add_argument("--url",
+                        action="store",
+                        help="URL of a running server (a new one is started "
+                        "if not set)",
+                        default=None)
+    parser.add_argument("--pcm",
+                        action="store_true",
+                        help="Upload the samples of the tracks instead of "
+                        "their paths",
+                        default=False)
+    parser.add_argument("--cold",
+                        action="store",
+                        type=int,
+                        help="Number of tracks to segment in a new "
+                        "interpreter",
+                        default=1)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    params = {"boundaries_id": args.boundaries_id,
+              "labels_id": args.labels_id,
+              "feature": args.feature}
+    samples = [None] * len(args.audio_files)
+    if args.pcm:
+        samples = [io.load_audio(audio_file, sr=msaf.Anal.sample_rate)
+                   for audio_file in args.audio_files]
+
+    s = None
+    url = args.url
+    if url is None:
+        s = server.SegmentationServer(
+            ("localhost", 0), args.n_jobs,
+            [args.boundaries_id] + [args.labels_id] * bool(args.labels_id),
+            root_dir=os.path.commonpath([
+                os.path.dirname(os.path.abspath(audio_file))
+                for audio_file in args.audio_files]))
+        thread = threading.Thread(target=s.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = "http://localhost:%d" % s.server_address[1]
+
+    try:
+        print("%-6s %9s %8s %9s %9s %9s %8s" % (
+            "mode", "requests", "clients", "p50 (s)", "p99 (s)", "mean (s)",
+            "req/s"))
+        if args.cold > 0:
+            start_time = time.time()
+            latencies = [segment_cold(audio_file, params) for audio_file in
+                         itertools.islice(itertools.cycle(args.audio_files),
+                                          args.cold)]
+            print_row("cold", latencies, 1, time.time() - start_time)
+
+        requests = [make_request(url, audio_file, params, track_samples)
+                    for audio_file, track_samples in
+                    zip(args.audio_files, samples)]
+        latencies, wall_time = run_clients(requests, args.n_clients)
+        print_row("first", latencies, args.n_clients, wall_time)
+
+        latencies, wall_time = run_clients(
+            itertools.islice(itertools.cycle(requests), args.n_requests),
+            args.n_clients)
+        print_row("warm", latencies, args.n_clients, wall_time)
+
+        if s is not None and len(s.features) > 0:
+            size, ipc_time = measure_ipc(list(s.features.values()))
+            print("\nFeatures sent per warm request: %.2f MB, pickled and "
+                  "unpickled in %.4f s" % (size / 1024. ** 2, ipc_time))
+    finally:
+        if s is not None:
+            s.shutdown()
+            s.server_close()
+
+if __name__ == '__main__':
+    main()
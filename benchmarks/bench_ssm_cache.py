@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmarks the cache of self-similarity matrices (`msaf.similarity`) when
+running several combinations of algorithms on the tracks of a dataset: the
+time to run all of them with the cache disabled and enabled, and whether
+they estimate the same boundaries.
+
+Examples:
+
+    Sargon dataset (the features are computed if needed):
+        >> ./bench_ssm_cache.py ../datasets/Sargon
+
+    Custom combinations of algorithms (boundaries:labels):
+        >> ./bench_ssm_cache.py my_dataset -a foote foote:fmc2d foote:cnmf
+"""
+
+import argparse
+import logging
+import numpy as np
+import os
+import random
+import time
+
+# Local stuff
+import msaf
+from msaf import featextract
+from msaf import input_output as io
+from msaf import run
+from msaf import similarity
+from msaf import utils
+
+
+def segment(file_struct, algorithms, args):
+    """Runs all the combinations of algorithms on a track, and returns their
+    estimated boundaries and the time it took."""
+    features = io.get_features(file_struct.audio_file,
+                               framesync=args.framesync)
+    all_times = []
+    start_time = time.time()
+    with similarity.track_cache():
+        for algorithm in algorithms:
+            boundaries_id, _, labels_id = algorithm.partition(":")
+            np.random.seed(123)
+            random.seed(0)
+            config = io.get_configuration(args.feature, False, args.framesync,
+                                          boundaries_id, labels_id or None)
+            config["hier"] = False
+            est_times = run.run_algorithms(
+                file_struct.audio_file, boundaries_id, labels_id or None,
+                config, features=features)[0]
+            all_times.append(est_times)
+    return all_times, time.time() - start_time
+
+
+def main():
+    """Main function to parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the cache of self-similarity matrices",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("ds_path",
+                        action="store",
+                        help="Path to the dataset")
+    parser.add_argument("-a",
+                        action="store",
+                        dest="algorithms",
+                        nargs="+",
+                        help="Combinations of algorithms (boundaries:labels)",
+                        default=["foote", "foote:fmc2d", "foote:cnmf",
+                                 "sf", "sf:fmc2d", "sf:scluster",
+                                 "scluster", "scluster:scluster"])
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feature",
+                        help="Feature to use",
+                        default="hpcp")
+    parser.add_argument("-fs",
+                        action="store_true",
+                        dest="framesync",
+                        help="Use frame-synchronous features",
+                        default=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.WARNING)
+
+    # Compute the features if needed
+    file_structs = io.get_dataset_files(args.ds_path)
+    for file_struct in file_structs:
+        utils.ensure_dir(os.path.dirname(file_struct.features_file))
+        featextract.compute_all_features(
+            file_struct, feat_names=msaf.AVAILABLE_FEATS)
+
+    print("%-10s %10s %8s %10s" % ("cache", "time (s)", "speedup", "same"))
+    prev_max_size = msaf.Cache.ssm_max_size
+    try:
+        base_time = None
+        base_results = []
+        for max_size in [0, prev_max_size]:
+            msaf.Cache.ssm_max_size = max_size
+            total_time = 0
+            same = True
+            for i, file_struct in enumerate(file_structs):
+                all_times, t = segment(file_struct, args.algorithms, args)
+                total_time += t
+                if base_time is None:
+                    base_results.append(all_times)
+                else:
+                    same &= all(np.allclose(est_times, base_times)
+                                for est_times, base_times in
+                                zip(all_times, base_results[i]))
+            if base_time is None:
+                base_time = total_time
+            print("%-10s %10.3f %7.2fx %10s" % (
+                "%d MB" % (max_size // 1024 ** 2), total_time,
+                base_time / total_time, same))
+    finally:
+        msaf.Cache.ssm_max_size = prev_max_size
+
+if __name__ == '__main__':
+    main()
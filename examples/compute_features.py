@@ -6,7 +6,10 @@ This script computes the features for a single or multiple audio files.
 Examples:
 
     Single file mode:
-        >> ./compute_features.py path_to_audio.mp3 -o my_features.json
+        >> ./compute_features.py path_to_audio.mp3 -o my_features.feats
+
+        Compute the independent stages of the extraction in 4 threads:
+            >> ./compute_features.py path_to_audio.mp3 -j 4
 
     Collection mode:
         Run on 12 cores:
@@ -15,6 +18,12 @@ Examples:
         Run on 8 cores, and overwrite previous features:
             >> ./compute_features.py path_to_dataset/ -j 8 -ow
 
+        Extract files longer than 10 minutes in blocks, with bounded memory:
+            >> ./compute_features.py path_to_dataset/ -b 600
+
+        Only compute (or add to existing features) the MFCC and HPCP:
+            >> ./compute_features.py path_to_dataset/ -f mfcc hpcp
+
 """
 
 import argparse
@@ -22,6 +31,7 @@ import time
 import logging
 
 # Local stuff
+import msaf
 import msaf.featextract
 
 
@@ -43,7 +53,8 @@ def main():
                         action="store",
                         dest="n_jobs",
                         type=int,
-                        help="Number of jobs (only for collection mode)",
+                        help="Number of jobs (threads per file in single "
+                        "file mode)",
                         default=4)
     parser.add_argument("-ow",
                         action="store_true",
@@ -55,13 +66,28 @@ def main():
                         dest="out_file",
                         type=str,
                         help="Output file (only for single file mode)",
-                        default="out.json")
+                        default="out" + msaf.Dataset.features_ext)
     parser.add_argument("-d",
                         action="store",
                         dest="ds_name",
                         default="*",
                         help="The prefix of the dataset to use "
                         "(e.g. Isophonics, SALAMI)")
+    parser.add_argument("-b",
+                        action="store",
+                        dest="stream_min_dur",
+                        type=float,
+                        help="Extract the features of files longer than the "
+                        "given duration (in seconds) in blocks, with "
+                        "bounded memory",
+                        default=None)
+    parser.add_argument("-f",
+                        action="store",
+                        dest="feat_names",
+                        nargs="+",
+                        choices=msaf.AVAILABLE_FEATS,
+                        help="Features to compute (all of them by default)",
+                        default=None)
     args = parser.parse_args()
     start_time = time.time()
 
@@ -69,10 +95,14 @@ def main():
     logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
         level=logging.INFO)
 
+    # Stream long files
+    msaf.Anal.stream_min_dur = args.stream_min_dur
+
     # Run the algorithm
     msaf.featextract.process(args.in_path, sonify_beats=args.sonify_beats,
                              n_jobs=args.n_jobs, overwrite=args.overwrite,
-                             out_file=args.out_file, ds_name=args.ds_name)
+                             out_file=args.out_file, ds_name=args.ds_name,
+                             feat_names=args.feat_names)
 
     # Done!
     logging.info("Done! Took %.2f seconds." % (time.time() - start_time))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+This script converts the legacy JSON feature files of a dataset into binary
+feature stores, which can be memory-mapped when reading them.
+
+
+Examples:
+
+    Convert the features of a dataset:
+        >> ./convert_features.py path_to_dataset/
+
+    Convert them and remove the old JSON files:
+        >> ./convert_features.py path_to_dataset/ -rm
+
+"""
+
+import argparse
+import logging
+import os
+import time
+
+# Local stuff
+import msaf
+
+
+def main():
+    """Main function to parse the arguments and call the main process."""
+    parser = argparse.ArgumentParser(description=
+        "Converts the JSON feature files of a dataset into binary feature "
+        "stores",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("in_path",
+                        action="store",
+                        help="Input dataset dir")
+    parser.add_argument("-rm",
+                        action="store_true",
+                        dest="remove",
+                        help="Remove the JSON files once converted",
+                        default=False)
+    args = parser.parse_args()
+    start_time = time.time()
+
+    # Setup the logger
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+        level=logging.INFO)
+
+    # Convert the features
+    features_dir = os.path.join(args.in_path, msaf.Dataset.features_dir)
+    out_dirs = msaf.io.convert_features_dir(features_dir, remove=args.remove)
+
+    # Done!
+    logging.info("Converted %d files. Took %.2f seconds." %
+                 (len(out_dirs), time.time() - start_time))
+
+if __name__ == '__main__':
+    main()
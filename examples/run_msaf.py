@@ -87,6 +87,19 @@ def main():
                         dest="evaluate",
                         help="Evaluates the results exclusively",
                         default=False)
+    parser.add_argument("-r",
+                        action="store_true",
+                        dest="resume",
+                        help="Skips the tracks already completed by a "
+                        "previous run with the same parameters (collection "
+                        "mode only)",
+                        default=False)
+    parser.add_argument("-skip",
+                        action="store_true",
+                        dest="skip_estimated",
+                        help="Reuses the saved estimations computed with the "
+                        "same parameters and features",
+                        default=False)
 
     args = parser.parse_args()
     start_time = time.time()
@@ -113,6 +126,8 @@ def main():
         func = msaf.run
         params["sonify_bounds"] = args.sonify_bounds
         params["plot"] = args.plot
+        params["resume"] = args.resume
+        params["skip_estimated"] = args.skip_estimated
     res = func.process(args.in_path, **params)
 
     if not args.evaluate:
@@ -124,6 +139,8 @@ def main():
             # Evaluate results for collection mode
             params.pop("sonify_bounds", None)
             params.pop("plot", None)
+            params.pop("resume", None)
+            params.pop("skip_estimated", None)
             params["save"] = args.save
             msaf.eval.process(args.in_path, **params)
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Runs the segmentation server of MSAF (see `msaf.server`), which segments
+tracks on demand with a pool of warm processes.
+
+Examples:
+
+    >> ./run_server.py -p 8000 -j 4 -a sf foote -r /data
+    >> curl -d '{"path": "/data/track.mp3", "boundaries_id": "foote"}' \\
+        http://localhost:8000/segment
+"""
+import argparse
+import logging
+
+# MSAF import
+import msaf
+
+
+def main():
+    """Main function to parse the arguments and run the server."""
+    parser = argparse.ArgumentParser(
+        description="Runs a server that segments the audio files or samples "
+        "that it receives.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-H",
+                        action="store",
+                        dest="host",
+                        default="localhost",
+                        help="Host name or address to listen on")
+    parser.add_argument("-p",
+                        action="store",
+                        dest="port",
+                        default=8000,
+                        type=int,
+                        help="Port to listen on")
+    parser.add_argument("-j",
+                        action="store",
+                        dest="n_jobs",
+                        default=4,
+                        type=int,
+                        help="The number of processes to segment tracks")
+    parser.add_argument("-a",
+                        action="store",
+                        dest="algorithms",
+                        nargs="+",
+                        default=None,
+                        help="Algorithms to import when the processes start "
+                        "(all of them by default)")
+    parser.add_argument("-t",
+                        action="store",
+                        dest="timeout",
+                        default=msaf.server.SEGMENT_TIMEOUT,
+                        type=float,
+                        help="Maximum time to segment a track, in seconds")
+    parser.add_argument("-r",
+                        action="store",
+                        dest="root_dir",
+                        default=None,
+                        help="Directory of the audio files that can be "
+                        "requested by their path (if not set, only the "
+                        "samples of the tracks are accepted)")
+    args = parser.parse_args()
+
+    # Setup the logger
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s',
+                        level=logging.INFO)
+
+    # Run the server
+    msaf.server.serve(args.host, args.port, args.n_jobs, args.algorithms,
+                      args.timeout, args.root_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ __license__     = "MIT"
 __version__     = "0.0.3"
 __email__       = "oriol.nieto@gmail.com"
 
+import importlib
+
 
 # Analysis Params
 class Anal():
@@ -18,23 +20,33 @@ class Anal():
     n_octaves = 6
     f_min = 27.5   # Minimum frequency for chroma
     cqt_bins = 84
+    chroma_from_cqt = False  # Whether to fold the HPCP from the CQT feature
+    hpss_mode = "signal"  # HPSS output: "signal" or "spectral" (faster)
+    resample_type = "kaiser_best"  # Or "kaiser_fast", "polyphase" (fastest)
+    stream_min_dur = None  # Extract longer files in blocks (s, None: never)
+    stream_block_dur = 60.  # Duration of the blocks (s)
+    dtype = "float64"  # Precision of features and matrices (or "float32")
+
+
+# Global features and decoded audio caches, shared across datasets, and
+# in-memory cache of the self-similarity matrices of a track
+class Cache():
+    features_dir = None  # Path to the cache (None to disable it)
+    max_size = 10 * 1024 ** 3  # Maximum size of the cache, in bytes
+    audio_dir = None  # Path to the decoded audio cache (None to disable it)
+    audio_max_size = 10 * 1024 ** 3  # Maximum size of the audio cache, bytes
+    ssm_max_size = 512 * 1024 ** 2  # Max size of the matrices cache (bytes)
+    server_max_size = 512 * 1024 ** 2  # Max size of the server cache (bytes)
+
+
+# Resources of the parallel processes of the collection mode
+class Resources():
+    memory_budget = None  # Max estimated memory of the running jobs (bytes)
 
 # Default algorithms for msaf
 DEFAULT_BOUND_ID = "sf"
 DEFAULT_LABEL_ID = None
 
-# Import all submodules (for each task)
-from . import featextract
-from . import input_output as io
-from . import eval
-from . import plotting
-from . import utils
-from . import algorithms
-from . import run
-from .run import process
-from .input_output import get_all_boundary_algorithms
-from .input_output import get_all_label_algorithms
-
 # Global Config
 prefix_dict = {
     "Cerulean"      : "large_scale",
@@ -56,13 +68,19 @@ class Dataset():
     estimations_dir = "estimations"
     features_dir = "features"
     references_dir = "references"
+    journal_file = "journal.jsonl"  # Journal of the runs (in estimations_dir)
 
     # Extensions
     estimations_ext = ".jams"
-    features_ext = ".json"
+    features_ext = ".feats"         # Binary feature store (directory)
+    legacy_features_ext = ".json"   # Old JSON feature files (read only)
     references_ext = ".jams"
     audio_exts = [".wav", ".mp3", ".aif"]
 
+    # Storage of the features: "float64", or quantized and compressed with
+    # "float16" or "uint8" (smaller, slightly less precise)
+    features_storage = "float64"
+
 
 feat_dict = {
     'sf'    :   'hpcp',
@@ -78,3 +96,42 @@ feat_dict = {
 }
 
 AVAILABLE_FEATS = ["hpcp", "mfcc", "cqt", "tonnetz"]
+
+# Submodules (for each task), and functions exported by them, which are only
+# imported the first time they are accessed (e.g., `msaf.run`), so that
+# `import msaf` does not pay for librosa, pandas, matplotlib or the algorithms
+_submodules = {
+    "algorithms": "algorithms",
+    "eval": "eval",
+    "featextract": "featextract",
+    "io": "input_output",
+    "plotting": "plotting",
+    "run": "run",
+    "server": "server",
+    "similarity": "similarity",
+    "utils": "utils"
+}
+_functions = {
+    "process": "run",
+    "process_signal": "run",
+    "get_all_boundary_algorithms": "input_output",
+    "get_all_label_algorithms": "input_output"
+}
+
+
+def __getattr__(name):
+    """Imports the submodules and their functions when first accessed."""
+    if name in _submodules:
+        value = importlib.import_module("." + _submodules[name], __name__)
+    elif name in _functions:
+        module = importlib.import_module("." + _functions[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules) | set(_functions))
@@ -1,11 +1,15 @@
 """
 Initialisation file for all the algorithms contained in MSAF.
+
+The algorithms are discovered from the packages in this folder and
+registered (see `msaf.algorithms.registry`), but each of them is only
+imported the first time it is accessed (e.g., `msaf.algorithms.foote`).
 """
 import glob
-import importlib
 import os
 
 from . import interface
+from . import registry
 
 # Get current path
 curr_path = os.path.dirname(os.path.realpath(__file__))
@@ -19,16 +23,32 @@ for file in files:
         if os.path.isfile(os.path.join(file, "__init__.py")):
             module_names.append(__name__ + "." + os.path.basename(file))
 
-# Import all the algorithms in this folder
-[importlib.import_module(module_name) for module_name in module_names]
-
 # Also init the __all__ var in case they want to use "*" to import all
-__all__ = [module_name.split(".")[-1] for module_name in module_names]
+__all__ = sorted(module_name.split(".")[-1] for module_name in module_names)
+
+# Register them, with their metadata in their config modules
+for module_name in module_names:
+    registry.register(module_name.split(".")[-1], module_name,
+                      module_name + ".config")
+
+
+def __getattr__(name):
+    """Imports the registered algorithms when first accessed."""
+    if name not in registry.get_algorithm_ids():
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+    return registry.get_module(name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(registry.get_algorithm_ids()))
+
 
 # Clean up variable space
 del curr_path
 del files
 del module_names
+del module_name
 del os
 del glob
 del file
@@ -11,3 +11,6 @@ config = {
 algo_id = "cnmf"
 is_boundary_type = True
 is_label_type = True
+required_features = []
+supports_hier = False
+ssm_memory_factor = 6
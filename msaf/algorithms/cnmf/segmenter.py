@@ -10,7 +10,6 @@ of the C-NMF method described here:
 """
 import logging
 import numpy as np
-import pylab as plt
 from scipy.ndimage import filters
 
 from msaf.algorithms.interface import SegmenterInterface
@@ -9,3 +9,6 @@ config = {
 algo_id = "example"  # Identifier of the algorithm
 is_boundary_type = True  # Whether the algorithm extracts boundaries
 is_label_type = False  # Whether the algorithm labels segments
+required_features = []  # Features needed besides the selected one
+supports_hier = False  # Whether it implements processHierarchical
+ssm_memory_factor = 0  # Number of N x N float64 matrices at its peak (memory)
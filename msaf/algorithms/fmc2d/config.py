@@ -11,3 +11,6 @@ config = {
 algo_id = "fmc2d"
 is_boundary_type = False
 is_label_type = True
+required_features = []
+supports_hier = False
+ssm_memory_factor = 0
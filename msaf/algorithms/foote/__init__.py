@@ -1,2 +1,5 @@
 from .config import *
-from .segmenter import *
+from ..registry import import_lazily
+
+# The segmenter is only imported when used
+__getattr__ = import_lazily(__name__)
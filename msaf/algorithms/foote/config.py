@@ -17,3 +17,6 @@ config = {
 algo_id = "foote"
 is_boundary_type = True
 is_label_type = False
+required_features = []
+supports_hier = False
+ssm_memory_factor = 2
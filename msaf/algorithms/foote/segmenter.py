@@ -14,9 +14,9 @@ import numpy as np
 from scipy.spatial import distance
 from scipy import signal
 from scipy.ndimage import filters
-import pylab as plt
 
 import msaf
+from msaf import similarity
 from msaf.algorithms.interface import SegmenterInterface
 
 
@@ -36,9 +36,10 @@ def compute_gaussian_krnl(M):
     return G
 
 
+@similarity.memoize
 def compute_ssm(X, metric="seuclidean"):
     """Computes the self-similarity matrix of X."""
-    D = distance.pdist(X, metric=metric)
+    D = distance.pdist(X, metric=metric).astype(X.dtype, copy=False)
     D = distance.squareform(D)
     D /= D.max()
     return 1 - D
@@ -1,5 +1,6 @@
 """Interface for all the algorithms in MSAF."""
 import numpy as np
+import msaf
 import msaf.input_output as io
 import msaf.utils as U
 
@@ -102,6 +103,7 @@ class SegmenterInterface:
             except KeyError:
                 raise RuntimeError("Feature %s in not supported by MSAF" %
                                    (self.feature_str))
+        F = np.asarray(F, dtype=msaf.Anal.dtype)
 
         # Normalize if needed
         if normalize:
@@ -14,3 +14,6 @@ config = {
 algo_id = "olda"
 is_boundary_type = True
 is_label_type = False
+required_features = ["hpcp", "mfcc"]
+supports_hier = True
+ssm_memory_factor = 1
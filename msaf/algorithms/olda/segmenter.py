@@ -26,6 +26,9 @@ N_REP = 32
 # mfcc, chroma, repetitions for each, and 4 time features
 __DIMENSION = N_MFCC + N_CHROMA + 2 * N_REP + 4
 
+# Transforms already loaded, by file (shared by all the tracks of a process)
+_transforms = {}
+
 
 def features(audio_path, annot_beats=False, pre_features=None, framesync=False):
     '''Feature-extraction for audio segmentation
@@ -81,11 +84,9 @@ def features(audio_path, annot_beats=False, pre_features=None, framesync=False):
 
     # Latent factor repetition features
     def repetition(X, metric='seuclidean'):
-        R = librosa.segment.recurrence_matrix(X,
-                                            k=2 * int(np.ceil(np.sqrt(X.shape[1]))),
-                                            width=REP_WIDTH,
-                                            metric=metric,
-                                            sym=False).astype(np.float32)
+        R = msaf.similarity.recurrence_matrix(
+            X, k=2 * int(np.ceil(np.sqrt(X.shape[1]))), width=REP_WIDTH,
+            metric=metric, sym=False).astype(np.float32)
 
         P = scipy.signal.medfilt2d(librosa.segment.structure_feature(R), [1, REP_FILTER])
 
@@ -103,8 +104,6 @@ def features(audio_path, annot_beats=False, pre_features=None, framesync=False):
         features = pre_features
     chroma = features["hpcp"]
     mfcc = features["mfcc"]
-    tonnetz = features["tonnetz"]
-    cqt = features["cqt"]
     beats = features["beats"]
     dur = features["anal"]["dur"]
 
@@ -258,11 +257,11 @@ def process_arguments():
 def load_transform(transform_file):
 
     if transform_file is None:
-        W = np.eye(__DIMENSION)
-    else:
-        W = np.load(transform_file)
+        return np.eye(__DIMENSION)
 
-    return W
+    if transform_file not in _transforms:
+        _transforms[transform_file] = np.load(transform_file)
+    return _transforms[transform_file]
 
 
 def get_num_segs(duration, MIN_SEG=10.0, MAX_SEG=45.0):
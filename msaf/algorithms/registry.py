@@ -0,0 +1,165 @@
+"""
+Registry of the segmentation algorithms.
+
+Each algorithm identifier (e.g., "sf") is resolved to its entry point, the
+module that contains its `Segmenter` class (see
+`msaf.algorithms.interface`), and to its metadata, read from its config
+module:
+
+    - config: default parameters of the algorithm.
+    - is_boundary_type: whether it identifies boundaries.
+    - is_label_type: whether it labels segments.
+    - required_features: features needed besides the selected one.
+    - supports_hier: whether it segments hierarchically.
+    - ssm_memory_factor: number of N x N float64 matrices at its peak.
+
+The metadata of each algorithm is only read once, and the config module of
+the algorithms of MSAF does not import their implementation, so listing or
+configuring algorithms is cheap and each segmenter is only imported when it
+runs.
+
+The algorithms of MSAF are registered by `msaf.algorithms`. Third-party
+algorithms can be registered from any module:
+
+    msaf.algorithms.registry.register("my_algo", "my_package.my_algo")
+"""
+import importlib
+import sys
+
+# Entry points and config modules of the algorithms, by identifier
+_entry_points = {}
+_config_modules = {}
+
+# Metadata of the algorithms already read, by identifier
+_metadata = {}
+
+# Metadata of an algorithm, with the default values of the optional ones
+METADATA_DEFAULTS = {
+    "required_features": [],
+    "supports_hier": False,
+    "ssm_memory_factor": 0
+}
+
+
+def register(algo_id, module_name, config_module_name=None):
+    """Registers an algorithm.
+
+    Parameters
+    ----------
+    algo_id: str
+        Identifier of the algorithm.
+    module_name: str
+        Name of the module that contains the `Segmenter` class of the
+        algorithm.
+    config_module_name: str
+        Name of the module that contains the metadata of the algorithm
+        (`config`, `is_boundary_type`, `is_label_type` and, optionally,
+        `required_features`, `supports_hier` and `ssm_memory_factor`).
+        `None` if it is the same as `module_name`.
+    """
+    _entry_points[algo_id] = module_name
+    _config_modules[algo_id] = config_module_name or module_name
+    _metadata.pop(algo_id, None)
+
+
+def unregister(algo_id):
+    """Removes an algorithm from the registry."""
+    _entry_points.pop(algo_id, None)
+    _config_modules.pop(algo_id, None)
+    _metadata.pop(algo_id, None)
+
+
+def get_algorithm_ids():
+    """Gets the identifiers of all the registered algorithms, sorted."""
+    return sorted(_entry_points)
+
+
+def _check_registered(algo_id):
+    """Raises a RuntimeError if the algorithm is not registered."""
+    if algo_id not in _entry_points:
+        raise RuntimeError("Algorithm %s can not be found in msaf!" %
+                           algo_id)
+
+
+def get_module(algo_id):
+    """Imports the entry point of an algorithm.
+
+    Parameters
+    ----------
+    algo_id: str
+        Identifier of the algorithm.
+
+    Returns
+    -------
+    module: module
+        Module that contains the `Segmenter` class of the algorithm.
+    """
+    _check_registered(algo_id)
+    return importlib.import_module(_entry_points[algo_id])
+
+
+def get_metadata(algo_id):
+    """Gets the metadata of an algorithm, without importing its segmenter.
+
+    Parameters
+    ----------
+    algo_id: str
+        Identifier of the algorithm.
+
+    Returns
+    -------
+    metadata: dict
+        Metadata of the algorithm (see the module docstring). It is shared,
+        so it should not be modified (`get_config` returns a copy of the
+        config).
+    """
+    if algo_id not in _metadata:
+        _check_registered(algo_id)
+        module = importlib.import_module(_config_modules[algo_id])
+        metadata = {
+            "config": module.config,
+            "is_boundary_type": module.is_boundary_type,
+            "is_label_type": module.is_label_type
+        }
+        for key, default in METADATA_DEFAULTS.items():
+            metadata[key] = getattr(module, key, default)
+        _metadata[algo_id] = metadata
+    return _metadata[algo_id]
+
+
+def get_config(algo_id):
+    """Gets a copy of the default parameters of an algorithm."""
+    return dict(get_metadata(algo_id)["config"])
+
+
+def import_lazily(package_name, module_name="segmenter"):
+    """Gets the module `__getattr__` (PEP 562) of the package of an
+    algorithm, which imports the module of its implementation the first time
+    that any attribute missing from the package is accessed (e.g.,
+    `msaf.algorithms.sf.Segmenter`).
+
+    Parameters
+    ----------
+    package_name: str
+        Name of the package of the algorithm.
+    module_name: str
+        Name of the module of its implementation, within the package.
+
+    Returns
+    -------
+    __getattr__: function
+        Function to use as the `__getattr__` of the package.
+    """
+    def __getattr__(name):
+        module = importlib.import_module("." + module_name, package_name)
+        package_vars = vars(sys.modules[package_name])
+        if name in package_vars:
+            # Submodules imported by the implementation
+            return package_vars[name]
+        try:
+            return getattr(module, name)
+        except AttributeError:
+            raise AttributeError("module %r has no attribute %r" %
+                                 (package_name, name))
+
+    return __getattr__
@@ -13,3 +13,6 @@ config = {
 algo_id = "scluster"
 is_boundary_type = True
 is_label_type = True
+required_features = ["hpcp", "mfcc"]
+supports_hier = True
+ssm_memory_factor = 8
@@ -81,7 +81,7 @@ def get_beats(y, sr, hop_length):
 
 def features(filename):
     #print '\t[1/5] loading audio'
-    y, sr = librosa.load(filename, sr=SR)
+    y, sr = msaf.io.load_audio(filename, sr=SR)
 
     #print '\t[2/5] Separating harmonic and percussive signals'
     y_perc, y_harm = hp_sep(y)
@@ -202,7 +202,7 @@ def sym_laplacian(A):
 
     Dinv = np.diag(Dinv**0.5)
 
-    L = np.eye(len(A)) - Dinv.dot(A.dot(Dinv))
+    L = np.eye(len(A), dtype=A.dtype) - Dinv.dot(A.dot(Dinv))
 
     return L
 
@@ -474,8 +474,10 @@ def estimate_bandwidth(D, k):
     sigma = np.mean(D_sort[:, 1+k])
     return sigma
 
+@msaf.similarity.memoize
 def self_similarity(X, k):
-    D = scipy.spatial.distance.cdist(X.T, X.T, metric=METRIC)
+    D = scipy.spatial.distance.cdist(X.T, X.T, metric=METRIC).astype(
+        X.dtype, copy=False)
     sigma = estimate_bandwidth(D, k)
     A = np.exp(-0.5 * (D / sigma))
     return A
@@ -517,11 +519,11 @@ def do_segmentation(X, beats, parameters, bound_idxs):
     Xs = librosa.feature.stack_memory(Xpad, n_steps=N_STEPS)[:, N_STEPS:]
 
     k_link = 1 + int(np.ceil(2 * np.log2(X_rep.shape[1])))
-    R = librosa.segment.recurrence_matrix(Xs,
-                                        k=k_link,
-                                        width=REP_WIDTH,
-                                        metric=METRIC,
-                                        sym=True).astype(np.float32)
+    R = msaf.similarity.recurrence_matrix(Xs,
+                                          k=k_link,
+                                          width=REP_WIDTH,
+                                          metric=METRIC,
+                                          sym=True).astype(np.float32)
     # Generate the repetition kernel
     A_rep = self_similarity(Xs, k=k_link)
 
@@ -545,7 +547,8 @@ def do_segmentation(X, beats, parameters, bound_idxs):
     # We can jump to a random neighbor, or +- 1 step in time
     # Call it the infinite jukebox matrix
     T = weighted_ridge(Rf * A_rep,
-                       (np.eye(len(A_loc),k=1) + np.eye(len(A_loc),k=-1)) * A_loc)
+                       (np.eye(len(A_loc), k=1, dtype=A_loc.dtype) +
+                        np.eye(len(A_loc), k=-1, dtype=A_loc.dtype)) * A_loc)
     # Get the graph laplacian
     try:
         L = sym_laplacian(T)
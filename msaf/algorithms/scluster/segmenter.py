@@ -12,6 +12,8 @@ Original code by Brian McFee from:
     https://github.com/bmcfee/laplacian_segmentation
 """
 
+import numpy as np
+
 import msaf
 from msaf.algorithms.interface import SegmenterInterface
 from . import main
@@ -44,7 +46,8 @@ class Segmenter(SegmenterInterface):
 
         # Brian wants HPCP and MFCC
         # (tranpsosed, because he's that kind of person)
-        F = (self.features["hpcp"].T, self.features["mfcc"].T)
+        F = (np.asarray(self.features["hpcp"], dtype=msaf.Anal.dtype).T,
+             np.asarray(self.features["mfcc"], dtype=msaf.Anal.dtype).T)
 
         # Do actual segmentation
         est_idxs, est_labels = main.do_segmentation(
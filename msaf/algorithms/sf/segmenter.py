@@ -17,6 +17,7 @@ from scipy.spatial import distance
 from scipy import signal
 from scipy.ndimage import filters
 
+from msaf import similarity
 from msaf.algorithms.interface import SegmenterInterface
 
 
@@ -89,11 +90,11 @@ def pick_peaks(nc, L=16, offset_denom=0.1):
     return peaks
 
 
-def circular_shift(X):
+def circular_shift(X, dtype=np.float64):
     """Shifts circularly the X squre matrix in order to get a
         time-lag matrix."""
     N = X.shape[0]
-    L = np.zeros(X.shape)
+    L = np.zeros(X.shape, dtype=dtype)
     for i in range(N):
         L[i, :] = np.asarray([X[(i + j) % N, j] for j in range(N)])
     return L
@@ -102,7 +103,7 @@ def circular_shift(X):
 def embedded_space(X, m, tau=1):
     """Time-delay embedding with m dimensions and tau delays."""
     N = X.shape[0] - int(np.ceil(m))
-    Y = np.zeros((N, int(np.ceil(X.shape[1] * m))))
+    Y = np.zeros((N, int(np.ceil(X.shape[1] * m))), dtype=X.dtype)
     for i in range(N):
         # print X[i:i+m,:].flatten().shape, w, X.shape
         # print Y[i,:].shape
@@ -149,7 +150,7 @@ class Segmenter(SegmenterInterface):
             # plt.imshow(E.T, interpolation="nearest", aspect="auto"); plt.show()
 
             # Recurrence matrix
-            R = librosa.segment.recurrence_matrix(
+            R = similarity.recurrence_matrix(
                 E.T,
                 k=k * int(F.shape[0]),
                 width=1,  # zeros from the diagonal
@@ -157,7 +158,7 @@ class Segmenter(SegmenterInterface):
                 sym=True).astype(np.float32)
 
             # Circular shift
-            L = circular_shift(R)
+            L = circular_shift(R, dtype=F.dtype)
             #plt.imshow(L, interpolation="nearest", cmap=plt.get_cmap("binary"))
             #plt.show()
 
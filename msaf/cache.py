@@ -0,0 +1,293 @@
+"""
+Global caches of feature stores and decoded audio, shared across datasets.
+
+Entries are addressed by the content of the audio file, the analysis
+parameters used to compute the features and their storage (see
+`msaf.Dataset.features_storage`), so that duplicated tracks (e.g., the same
+album in multiple datasets) are only analyzed once, and features computed
+with different parameters or stored with a different precision are never
+mixed up. Decoded audio is stored as
+float32 PCM per audio file and sample rate, and memory-mapped when read, so
+that each track is only decoded and resampled once. The caches are bounded in
+size, and the least recently used entries are evicted first.
+
+The caches are disabled unless `msaf.Cache.features_dir` (features) or
+`msaf.Cache.audio_dir` (decoded audio) are set.
+"""
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import shutil
+
+import msaf
+
+
+def is_enabled():
+    """Whether the global features cache is enabled."""
+    return msaf.Cache.features_dir is not None
+
+
+def is_audio_enabled():
+    """Whether the decoded audio cache is enabled."""
+    return msaf.Cache.audio_dir is not None
+
+
+def get_audio_digest(audio_file, block_size=2 ** 20):
+    """Computes the digest of the content of an audio file.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    block_size: int
+        Size of the blocks read from the file, in bytes.
+
+    Returns
+    -------
+    digest: str
+        Hexadecimal SHA-1 digest of the audio file.
+    """
+    sha1 = hashlib.sha1()
+    with open(audio_file, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def get_analysis_digest(anal):
+    """Computes the digest of the analysis parameters.
+
+    Parameters
+    ----------
+    anal: dict
+        Analysis parameters, as stored in the features file.
+
+    Returns
+    -------
+    digest: str
+        Hexadecimal SHA-1 digest of the analysis parameters.
+    """
+    anal_json = json.dumps(anal, sort_keys=True)
+    return hashlib.sha1(anal_json.encode("utf-8")).hexdigest()
+
+
+def get_entry(audio_file, anal):
+    """Gets the path of the cache entry of a given audio file.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    anal: dict
+        Analysis parameters, as stored in the features file.
+
+    Returns
+    -------
+    entry: str
+        Path to the feature store in the cache (it may not exist), for the
+        current storage of the features.
+    """
+    return os.path.join(msaf.Cache.features_dir,
+                        get_audio_digest(audio_file) + "-" +
+                        get_analysis_digest(anal)[:16] + "-" +
+                        msaf.Dataset.features_storage +
+                        msaf.Dataset.features_ext)
+
+
+def fetch_features(audio_file, anal, features_file):
+    """Places the cached features of an audio file in the given feature
+    store, if they exist in the cache.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    anal: dict
+        Analysis parameters, as stored in the features file.
+    features_file: str
+        Path to the (non existing) feature store.
+
+    Returns
+    -------
+    hit: bool
+        Whether the features were found in the cache.
+    """
+    entry = get_entry(audio_file, anal)
+    if not os.path.isdir(entry):
+        return False
+    logging.info("Reading features of %s from the cache" % audio_file)
+    try:
+        _link_tree(entry, features_file)
+    except (IOError, OSError):
+        # The entry might have been evicted in the meantime
+        if os.path.exists(features_file):
+            shutil.rmtree(features_file)
+        return False
+    os.utime(entry, None)
+    return True
+
+
+def store_features(audio_file, anal, features_file):
+    """Adds the given feature store to the cache, replacing the previous
+    entry of the audio file, and evicts the least recently used entries if
+    the cache is too large.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    anal: dict
+        Analysis parameters, as stored in the features file.
+    features_file: str
+        Path to the feature store.
+    """
+    entry = get_entry(audio_file, anal)
+    if not os.path.isdir(msaf.Cache.features_dir):
+        os.makedirs(msaf.Cache.features_dir)
+    tmp_entry = "%s.%d.tmp" % (entry, os.getpid())
+    if os.path.exists(tmp_entry):
+        shutil.rmtree(tmp_entry)
+    _link_tree(features_file, tmp_entry)
+    if os.path.exists(entry):
+        shutil.rmtree(entry)
+    try:
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # Another process stored the same entry first
+        shutil.rmtree(tmp_entry)
+    evict(msaf.Cache.max_size)
+
+
+def evict(max_size):
+    """Removes the least recently used entries of the cache until its size
+    is not larger than the given one.
+
+    Parameters
+    ----------
+    max_size: int
+        Maximum size of the cache, in bytes.
+    """
+    _evict(msaf.Cache.features_dir, msaf.Dataset.features_ext, max_size)
+
+
+def get_audio_entry(audio_file, sr):
+    """Gets the path of the decoded audio entry of a given audio file.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    sr: int
+        Sample rate of the decoded audio (resampled with the resampler of
+        `msaf.Anal.resample_type`).
+
+    Returns
+    -------
+    entry: str
+        Path to the decoded audio in the cache (it may not exist).
+    """
+    return os.path.join(msaf.Cache.audio_dir, "%s-%d-%s.npy" % (
+        get_audio_digest(audio_file), sr, msaf.Anal.resample_type))
+
+
+def fetch_audio(audio_file, sr):
+    """Reads the decoded audio of an audio file from the cache, if it
+    exists.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    sr: int
+        Sample rate of the decoded audio.
+
+    Returns
+    -------
+    y: np.array or None
+        Memory-mapped (copy-on-write) audio samples, or `None` if they are
+        not in the cache.
+    """
+    entry = get_audio_entry(audio_file, sr)
+    try:
+        y = np.load(entry, mmap_mode="c")
+    except (IOError, OSError, ValueError):
+        # Missing (or evicted in the meantime)
+        return None
+    os.utime(entry, None)
+    return y
+
+
+def store_audio(audio_file, sr, y):
+    """Adds the decoded audio of an audio file to the cache, and evicts the
+    least recently used entries if the cache is too large.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    sr: int
+        Sample rate of the decoded audio.
+    y: np.array
+        Audio samples.
+    """
+    entry = get_audio_entry(audio_file, sr)
+    if not os.path.isdir(msaf.Cache.audio_dir):
+        os.makedirs(msaf.Cache.audio_dir)
+    tmp_entry = "%s.%d.tmp" % (entry, os.getpid())
+    with open(tmp_entry, "wb") as f:
+        np.save(f, np.asarray(y, dtype=np.float32))
+    os.rename(tmp_entry, entry)
+    _evict(msaf.Cache.audio_dir, ".npy", msaf.Cache.audio_max_size)
+
+
+def _evict(cache_dir, ext, max_size):
+    """Removes the least recently used entries (with the given extension) of
+    a cache folder until its size is not larger than the given one."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if not name.endswith(ext):
+            continue
+        entries.append((os.path.getmtime(entry), _get_size(entry), entry))
+
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if cache_size <= max_size:
+            break
+        logging.info("Evicting %s from the cache" % entry)
+        if os.path.isdir(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            os.remove(entry)
+        cache_size -= size
+
+
+def _get_size(path):
+    """Gets the size of a file, or of all the files contained in a
+    directory, in bytes."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def _link_tree(src_dir, dst_dir):
+    """Replicates a feature store using hard links when possible (stores are
+    never modified in place, so entries can be shared), or copies
+    otherwise."""
+    os.makedirs(dst_dir)
+    for name in os.listdir(src_dir):
+        src = os.path.join(src_dir, name)
+        dst = os.path.join(dst_dir, name)
+        if os.path.isdir(src):
+            _link_tree(src, dst)
+            continue
+        try:
+            os.link(src, dst)
+        except (AttributeError, OSError):
+            shutil.copy2(src, dst)
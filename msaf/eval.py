@@ -10,7 +10,6 @@ import mir_eval
 import numpy as np
 import os
 import pandas as pd
-import six
 import sys
 
 # Local stuff
@@ -247,7 +246,7 @@ def process_track(file_struct, boundaries_id, labels_id, config, annotator_id=0)
         Dictionary of the results (see function compute_results).
     """
     # Convert to file_struct if string is passed
-    if isinstance(file_struct, six.string_types):
+    if isinstance(file_struct, str):
         file_struct = io.FileStruct(file_struct)
 
     est_file = file_struct.est_file
@@ -9,23 +9,62 @@ Features to be computed:
 - Beats
 """
 
+import audioread
 import datetime
+import fractions
+import hashlib
 import librosa
 import jams
-from joblib import Parallel, delayed
 import logging
+from multiprocessing.pool import ThreadPool
 import numpy as np
 import os
 import json
+import queue
+import shutil
+import sys
+import threading
 
 # Local stuff
 import msaf
+from msaf import cache
+from msaf import scheduling
 from msaf import utils
 from msaf import input_output as io
 from msaf.input_output import FileStruct
 
+# Prefixes of the keys of the features dictionary for each section of the
+# features file
+SECTION_PREFIXES = {
+    "framesync": "",
+    "est_beatsync": "bs_",
+    "ann_beatsync": "ann_"
+}
 
-def compute_beats(y_percussive, sr=22050):
+# Analysis parameters (as named in the features file) that the beats and
+# each of the features depend on. When any of them changes, the stored
+# features become stale and have to be computed again.
+BEATS_ANAL_PARAMS = ["sample_rate", "hop_size", "hpss_mode", "resample_type"]
+FEATS_ANAL_PARAMS = {
+    "mfcc": ["frame_rate", "mfcc_coeff", "n_mels"],
+    "hpcp": ["chroma_from_cqt", "cqt_bins", "f_min", "n_octaves",
+             "hpss_mode"],
+    "tonnetz": ["chroma_from_cqt", "cqt_bins", "f_min", "n_octaves",
+                "hpss_mode"],
+    "cqt": ["cqt_bins"]
+}
+
+# Context (in samples) added at each side of the blocks of the streaming
+# extraction, so that their frames are computed as if the whole signal was
+# available (HPSS median filters, low frequency CQT filters, etc.)
+STREAM_PAD = 2 ** 15
+
+# Context (in seconds) added at each side of the decoded blocks to resample
+# them in the streaming extraction
+STREAM_RESAMPLE_PAD = 1.0
+
+
+def compute_beats(y_percussive, sr=22050, onset_envelope=None):
     """Computes the beats using librosa.
 
     Parameters
@@ -34,6 +73,9 @@ def compute_beats(y_percussive, sr=22050):
         Percussive part of the audio signal in samples.
     sr: int
         Sample rate.
+    onset_envelope: np.array
+        Previously computed onset envelope of the percussive signal (in
+        which case `y_percussive` can be `None`).
 
     Returns
     -------
@@ -44,6 +86,7 @@ def compute_beats(y_percussive, sr=22050):
     """
     logging.info("Estimating Beats...")
     tempo, beats_idx = librosa.beat.beat_track(y=y_percussive, sr=sr,
+                                               onset_envelope=onset_envelope,
                                                hop_length=msaf.Anal.hop_size)
     times = librosa.frames_to_time(beats_idx, sr=sr,
                                    hop_length=msaf.Anal.hop_size)
@@ -55,6 +98,366 @@ def compute_beats(y_percussive, sr=22050):
     return beats_idx, times
 
 
+def compute_onset_envelope(mel_db, sr=22050, ref_db=None):
+    """Computes the onset envelope that librosa tracks the beats on from a
+    mel spectrogram in dB.
+
+    Parameters
+    ----------
+    mel_db: np.array(n_mels, N)
+        Mel spectrogram in dB (i.e., `librosa.logamplitude(S, top_db=None)`).
+    sr: int
+        Sample rate.
+    ref_db: float
+        Maximum value in dB (`None` for the maximum of `mel_db`).
+
+    Returns
+    -------
+    onset_envelope: np.array(N)
+        Onset strength of each frame.
+    """
+    # Clip the spectrogram to a dynamic range of 80 dB, like librosa does
+    if ref_db is None:
+        ref_db = np.max(mel_db)
+    S = np.maximum(mel_db, ref_db - 80.0)
+    return librosa.onset.onset_strength(S=S, sr=sr,
+                                        hop_length=msaf.Anal.hop_size,
+                                        aggregate=np.median)
+
+
+def scale_db(S_db, ref_db=None, top_db=80.0):
+    """Scales a spectrogram in dB relative to its maximum, clipping it to a
+    dynamic range of `top_db`. This is equivalent to
+    `librosa.logamplitude(S, ref_power=np.max)`, but the maximum can be
+    computed from the whole signal while the spectrogram is only a part of
+    it.
+
+    Parameters
+    ----------
+    S_db: np.array
+        Spectrogram in dB (i.e., `librosa.logamplitude(S, top_db=None)`).
+    ref_db: float
+        Maximum value in dB (`None` for the maximum of `S_db`).
+    top_db: float
+        Dynamic range, in dB.
+
+    Returns
+    -------
+    log_S: np.array
+        Scaled spectrogram in dB.
+    """
+    if ref_db is None:
+        ref_db = np.max(S_db)
+    return np.maximum(S_db - ref_db, -top_db)
+
+
+def db_to_mfcc(log_S):
+    """Computes the MFCCs from a scaled log-mel spectrogram.
+
+    Parameters
+    ----------
+    log_S: np.array(N, msaf.Anal.n_mels)
+        Scaled log-mel spectrogram (see `scale_db`).
+
+    Returns
+    -------
+    mfcc: np.array(N, msaf.Anal.mfcc_coeff)
+        Mel-frequency Cepstral Coefficients.
+    """
+    return librosa.feature.mfcc(S=log_S.T, n_mfcc=msaf.Anal.mfcc_coeff).T
+
+
+class FeatureEngine(object):
+    """Computes the features of an audio signal, sharing the time-frequency
+    representations among them.
+
+    Every stage of the extraction (e.g., the harmonic-percussive separation,
+    the STFT, the CQT, or a feature itself) is computed at most once, the
+    first time it is needed, and every feature is derived from these
+    representations. Stages can also be given in advance (e.g., a previously
+    separated harmonic signal).
+
+    If `msaf.Anal.chroma_from_cqt` is set, the HPCP are folded from the
+    constant-Q transform of the CQT feature instead of computing another
+    transform on the harmonic signal.
+
+    If `msaf.Anal.hpss_mode` is "spectral", the harmonic and percussive
+    components are kept as masked spectrograms instead of resynthesizing
+    them: the beats are tracked on the mel spectrogram of the percussive
+    one, and the HPCP are computed from the harmonic one (with STFT chroma
+    filters instead of a constant-Q transform).
+
+    Independent stages (e.g., the harmonic-percussive separation and the
+    spectrograms of the audio) can be computed in parallel threads with
+    `compute`, since most of their time is spent in NumPy and FFT code that
+    releases the GIL.
+    """
+    def __init__(self, audio, sr=None, **stages):
+        """Inits the engine.
+
+        Parameters
+        ----------
+        audio: np.array(N)
+            Audio samples of the given input.
+        sr: int
+            Sample rate (`None` to use `msaf.Anal.sample_rate`).
+        stages: dict
+            Previously computed stages (e.g., harmonic=y_harmonic).
+        """
+        self.sr = msaf.Anal.sample_rate if sr is None else sr
+        self.chroma_from_cqt = msaf.Anal.chroma_from_cqt
+        self.hpss_mode = msaf.Anal.hpss_mode
+        if self.hpss_mode not in ["signal", "spectral"]:
+            raise ValueError("Unknown HPSS mode %s" % self.hpss_mode)
+        self._values = {"audio": audio}
+        self._values.update(stages)
+        self._locks = {}
+
+    def dependencies(self, name):
+        """Gets the stages that the given stage is computed from."""
+        if name == "hpcp":
+            if self.chroma_from_cqt:
+                return ["cqt_spectrum"]
+            if self.hpss_mode == "spectral":
+                return ["harmonic_spectrum", "harmonic_tuning"]
+            return ["harmonic", "harmonic_tuning"]
+        if self.hpss_mode == "spectral":
+            spectral_deps = {
+                "harmonic_tuning": ["harmonic_spectrum"],
+                "percussive_mel_db": ["percussive_spectrum"],
+                "beats": ["percussive_mel_db"]
+            }
+            if name in spectral_deps:
+                return spectral_deps[name]
+        return {
+            "audio": [],
+            "tuning": ["audio"],
+            "hpss": ["audio"],
+            "harmonic": ["hpss"],
+            "percussive": ["hpss"],
+            "hpss_spectrum": ["audio"],
+            "harmonic_spectrum": ["hpss_spectrum"],
+            "percussive_spectrum": ["hpss_spectrum"],
+            "harmonic_tuning": ["harmonic"],
+            "stft": ["audio"],
+            "mel": ["stft"],
+            "mel_db": ["mel"],
+            "percussive_mel_db": ["percussive"],
+            "cqt_spectrum": ["audio", "tuning"],
+            "cqt_db": ["cqt_spectrum"],
+            "mfcc": ["mel_db"],
+            "cqt": ["cqt_db"],
+            "tonnetz": ["hpcp"],
+            "beats": ["percussive"]
+        }[name]
+
+    def is_computed(self, name):
+        """Whether the given stage has already been computed."""
+        return name in self._values
+
+    def get(self, name):
+        """Gets the given stage, computing it (and the stages it depends on)
+        if needed."""
+        if name not in self._values:
+            # Make sure that concurrent threads only compute it once
+            with self._locks.setdefault(name, threading.Lock()):
+                if name not in self._values:
+                    self._values[name] = getattr(self, "_compute_" + name)()
+        return self._values[name]
+
+    def get_graph(self, names):
+        """Gets the stages that need to be computed to obtain the given ones.
+
+        Parameters
+        ----------
+        names: list
+            Names of the stages to obtain.
+
+        Returns
+        -------
+        graph: dict
+            Stages that are not computed yet, with the set of (not computed)
+            stages each of them depends on.
+        """
+        graph = {}
+        pending = [name for name in names if not self.is_computed(name)]
+        while len(pending) > 0:
+            name = pending.pop()
+            if name in graph:
+                continue
+            graph[name] = set(dep for dep in self.dependencies(name)
+                              if not self.is_computed(dep))
+            pending += list(graph[name])
+        return graph
+
+    def compute(self, names, n_threads=1):
+        """Computes the given stages (and the stages they depend on),
+        running the independent ones in parallel.
+
+        Every stage is submitted to a pool of threads as soon as all the
+        stages it depends on are computed.
+
+        Parameters
+        ----------
+        names: list
+            Names of the stages to compute.
+        n_threads: int
+            Number of threads (1 to compute them serially).
+        """
+        graph = self.get_graph(names)
+        if n_threads <= 1 or len(graph) <= 1:
+            for name in names:
+                self.get(name)
+            return
+
+        finished = queue.Queue()
+        pool = ThreadPool(min(n_threads, len(graph)))
+        try:
+            n_running = 0
+            while len(graph) > 0 or n_running > 0:
+                ready = [name for name, deps in graph.items()
+                         if len(deps) == 0]
+                for name in ready:
+                    del graph[name]
+                    pool.apply_async(self._run_stage, (name,),
+                                     callback=finished.put)
+                    n_running += 1
+                name, exc_info = finished.get()
+                n_running -= 1
+                if exc_info is not None:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                for deps in graph.values():
+                    deps.discard(name)
+        finally:
+            # Wait for the running stages, even if one of them failed
+            pool.close()
+            pool.join()
+
+    def _run_stage(self, name):
+        """Computes a stage in a worker thread, returning the exception
+        info (if any) to be raised in the calling thread."""
+        try:
+            self.get(name)
+            return name, None
+        except Exception:
+            return name, sys.exc_info()
+
+    def _compute_hpss(self):
+        logging.info("Computing Harmonic Percussive source separation...")
+        return librosa.effects.hpss(self.get("audio"))
+
+    def _compute_harmonic(self):
+        return self.get("hpss")[0]
+
+    def _compute_percussive(self):
+        return self.get("hpss")[1]
+
+    def _compute_hpss_spectrum(self):
+        logging.info("Computing spectral Harmonic Percussive source "
+                     "separation...")
+        # Same analysis as librosa.effects.hpss, with twice as many frames
+        # as the features (only if the hop size allows it)
+        hop_length = msaf.Anal.hop_size
+        if hop_length % 2 == 0:
+            hop_length //= 2
+        D = librosa.stft(self.get("audio"), hop_length=hop_length)
+        H, P = librosa.decompose.hpss(D)
+        step = msaf.Anal.hop_size // hop_length
+        return H[:, ::step], P[:, ::step]
+
+    def _compute_harmonic_spectrum(self):
+        return self.get("hpss_spectrum")[0]
+
+    def _compute_percussive_spectrum(self):
+        return self.get("hpss_spectrum")[1]
+
+    def _compute_stft(self):
+        logging.info("Computing STFT...")
+        return librosa.stft(self.get("audio"), n_fft=msaf.Anal.frame_size,
+                            hop_length=msaf.Anal.hop_size)
+
+    def _compute_tuning(self):
+        return librosa.estimate_tuning(y=self.get("audio"), sr=self.sr)
+
+    def _compute_harmonic_tuning(self):
+        if self.hpss_mode == "spectral":
+            return librosa.estimate_tuning(
+                S=np.abs(self.get("harmonic_spectrum")), sr=self.sr)
+        return librosa.estimate_tuning(y=self.get("harmonic"), sr=self.sr)
+
+    def _compute_mel(self):
+        logging.info("Computing Spectrogram...")
+        return librosa.feature.melspectrogram(S=np.abs(self.get("stft")) ** 2,
+                                              sr=self.sr,
+                                              n_mels=msaf.Anal.n_mels)
+
+    def _compute_mel_db(self):
+        return librosa.logamplitude(self.get("mel"), top_db=None)
+
+    def _compute_percussive_mel_db(self):
+        # Same spectrogram that librosa uses to track the beats
+        if self.hpss_mode == "spectral":
+            S = librosa.feature.melspectrogram(
+                S=np.abs(self.get("percussive_spectrum")) ** 2, sr=self.sr)
+            return librosa.logamplitude(S, top_db=None)
+        S = librosa.feature.melspectrogram(y=self.get("percussive"),
+                                           sr=self.sr,
+                                           hop_length=msaf.Anal.hop_size)
+        return librosa.logamplitude(S, top_db=None)
+
+    def _compute_cqt_spectrum(self):
+        logging.info("Computing Constant-Q...")
+        return np.abs(librosa.cqt(self.get("audio"),
+                                  sr=self.sr,
+                                  hop_length=msaf.Anal.hop_size,
+                                  fmin=librosa.note_to_hz("C1"),
+                                  n_bins=msaf.Anal.cqt_bins,
+                                  tuning=self.get("tuning"),
+                                  real=False))
+
+    def _compute_cqt_db(self):
+        return librosa.logamplitude(self.get("cqt_spectrum") ** 2,
+                                    top_db=None)
+
+    def _compute_mfcc(self):
+        logging.info("Computing MFCCs...")
+        return db_to_mfcc(scale_db(self.get("mel_db").T))
+
+    def _compute_cqt(self):
+        return scale_db(self.get("cqt_db").T)
+
+    def _compute_hpcp(self):
+        logging.info("Computing HPCPs...")
+        if self.chroma_from_cqt:
+            return librosa.feature.chroma_cqt(C=self.get("cqt_spectrum"),
+                                              sr=self.sr,
+                                              hop_length=msaf.Anal.hop_size,
+                                              fmin=librosa.note_to_hz("C1"),
+                                              bins_per_octave=12).T
+        if self.hpss_mode == "spectral":
+            return librosa.feature.chroma_stft(
+                S=np.abs(self.get("harmonic_spectrum")) ** 2, sr=self.sr,
+                tuning=self.get("harmonic_tuning")).T
+        return librosa.feature.chroma_cqt(y=self.get("harmonic"),
+                                          sr=self.sr,
+                                          hop_length=msaf.Anal.hop_size,
+                                          n_octaves=msaf.Anal.n_octaves,
+                                          fmin=msaf.Anal.f_min,
+                                          tuning=self.get("harmonic_tuning")).T
+
+    def _compute_tonnetz(self):
+        logging.info("Computing Tonnetz...")
+        return utils.chroma_to_tonnetz(self.get("hpcp"))
+
+    def _compute_beats(self):
+        if self.hpss_mode == "spectral":
+            onset_envelope = compute_onset_envelope(
+                self.get("percussive_mel_db"), sr=self.sr)
+            return compute_beats(None, sr=self.sr,
+                                 onset_envelope=onset_envelope)
+        return compute_beats(self.get("percussive"), sr=self.sr)
+
+
 def compute_features(audio, y_harmonic):
     """Computes the HPCP and MFCC features.
 
@@ -76,115 +479,349 @@ def compute_features(audio, y_harmonic):
     cqt: np.array(N, msaf.Anal.cqt_bins)
         Constant-Q log-scale features.
     """
-    logging.info("Computing Spectrogram...")
-    S = librosa.feature.melspectrogram(audio,
-                                       sr=msaf.Anal.sample_rate,
-                                       n_fft=msaf.Anal.frame_size,
-                                       hop_length=msaf.Anal.hop_size,
-                                       n_mels=msaf.Anal.n_mels)
-
-    logging.info("Computing Constant-Q...")
-    cqt = librosa.logamplitude(np.abs(
-        librosa.cqt(audio,
-                    sr=msaf.Anal.sample_rate,
-                    hop_length=msaf.Anal.hop_size,
-                    n_bins=msaf.Anal.cqt_bins,
-                    real=False)) ** 2,
-        ref_power=np.max).T
-
-    logging.info("Computing MFCCs...")
-    log_S = librosa.logamplitude(S, ref_power=np.max)
-    mfcc = librosa.feature.mfcc(S=log_S, n_mfcc=msaf.Anal.mfcc_coeff).T
-
-    logging.info("Computing HPCPs...")
-    hpcp = librosa.feature.chroma_cqt(y=y_harmonic,
-                                      sr=msaf.Anal.sample_rate,
-                                      hop_length=msaf.Anal.hop_size,
-                                      n_octaves=msaf.Anal.n_octaves,
-                                      fmin=msaf.Anal.f_min).T
-
-    logging.info("Computing Tonnetz...")
-    tonnetz = utils.chroma_to_tonnetz(hpcp)
-    return mfcc, hpcp, tonnetz, cqt
-
-
-def save_features(out_file, features):
-    """Saves the features into the specified file using the JSON format.
+    engine = FeatureEngine(audio, harmonic=y_harmonic)
+    return engine.get("mfcc"), engine.get("hpcp"), engine.get("tonnetz"), \
+        engine.get("cqt")
 
-    Parameters
-    ----------
-    out_file: str
-        Path to the output file to be saved.
-    features: dict
-        Dictionary containing the features.
+
+def get_analysis_params():
+    """Gets the current analysis parameters, as stored in the features file.
+
+    Returns
+    -------
+    anal: dict
+        Dictionary with the analysis parameters of `msaf.Anal`.
     """
-    logging.info("Saving the JSON file in %s" % out_file)
-    out_json = {"metadata": {"version": {"librosa": librosa.__version__}}}
-    out_json["analysis"] = {
-        "dur": features["anal"]["dur"],
+    return {
         "frame_rate": msaf.Anal.frame_size,
         "hop_size": msaf.Anal.hop_size,
         "mfcc_coeff": msaf.Anal.mfcc_coeff,
         "n_mels": msaf.Anal.n_mels,
         "sample_rate": msaf.Anal.sample_rate,
-        "window_type": msaf.Anal.window_type
+        "window_type": msaf.Anal.window_type,
+        "n_octaves": msaf.Anal.n_octaves,
+        "f_min": msaf.Anal.f_min,
+        "cqt_bins": msaf.Anal.cqt_bins,
+        "chroma_from_cqt": msaf.Anal.chroma_from_cqt,
+        "hpss_mode": msaf.Anal.hpss_mode,
+        "resample_type": msaf.Anal.resample_type
     }
-    out_json["beats"] = {
-        "times": features["beats"].tolist()
+
+
+def _changed_params(stored_anal, params):
+    """Returns the given analysis parameters whose stored value differs from
+    the current one. Parameters that were not stored (i.e., features
+    computed by older versions of MSAF) are assumed to be up to date."""
+    current_anal = get_analysis_params()
+    return [param for param in params if param in stored_anal and
+            stored_anal[param] != current_anal[param]]
+
+
+def find_stale_features(stored_anal, feat_names):
+    """Finds the features that have to be computed again because the
+    analysis parameters they depend on have changed.
+
+    Parameters
+    ----------
+    stored_anal: dict
+        Analysis parameters stored in the features file.
+    feat_names: list
+        Names of the stored features.
+
+    Returns
+    -------
+    stale_beats: bool
+        Whether the beats are stale, in which case all the features are.
+    stale_feats: list
+        Names of the stale features.
+    """
+    if len(_changed_params(stored_anal, BEATS_ANAL_PARAMS)) > 0:
+        return True, list(feat_names)
+    stale_feats = [feat_name for feat_name in feat_names
+                   if len(_changed_params(
+                       stored_anal, FEATS_ANAL_PARAMS[feat_name])) > 0]
+    return False, stale_feats
+
+
+def compute_beats_digest(beat_times):
+    """Computes a digest of the given beat times, to find out whether the
+    beat annotations of a track changed since its features were computed.
+
+    Parameters
+    ----------
+    beat_times: np.array
+        Beat times, in seconds.
+
+    Returns
+    -------
+    digest: str
+        Hexadecimal MD5 digest of the beat times.
+    """
+    beat_times = np.ascontiguousarray(beat_times, dtype=np.float64)
+    return hashlib.md5(beat_times.tobytes()).hexdigest()
+
+
+def save_features(out_file, features, update=False, remove_sections=None):
+    """Saves the features into the specified file. Features are stored in a
+    binary feature store, unless the output file has the legacy JSON
+    extension.
+
+    Parameters
+    ----------
+    out_file: str
+        Path to the output file to be saved.
+    features: dict
+        Dictionary containing the features.
+    update: bool
+        Whether to add the features to an existing feature store, keeping the
+        ones that it already contains.
+    remove_sections: list
+        Sections to remove from the existing feature store when updating it
+        (e.g., ["ann_beatsync"] when the beat annotations no longer exist).
+    """
+    out_feats = {"metadata": {"version": {"librosa": librosa.__version__}}}
+    if features.get("ann_beats_digest") is not None:
+        out_feats["metadata"]["ann_beats_digest"] = \
+            features["ann_beats_digest"]
+    out_feats["analysis"] = get_analysis_params()
+    out_feats["analysis"]["dur"] = features["anal"]["dur"]
+    out_feats["beats"] = {
+        "times": features["beats"]
     }
-    out_json["timestamp"] = \
+    out_feats["timestamp"] = \
         datetime.datetime.today().strftime("%Y/%m/%d %H:%M:%S")
-    out_json["framesync"] = {
-        "mfcc": features["mfcc"].tolist(),
-        "hpcp": features["hpcp"].tolist(),
-        "tonnetz": features["tonnetz"].tolist(),
-        "cqt": features["cqt"].tolist()
-    }
-    out_json["est_beatsync"] = {
-        "mfcc": features["bs_mfcc"].tolist(),
-        "hpcp": features["bs_hpcp"].tolist(),
-        "tonnetz": features["bs_tonnetz"].tolist(),
-        "cqt": features["bs_cqt"].tolist()
-    }
-    try:
-        out_json["ann_beatsync"] = {
-            "mfcc": features["ann_mfcc"].tolist(),
-            "hpcp": features["ann_hpcp"].tolist(),
-            "tonnetz": features["ann_tonnetz"].tolist(),
-            "cqt": features["ann_cqt"].tolist()
-        }
-    except:
+    for section in io.FEATURES_SECTIONS:
+        prefix = SECTION_PREFIXES[section]
+        section_feats = {}
+        for feat_name in msaf.AVAILABLE_FEATS:
+            if prefix + feat_name in features:
+                section_feats[feat_name] = features[prefix + feat_name]
+        if len(section_feats) > 0:
+            out_feats[section] = section_feats
+    if "ann_beatsync" not in out_feats:
         logging.warning("No annotated beats")
 
     # Actual save
-    with open(out_file, "w") as f:
-        json.dump(out_json, f, indent=2)
+    if io.is_legacy_features_file(out_file):
+        logging.info("Saving the JSON file in %s" % out_file)
+        out_json = {}
+        for key, value in out_feats.items():
+            if key in ["beats"] + io.FEATURES_SECTIONS:
+                value = dict((name, np.asarray(values).tolist())
+                             for name, values in value.items())
+            out_json[key] = value
+        with open(out_file, "w") as f:
+            json.dump(out_json, f, indent=2)
+    elif update:
+        logging.info("Updating the feature store in %s" % out_file)
+        io.update_features_store(out_file, out_feats,
+                                 remove_sections=remove_sections)
+    else:
+        logging.info("Saving the feature store in %s" % out_file)
+        io.write_features_store(out_file, out_feats)
+
+
+def sync_features(features, beats_idx, feat_names):
+    """Computes the beat-synchronous version of the given features.
+
+    Parameters
+    ----------
+    features: dict
+        Dictionary containing the framesync features.
+    beats_idx: np.array
+        Indeces in frames of the beats.
+    feat_names: list
+        Names of the features to synchronize.
+
+    Returns
+    -------
+    sync_feats: dict
+        Dictionary with the beat-synchronous features.
+    """
+    return sync_features_grids(features, {"beats": beats_idx},
+                               feat_names)["beats"]
+
+
+def sync_features_grids(features, grids, feat_names, aggregate="mean"):
+    """Computes the synchronous version of the given features for multiple
+    grids (e.g., estimated and annotated beats) at once.
+
+    All the features are stacked into a single matrix, and the frames of each
+    segment between consecutive indices of a grid are aggregated for all of
+    them at once (using `np.add.reduceat` for the mean). The results are the
+    same as those of `librosa.feature.sync` (with `pad=True`), truncated to
+    the number of indices of each grid.
+
+    Parameters
+    ----------
+    features: dict
+        Dictionary containing the framesync features.
+    grids: dict
+        Indeces in frames of each grid (e.g., {"beats": beats_idx,
+        "ann_beats": annot_beats_idx}).
+    feat_names: list
+        Names of the features to synchronize.
+    aggregate: str
+        Aggregation of the frames of each segment ("mean" or "median").
+
+    Returns
+    -------
+    sync_feats: dict
+        Dictionary with the synchronous features for each grid (e.g.,
+        `sync_feats["beats"]["mfcc"]`), all of them views of a single
+        buffer.
+    """
+    if aggregate not in ["mean", "median"]:
+        raise ValueError("Unknown aggregation %s" % aggregate)
+    if len(feat_names) == 0:
+        return dict((grid_name, {}) for grid_name in grids)
+    X = np.hstack([features[feat_name] for feat_name in feat_names])
+    n_frames = X.shape[0]
+
+    # Segment boundaries of each grid, padded to span all the frames
+    grid_names = list(grids.keys())
+    bounds = []
+    for grid_name in grid_names:
+        idx = np.clip(np.asarray(grids[grid_name], dtype=int), 0, n_frames)
+        grid_bounds = np.unique(np.concatenate(([0, n_frames], idx)))
+        bounds.append(grid_bounds[:len(idx) + 1])
+
+    sync_X = np.empty((sum(len(b) - 1 for b in bounds), X.shape[1]),
+                      dtype=X.dtype)
+    rows = {}
+    start_row = 0
+    for grid_name, grid_bounds in zip(grid_names, bounds):
+        n_segments = len(grid_bounds) - 1
+        rows[grid_name] = slice(start_row, start_row + n_segments)
+        start_row += n_segments
+        if n_segments == 0:
+            continue
+        if aggregate == "mean":
+            # The last segment runs until the last bound (not the last frame)
+            starts = grid_bounds if grid_bounds[-1] < n_frames \
+                else grid_bounds[:-1]
+            sync_X[rows[grid_name]] = \
+                np.add.reduceat(X, starts, axis=0)[:n_segments] / \
+                np.diff(grid_bounds)[:, np.newaxis]
+        else:
+            for i in range(n_segments):
+                sync_X[rows[grid_name].start + i] = np.median(
+                    X[grid_bounds[i]:grid_bounds[i + 1]], axis=0)
+
+    # Views of each feature and grid
+    sync_feats = dict((grid_name, {}) for grid_name in grid_names)
+    start_col = 0
+    for feat_name in feat_names:
+        cols = slice(start_col, start_col + features[feat_name].shape[1])
+        start_col = cols.stop
+        for grid_name in grid_names:
+            sync_feats[grid_name][feat_name] = sync_X[rows[grid_name], cols]
+    return sync_feats
 
 
 def compute_beat_sync_features(features, beats_idx):
     """Given a dictionary of features, and the estimated index frames,
     calculate beat-synchronous features."""
-    pad = True
-    bs_mfcc = librosa.feature.sync(features["mfcc"].T, beats_idx, pad=pad).T
-    bs_hpcp = librosa.feature.sync(features["hpcp"].T, beats_idx, pad=pad).T
-    bs_tonnetz = librosa.feature.sync(features["tonnetz"].T, beats_idx,
-                                      pad=pad).T
-    bs_cqt = librosa.feature.sync(features["cqt"].T, beats_idx, pad=pad).T
-
-    # Make sure we have the right size (remove last frame if needed)
-    bs_mfcc = bs_mfcc[:len(beats_idx), :]
-    bs_hpcp = bs_hpcp[:len(beats_idx), :]
-    bs_tonnetz = bs_tonnetz[:len(beats_idx), :]
-    bs_cqt = bs_cqt[:len(beats_idx), :]
-    return bs_mfcc, bs_hpcp, bs_tonnetz, bs_cqt
-
-
-def compute_features_for_audio_file(audio_file):
+    sync_feats = sync_features(features, beats_idx,
+                               ["mfcc", "hpcp", "tonnetz", "cqt"])
+    return sync_feats["mfcc"], sync_feats["hpcp"], sync_feats["tonnetz"], \
+        sync_feats["cqt"]
+
+
+def sync_all_grids(features, feat_names, annot_beats=None):
+    """Synchronizes the features to the estimated beats and, if given, to
+    the annotated beats, in a single pass (see `sync_features_grids`).
+
+    The synchronous features are added to `features`, with the prefixes
+    "bs_" (estimated beats) and "ann_" (annotated beats).
+
+    Parameters
+    ----------
+    features: dict
+        Dictionary containing the framesync features, and the frame indices
+        of the estimated beats (`beats_idx`).
+    feat_names: list
+        Names of the features to synchronize.
+    annot_beats: np.array
+        Times of the annotated beats (`None` if there are none).
+    """
+    grids = {"bs_": features["beats_idx"]}
+    if annot_beats is not None:
+        grids["ann_"] = librosa.time_to_frames(
+            annot_beats, sr=msaf.Anal.sample_rate,
+            hop_length=msaf.Anal.hop_size)
+    sync_feats = sync_features_grids(features, grids, feat_names)
+    for prefix, grid_feats in sync_feats.items():
+        for feat_name in feat_names:
+            features[prefix + feat_name] = grid_feats[feat_name]
+
+
+def read_annot_beats(ref_file):
+    """Reads the annotated beats of a track, if they exist.
+
+    Parameters
+    ----------
+    ref_file: str
+        Path to the references file (JAMS).
+
+    Returns
+    -------
+    annot_beats_times: np.array
+        Times in seconds of the annotated beats. `None` if there are no
+        beat annotations.
+    """
+    if not os.path.isfile(ref_file):
+        return None
+    jam = jams.load(ref_file)
+    beat_annot = jam.search(namespace="beat.*")
+    if len(beat_annot) == 0:
+        return None
+
+    logging.info("Reading beat annotations from JAMS")
+    annot_beats_inters, _ = beat_annot[0].data.to_interval_values()
+    return annot_beats_inters[:, 0]
+
+
+def times_to_beats(beat_times):
+    """Gets the frame indeces of previously estimated beats.
+
+    Parameters
+    ----------
+    beat_times: np.array
+        Times of the beats, in seconds.
+
+    Returns
+    -------
+    beats_idx: np.array
+        Indeces in frames of the beats.
+    beats_times: np.array
+        Time of the beats.
+    """
+    beat_times = np.asarray(beat_times)
+    beats_idx = np.round(beat_times * msaf.Anal.sample_rate /
+                         msaf.Anal.hop_size).astype(int)
+    return beats_idx, beat_times
+
+
+def compute_features_for_audio_file(audio_file, feat_names=None,
+                                    beats=None, n_threads=1,
+                                    annot_beats=None):
     """
     Parameters
     ----------
     audio_file: str
         Path to the audio file.
+    feat_names: list
+        Names of the features to compute (`None` for all of them, see
+        `msaf.AVAILABLE_FEATS`).
+    beats: np.array
+        Previously estimated beat times. `None` to estimate them.
+    n_threads: int
+        Number of threads to compute the independent stages of the
+        extraction in parallel.
+    annot_beats: np.array
+        Times of the annotated beats, to also synchronize the features to
+        them (`None` to skip it).
 
     Returns
     -------
@@ -193,47 +830,458 @@ def compute_features_for_audio_file(audio_file):
     """
     # Load Audio
     logging.info("Loading audio file %s" % os.path.basename(audio_file))
-    audio, sr = librosa.load(audio_file, sr=msaf.Anal.sample_rate)
+    audio, sr = io.load_audio(audio_file, sr=msaf.Anal.sample_rate)
+
+    return compute_features_for_signal(audio, sr, feat_names=feat_names,
+                                       beats=beats, n_threads=n_threads,
+                                       annot_beats=annot_beats)
+
+
+def compute_features_for_signal(audio, sr, feat_names=None, beats=None,
+                                n_threads=1, annot_beats=None):
+    """Computes the features of an audio signal that is already in memory,
+    without reading or writing any file.
+
+    Parameters
+    ----------
+    audio: np.array(N) or np.array(n_channels, N)
+        Audio samples, as floats in [-1, 1] or as integer PCM. Multichannel
+        signals are mixed down to mono.
+    sr: int
+        Sampling rate of the signal. It is resampled to
+        `msaf.Anal.sample_rate` if different (see `io.resample`).
+    feat_names: list
+        Names of the features to compute (`None` for all of them, see
+        `msaf.AVAILABLE_FEATS`).
+    beats: np.array
+        Previously estimated beat times. `None` to estimate them.
+    n_threads: int
+        Number of threads to compute the independent stages of the
+        extraction in parallel.
+    annot_beats: np.array
+        Times of the annotated beats, to also synchronize the features to
+        them (`None` to skip it).
+
+    Returns
+    -------
+    features: dict
+        Dictionary of audio features, as returned by
+        `compute_features_for_audio_file`.
+    """
+    if feat_names is None:
+        feat_names = msaf.AVAILABLE_FEATS
 
-    # Compute harmonic-percussive source separation
-    logging.info("Computing Harmonic Percussive source separation...")
-    y_harmonic, y_percussive = librosa.effects.hpss(audio)
+    # Prepare the signal as librosa.load would
+    audio = np.asarray(audio)
+    if np.issubdtype(audio.dtype, np.integer):
+        audio = audio / float(np.iinfo(audio.dtype).max + 1)
+    audio = librosa.to_mono(np.asarray(audio, dtype=np.float32))
+    if sr != msaf.Anal.sample_rate:
+        audio = io.resample(audio, sr, msaf.Anal.sample_rate)
 
     # Output features dict
     features = {}
 
-    # Compute framesync features
-    features["mfcc"], features["hpcp"], features["tonnetz"], \
-        features["cqt"] = compute_features(audio, y_harmonic)
+    # Compute framesync features, sharing the time-frequency representations
+    engine = FeatureEngine(audio)
+    engine.compute(list(feat_names) + (["beats"] if beats is None else []),
+                   n_threads)
+    for feat_name in feat_names:
+        features[feat_name] = np.asarray(engine.get(feat_name),
+                                         dtype=msaf.Anal.dtype)
 
     # Estimate Beats
-    features["beats_idx"], features["beats"] = compute_beats(
-        y_percussive, sr=msaf.Anal.sample_rate)
+    if beats is None:
+        features["beats_idx"], features["beats"] = engine.get("beats")
+    else:
+        features["beats_idx"], features["beats"] = times_to_beats(beats)
 
     # Compute Beat-sync features
-    features["bs_mfcc"], features["bs_hpcp"], features["bs_tonnetz"], \
-        features["bs_cqt"] = compute_beat_sync_features(features,
-                                                        features["beats_idx"])
+    sync_all_grids(features, feat_names, annot_beats)
 
     # Analysis parameters
-    features["anal"] = {}
-    features["anal"]["frame_rate"] = msaf.Anal.frame_size
-    features["anal"]["hop_size"] = msaf.Anal.hop_size
-    features["anal"]["mfcc_coeff"] = msaf.Anal.mfcc_coeff
-    features["anal"]["sample_rate"] = msaf.Anal.sample_rate
-    features["anal"]["window_type"] = msaf.Anal.window_type
-    features["anal"]["n_mels"] = msaf.Anal.n_mels
+    features["anal"] = get_analysis_params()
     features["anal"]["dur"] = audio.shape[0] / float(msaf.Anal.sample_rate)
 
     return features
 
 
+def _overlapping_blocks(chunks, block_length, pad):
+    """Splits a signal, given as an iterable of consecutive chunks, into
+    blocks of `block_length` samples with `pad` samples of context at each
+    side (clipped to the edges of the signal).
+
+    Yields
+    ------
+    window: np.array
+        Samples of the block, including its context.
+    offset: int
+        Index of the first sample of the block in the window.
+    is_last: bool
+        Whether it's the last block of the signal (in which case it includes
+        all the remaining samples).
+    """
+    chunks = iter(chunks)
+    buf = np.zeros(0, dtype=np.float32)
+    buf_start = 0   # Index of the first sample of the buffer in the signal
+    start = 0       # Index of the first sample of the block in the signal
+    exhausted = False
+    while True:
+        end = start + block_length + pad
+        pending = [buf]
+        n_available = buf_start + len(buf)
+        while not exhausted and n_available < end:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                exhausted = True
+                break
+            pending.append(chunk)
+            n_available += len(chunk)
+        buf = np.concatenate(pending)
+
+        is_last = exhausted and start + block_length >= n_available
+        window_start = max(0, start - pad)
+        yield buf[window_start - buf_start:end - buf_start], \
+            start - window_start, is_last
+        if is_last:
+            return
+
+        # Forget the samples that won't be needed anymore
+        start += block_length
+        drop = max(0, start - pad) - buf_start
+        buf = buf[drop:]
+        buf_start += drop
+
+
+def _decode_native(audio_file):
+    """Decodes an audio file as consecutive mono chunks at its native
+    sample rate."""
+    with audioread.audio_open(os.path.realpath(audio_file)) as f:
+        n_channels = f.channels
+        rest = np.zeros(0, dtype=np.float32)
+        for buf in f:
+            samples = np.concatenate([rest, librosa.util.buf_to_float(buf)])
+            n_samples = len(samples) - len(samples) % n_channels
+            samples, rest = samples[:n_samples], samples[n_samples:]
+            if n_channels > 1:
+                samples = librosa.to_mono(samples.reshape((-1, n_channels)).T)
+            yield samples
+
+
+def stream_audio(audio_file, sr):
+    """Decodes an audio file as consecutive mono chunks at the given sample
+    rate, like `librosa.load` but without keeping the whole signal in
+    memory. Decoded blocks are resampled with some context at each side, and
+    aligned such that they start at integer positions at both rates. If the
+    decoded audio is in the cache, the chunks are read from it instead.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    sr: int
+        Target sample rate.
+
+    Yields
+    ------
+    chunk: np.array
+        Consecutive samples of the audio signal.
+    """
+    if cache.is_audio_enabled():
+        y = cache.fetch_audio(audio_file, sr)
+        if y is not None:
+            block_length = int(msaf.Anal.stream_block_dur * sr)
+            for start in range(0, len(y), block_length):
+                yield y[start:start + block_length]
+            return
+
+    sr_native = io.read_audio_sample_rate(audio_file)
+    if sr_native == sr:
+        for chunk in _decode_native(audio_file):
+            yield chunk
+        return
+
+    # Blocks of `step` native samples have exactly `ratio.numerator` samples
+    # at the target sample rate
+    ratio = fractions.Fraction(sr, sr_native)
+    step = ratio.denominator
+    block_length = int(np.ceil(msaf.Anal.stream_block_dur * sr_native /
+                               step)) * step
+    pad = int(np.ceil(STREAM_RESAMPLE_PAD * sr_native / step)) * step
+    for window, offset, is_last in _overlapping_blocks(
+            _decode_native(audio_file), block_length, pad):
+        y = io.resample(window, sr_native, sr)
+        start = offset // step * ratio.numerator
+        if is_last:
+            yield y[start:]
+        else:
+            yield y[start:start + block_length // step * ratio.numerator]
+
+
+def _map_rows(values, out_file, fun, n_rows):
+    """Applies a function to blocks of rows of an array, writing the results
+    into an `.npy` file."""
+    appender = io.NpyAppender(out_file, dtype=msaf.Anal.dtype)
+    for i in range(0, values.shape[0], n_rows):
+        appender.append(fun(np.asarray(values[i:i + n_rows])))
+    appender.close()
+
+
+class TuningAccumulator(object):
+    """Estimates the tuning of a signal from the pitches of consecutive
+    blocks of it, like `librosa.estimate_tuning` on the whole signal (whose
+    magnitude threshold is the median of all the pitched peaks).
+
+    The peaks are written to an `.npy` file, so that they are not kept in
+    memory.
+    """
+    def __init__(self, npy_file):
+        """Inits the accumulator.
+
+        Parameters
+        ----------
+        npy_file: str
+            Path to the `.npy` file to write the peaks into.
+        """
+        self.appender = io.NpyAppender(npy_file)
+
+    def append(self, pitches, mags):
+        """Appends the pitched peaks of some frames (see
+        `librosa.piptrack`)."""
+        mask = pitches > 0
+        residuals = np.mod(12 * librosa.hz_to_octs(pitches[mask]), 1.0)
+        residuals[residuals >= 0.5] -= 1.0
+        self.appender.append(np.column_stack([mags[mask], residuals]))
+
+    def estimate(self):
+        """Estimates the tuning of the whole signal.
+
+        Returns
+        -------
+        tuning: float in `[-0.5, 0.5)`
+            Estimated tuning deviation (fractions of a bin).
+        """
+        self.appender.close()
+        peaks = np.load(self.appender.npy_file)
+        os.remove(self.appender.npy_file)
+        if len(peaks) == 0:
+            return 0.0
+        residuals = peaks[peaks[:, 0] >= np.median(peaks[:, 0]), 1]
+
+        # Same histogram as `librosa.pitch_tuning`, in cents
+        bins = np.linspace(-0.5, 0.5, 100, endpoint=False)
+        counts, tuning = np.histogram(residuals, bins)
+        return tuning[np.argmax(counts)]
+
+
+def stream_features_for_audio_file(audio_file, work_dir, feat_names=None,
+                                   beats=None, n_threads=1, annot_beats=None):
+    """Computes the features of an audio file in blocks of
+    `msaf.Anal.stream_block_dur` seconds, such that the memory needed does
+    not depend on the length of the audio signal.
+
+    The results match `compute_features_for_audio_file` within tolerance:
+    each block is analyzed with enough context at each side for its frames
+    to be the same as if the whole signal was available, the dB scales are
+    referenced to the maximum of the whole track in a final pass, and the
+    beats are tracked on the onset envelope of the whole track. The tunings
+    of the constant-Q and chroma features are also estimated from the whole
+    track, so these features are computed in a second pass over the audio
+    (the harmonic components of the blocks are kept in `work_dir` in
+    between).
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    work_dir: str
+        Path to an empty directory where the features are written.
+    feat_names: list
+        Names of the features to compute (`None` for all of them, see
+        `msaf.AVAILABLE_FEATS`).
+    beats: np.array
+        Previously estimated beat times. `None` to estimate them.
+    n_threads: int
+        Number of threads to compute the independent stages of each block
+        in parallel.
+    annot_beats: np.array
+        Times of the annotated beats, to also synchronize the features to
+        them (`None` to skip it).
+
+    Returns
+    -------
+    features: dict
+        Dictionary of audio features. Framesync features are memory-mapped
+        from `work_dir`.
+    """
+    if feat_names is None:
+        feat_names = msaf.AVAILABLE_FEATS
+    sr = msaf.Anal.sample_rate
+    hop = msaf.Anal.hop_size
+    n_frames = max(1, int(round(msaf.Anal.stream_block_dur * sr / hop)))
+    block_length = n_frames * hop
+    pad = int(np.ceil(STREAM_PAD / float(hop))) * hop
+
+    # Stages of the feature engine written for each block, in the first pass
+    # and, if they depend on the tuning of the whole track, in the second one
+    stages = []
+    tuned_stages = []
+    if "mfcc" in feat_names:
+        stages.append("mel_db")
+    if "cqt" in feat_names:
+        tuned_stages.append("cqt_db")
+    if "hpcp" in feat_names or "tonnetz" in feat_names:
+        tuned_stages.append("hpcp")
+    if "tonnetz" in feat_names:
+        tuned_stages.append("tonnetz")
+    if beats is None:
+        stages.append("percussive_mel_db")
+    appenders = dict((stage, io.NpyAppender(
+        os.path.join(work_dir, stage + ".npy"),
+        dtype=np.float64 if stage.endswith("_db") else msaf.Anal.dtype))
+        for stage in stages + tuned_stages)
+    max_db = {}
+
+    # Tunings of the second pass, with the stage of the first pass (and the
+    # hop of its frames) that they are estimated from
+    tuning_sources = {}
+    chroma_from_cqt = msaf.Anal.chroma_from_cqt
+    if "cqt_db" in tuned_stages or ("hpcp" in tuned_stages and
+                                    chroma_from_cqt):
+        tuning_sources["tuning"] = ("audio", 2048 // 4)
+    if "hpcp" in tuned_stages and not chroma_from_cqt:
+        if msaf.Anal.hpss_mode == "spectral":
+            tuning_sources["harmonic_tuning"] = ("harmonic_spectrum", hop)
+        else:
+            tuning_sources["harmonic_tuning"] = ("harmonic", 2048 // 4)
+    accumulators = dict((name, TuningAccumulator(
+        os.path.join(work_dir, name + "_peaks.npy")))
+        for name in tuning_sources)
+
+    def iter_blocks():
+        for i, (window, offset, is_last) in enumerate(_overlapping_blocks(
+                stream_audio(audio_file, sr), block_length, pad)):
+            first_frame = offset // hop
+            last_frame = None if is_last else first_frame + n_frames
+            yield i, window, offset, first_frame, last_frame
+
+    def append_block(engine, stages, first_frame, last_frame):
+        for stage in stages:
+            values = engine.get(stage)
+            if stage.endswith("_db"):
+                values = values.T
+            values = values[first_frame:last_frame]
+            if stage.endswith("_db") and len(values) > 0:
+                max_db[stage] = max(max_db.get(stage, -np.inf),
+                                    np.max(values))
+            appenders[stage].append(values)
+
+    def source_file(i, source):
+        return os.path.join(work_dir, "%s_%d.npy" % (source, i))
+
+    logging.info("Streaming audio file %s" % os.path.basename(audio_file))
+    n_samples = 0
+    for i, window, offset, first_frame, last_frame in iter_blocks():
+        engine = FeatureEngine(window, sr=sr)
+        sources = [source for source, _ in tuning_sources.values()]
+        engine.compute(stages + sources, n_threads)
+        append_block(engine, stages, first_frame, last_frame)
+
+        # Pitches of the frames of the block, to estimate the tunings
+        for name, (source, source_hop) in tuning_sources.items():
+            values = engine.get(source)
+            if source == "harmonic_spectrum":
+                values = np.abs(values)
+                pitches, mags = librosa.piptrack(S=values, sr=sr)
+            else:
+                pitches, mags = librosa.piptrack(y=values, sr=sr,
+                                                 n_fft=2048)
+            start = -(-offset // source_hop)
+            end = None if last_frame is None else \
+                -(-(offset + block_length) // source_hop)
+            accumulators[name].append(pitches[:, start:end],
+                                      mags[:, start:end])
+            if source != "audio":
+                np.save(source_file(i, source), values)
+        n_samples += len(window) - offset if last_frame is None \
+            else block_length
+
+    # Second pass, with the tunings of the whole track
+    if len(tuned_stages) > 0:
+        tunings = dict((name, accumulator.estimate())
+                       for name, accumulator in accumulators.items())
+        for i, window, offset, first_frame, last_frame in iter_blocks():
+            block_stages = dict(tunings)
+            for source, _ in tuning_sources.values():
+                if source != "audio":
+                    block_stages[source] = np.load(source_file(i, source))
+                    os.remove(source_file(i, source))
+            engine = FeatureEngine(window, sr=sr, **block_stages)
+            engine.compute(tuned_stages, n_threads)
+            append_block(engine, tuned_stages, first_frame, last_frame)
+    for appender in appenders.values():
+        appender.close()
+
+    def load(name):
+        return np.load(os.path.join(work_dir, name + ".npy"), mmap_mode="r")
+
+    # Scale the spectrograms with the maximum of the whole track
+    if "mfcc" in feat_names:
+        _map_rows(load("mel_db"), os.path.join(work_dir, "mfcc.npy"),
+                  lambda S: db_to_mfcc(scale_db(S, max_db["mel_db"])),
+                  n_frames)
+    if "cqt" in feat_names:
+        _map_rows(load("cqt_db"), os.path.join(work_dir, "cqt.npy"),
+                  lambda S: scale_db(S, max_db["cqt_db"]), n_frames)
+    features = {}
+    for feat_name in feat_names:
+        features[feat_name] = load(feat_name)
+
+    # Estimate Beats from the onset envelope of the whole track
+    if beats is None:
+        onset_envelope = compute_onset_envelope(
+            load("percussive_mel_db").T, sr=sr,
+            ref_db=max_db["percussive_mel_db"])
+        features["beats_idx"], features["beats"] = compute_beats(
+            None, sr=sr, onset_envelope=onset_envelope)
+    else:
+        features["beats_idx"], features["beats"] = times_to_beats(beats)
+
+    # Compute Beat-sync features
+    sync_all_grids(features, feat_names, annot_beats)
+
+    # Analysis parameters
+    features["anal"] = get_analysis_params()
+    features["anal"]["dur"] = n_samples / float(sr)
+
+    return features
+
+
+def use_streaming(audio_file):
+    """Whether the features of the given audio file should be computed in
+    blocks (see `msaf.Anal.stream_min_dur`)."""
+    return msaf.Anal.stream_min_dur is not None and \
+        io.read_audio_duration(audio_file) > msaf.Anal.stream_min_dur
+
+
 def compute_all_features(file_struct, sonify_beats=False, overwrite=False,
-                         out_beats="out_beats.wav"):
+                         out_beats="out_beats.wav", feat_names=None,
+                         n_threads=1):
     """Computes all the features for a specific audio file and its respective
         human annotations. It creates an audio file with the sonified estimated
         beats if needed.
 
+    If the global features cache is enabled (see `msaf.Cache`), missing
+    feature stores are first looked up in the cache, and the results are
+    stored back into it.
+
+    If the feature store of the file already exists, it is updated
+    incrementally: only the features that are missing or stale (i.e., their
+    analysis parameters changed) are computed, and the annotated
+    beat-synchronous features are only synchronized again (without computing
+    any audio feature) when the beat annotations changed.
+
     Parameters
     ----------
     file_struct: FileStruct
@@ -241,52 +1289,131 @@ def compute_all_features(file_struct, sonify_beats=False, overwrite=False,
     sonify_beats: bool
         Whether to sonify the beats.
     overwrite: bool
-        Whether to overwrite previous features JSON file.
+        Whether to overwrite previously computed features.
     out_beats: str
         Path to the new file containing the sonified beats.
+    feat_names: list
+        Names of the features to compute (`None` for all of them, see
+        `msaf.AVAILABLE_FEATS`).
+    n_threads: int
+        Number of threads to compute the independent stages of the
+        extraction in parallel.
     """
+    if feat_names is None:
+        feat_names = msaf.AVAILABLE_FEATS
 
     # Output file
     out_file = file_struct.features_file
 
-    if os.path.isfile(out_file) and not overwrite:
-        return  # Do nothing, file already exist and we are not overwriting it
+    # Look for the features of the same audio in the global cache
+    use_cache = cache.is_enabled() and \
+        not io.is_legacy_features_file(out_file)
+    if use_cache and not overwrite and not io.features_exist(out_file):
+        cache.fetch_features(file_struct.audio_file, get_analysis_params(),
+                             out_file)
+
+    # Check the features that were already computed
+    stored_feats = None
+    if io.features_exist(out_file) and not overwrite:
+        if io.is_legacy_features_file(io.resolve_features_file(out_file)):
+            return  # Do nothing, legacy files contain all the features
+        stored_feats = io.read_features_file(out_file)
+        stored_names = list(stored_feats.get("framesync", {}).keys())
+        stale_beats, stale_feats = find_stale_features(
+            stored_feats["analysis"], stored_names)
+        if stale_beats:
+            logging.info("Beats of %s are stale, computing all the features "
+                         "again" % out_file)
+            feat_names = sorted(set(feat_names) | set(stored_names),
+                                key=msaf.AVAILABLE_FEATS.index)
+            stored_feats = None
+
+    # Read annotations if they exist in path/references_dir/file.jams
+    annot_beats_times = read_annot_beats(file_struct.ref_file)
+    annot_beats_digest = None
+    if annot_beats_times is not None:
+        annot_beats_digest = compute_beats_digest(annot_beats_times)
+
+    # Plan the incremental update of the stored features
+    resync_feats = []
+    remove_sections = []
+    if stored_feats is not None:
+        feat_names = [feat_name for feat_name in msaf.AVAILABLE_FEATS
+                      if feat_name in stale_feats or
+                      (feat_name in feat_names and
+                       feat_name not in stored_names)]
+        if annot_beats_digest != \
+                stored_feats["metadata"].get("ann_beats_digest"):
+            resync_feats = [feat_name for feat_name in stored_names
+                            if feat_name not in feat_names]
+            if annot_beats_times is None and "ann_beatsync" in stored_feats:
+                remove_sections = ["ann_beatsync"]
+        if len(feat_names) == 0 and len(resync_feats) == 0 and \
+                len(remove_sections) == 0:
+            return  # Do nothing, features are up to date
+        logging.info("Updating %s: computing %s, synchronizing %s to the "
+                     "annotated beats" % (out_file, feat_names, resync_feats))
 
     # Compute the features for the given audio file
-    features = compute_features_for_audio_file(file_struct.audio_file)
+    work_dir = None
+    if stored_feats is None or len(feat_names) > 0:
+        beats = None
+        if stored_feats is not None:
+            beats = stored_feats["beats"]["times"]
+        if use_streaming(file_struct.audio_file):
+            work_dir = out_file + ".stream"
+            if os.path.exists(work_dir):
+                shutil.rmtree(work_dir)
+            os.makedirs(work_dir)
+            features = stream_features_for_audio_file(
+                file_struct.audio_file, work_dir, feat_names, beats=beats,
+                n_threads=n_threads, annot_beats=annot_beats_times)
+        else:
+            features = compute_features_for_audio_file(
+                file_struct.audio_file, feat_names, beats=beats,
+                n_threads=n_threads, annot_beats=annot_beats_times)
+    else:
+        features = {"beats": stored_feats["beats"]["times"],
+                    "anal": stored_feats["analysis"]}
+    features["ann_beats_digest"] = annot_beats_digest
 
     # Save output as audio file
     if sonify_beats:
         logging.info("Sonifying beats...")
         fs = 44100
-        audio, sr = librosa.load(file_struct.audio_file, sr=fs)
+        audio, sr = io.load_audio(file_struct.audio_file, sr=fs)
         msaf.utils.sonify_clicks(audio, features["beats"], out_beats, fs,
                                  offset=0.0)
 
-    # Read annotations if they exist in path/references_dir/file.jams
-    if os.path.isfile(file_struct.ref_file):
-        jam = jams.load(file_struct.ref_file)
-        beat_annot = jam.search(namespace="beat.*")
-
-        # If beat annotations exist, compute also annotated beatsync features
-        if len(beat_annot) > 0:
-            logging.info("Reading beat annotations from JAMS")
-            annot_beats_inters, _ = beat_annot[0].data.to_interval_values()
-            annot_beats_times = annot_beats_inters[:, 0]
-            annot_beats_idx = librosa.time_to_frames(
-                annot_beats_times, sr=msaf.Anal.sample_rate,
-                hop_length=msaf.Anal.hop_size)
-            features["ann_mfcc"], features["ann_hpcp"], \
-                features["ann_tonnetz"], features["ann_cqt"] = \
-                compute_beat_sync_features(features, annot_beats_idx)
-
-    # Save output as json file
-    save_features(out_file, features)
+    # The new features were synchronized to both grids when computed, the
+    # stored ones only need the annotated beats again
+    if annot_beats_times is not None and len(resync_feats) > 0:
+        annot_beats_idx = librosa.time_to_frames(
+            annot_beats_times, sr=msaf.Anal.sample_rate,
+            hop_length=msaf.Anal.hop_size)
+        sync_feats = sync_features(stored_feats["framesync"], annot_beats_idx,
+                                   resync_feats)
+        for feat_name, sync_feat in sync_feats.items():
+            features["ann_" + feat_name] = sync_feat
+
+    # Save output as a feature store
+    try:
+        save_features(out_file, features, update=stored_feats is not None,
+                      remove_sections=remove_sections)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir)
+
+    # Share the features with other copies of the same audio
+    if use_cache:
+        cache.store_features(file_struct.audio_file, get_analysis_params(),
+                             out_file)
 
 
 def process(in_path, sonify_beats=False, n_jobs=1, overwrite=False,
-            out_file="out.json", out_beats="out_beats.wav",
-            ds_name="*"):
+            out_file="out" + msaf.Dataset.features_ext,
+            out_beats="out_beats.wav",
+            ds_name="*", feat_names=None):
     """Main process to compute features.
 
     Parameters
@@ -297,22 +1424,30 @@ def process(in_path, sonify_beats=False, n_jobs=1, overwrite=False,
         Whether to sonify the beats on top of the audio file
         (single file mode only).
     n_jobs: int
-        Number of threads (collection mode only).
+        Maximum number of processes in collection mode (tracks are dispatched
+        longest first, within `msaf.Resources.memory_budget`, see
+        `msaf.scheduling`), or number of threads to compute the features in
+        single file mode.
     overwrite: bool
         Whether to overwrite the previously computed features.
     out_file: str
-        Path to the output json file (single file mode only).
+        Path to the output features file (single file mode only). Use the
+        ".json" extension to store them in the legacy JSON format.
     out_beats: str
         Path to the new file containing the sonified beats.
     ds_name: str
         Name of the prefix of the dataset (e.g., Beatles)
+    feat_names: list
+        Names of the features to compute (`None` for all of them, see
+        `msaf.AVAILABLE_FEATS`).
     """
 
     # If in_path it's a file, we only compute one file
     if os.path.isfile(in_path):
         file_struct = FileStruct(in_path)
         file_struct.features_file = out_file
-        compute_all_features(file_struct, sonify_beats, overwrite, out_beats)
+        compute_all_features(file_struct, sonify_beats, overwrite, out_beats,
+                             feat_names, n_threads=n_jobs)
 
     elif os.path.isdir(in_path):
         # Check that in_path exists
@@ -321,7 +1456,11 @@ def process(in_path, sonify_beats=False, n_jobs=1, overwrite=False,
         # Get files
         file_structs = io.get_dataset_files(in_path, ds_name=ds_name)
 
-        # Compute features using joblib
-        Parallel(n_jobs=n_jobs)(delayed(compute_all_features)(
-            file_struct, sonify_beats, overwrite, out_beats)
-            for file_struct in file_structs)
+        # Compute features in parallel, longest tracks first, within the
+        # memory budget
+        durs = scheduling.get_costs(file_structs)
+        memory = [scheduling.estimate_extraction_memory(dur) for dur in durs]
+        scheduling.run_longest_first(
+            compute_all_features, file_structs, n_jobs,
+            args=(sonify_beats, overwrite, out_beats, feat_names),
+            memory=memory, costs=durs)
@@ -2,18 +2,148 @@
 These set of functions help the algorithms of MSAF to read and write files
 of the Segmentation Dataset.
 """
+import audioread
 import datetime
+import fractions
+import functools
 import glob
+import hashlib
 import jams
 import json
+import librosa
 import logging
 import numpy as np
 import os
-import six
+import scipy.signal
+import shutil
+import struct
+from collections.abc import MutableMapping
 
 # Local stuff
 import msaf
+from msaf import cache
 from msaf import utils
+from msaf.algorithms import registry
+
+# Binary feature store
+FEATURES_METADATA = "metadata.json"
+FEATURES_SECTIONS = ["framesync", "est_beatsync", "ann_beatsync"]
+FEATURES_STORAGES = ["float64", "float16", "uint8"]
+
+
+class LazyFeatures(MutableMapping):
+    """Dictionary of features that only reads (and converts) each of them the
+    first time it is accessed.
+
+    Items are either regular values or loaders (functions without arguments)
+    that return the actual value. Loaders are called at most once, and their
+    results are kept for subsequent accesses.
+    """
+    def __init__(self, loaders=None, **values):
+        """Inits the features.
+
+        Parameters
+        ----------
+        loaders: dict
+            Dictionary of functions that return the value of each key.
+        values: dict
+            Already available values.
+        """
+        self._loaders = dict(loaders) if loaders is not None else {}
+        self._values = values
+
+    def set_loader(self, key, loader):
+        """Sets the function that will load the value of the given key."""
+        self._values.pop(key, None)
+        self._loaders[key] = loader
+
+    def is_loaded(self, key):
+        """Whether the value of the given key has already been read."""
+        return key in self._values
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._loaders:
+                raise KeyError(key)
+            self._values[key] = self._loaders.pop(key)()
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._loaders.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if key in self._values:
+            del self._values[key]
+        elif key in self._loaders:
+            del self._loaders[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self._values:
+            yield key
+        for key in list(self._loaders):
+            if key not in self._values:
+                yield key
+
+    def __len__(self):
+        return len(self._values) + len(self._loaders)
+
+    def __repr__(self):
+        return "LazyFeatures(loaded=%s, not_loaded=%s)" % (
+            sorted(self._values), sorted(self._loaders))
+
+
+class NpyAppender(object):
+    """Writes a 2D array into an `.npy` file incrementally, one block of rows
+    at a time, so that it never has to be fully kept in memory.
+
+    The header of the file has a fixed size, and it is rewritten with the
+    actual shape of the array when closing the file.
+    """
+    HEADER_LEN = 128  # Total size of the header, in bytes
+
+    def __init__(self, npy_file, dtype=np.float64):
+        """Inits the appender.
+
+        Parameters
+        ----------
+        npy_file: str
+            Path to the `.npy` file to write.
+        dtype: np.dtype
+            Type of the array.
+        """
+        self.npy_file = npy_file
+        self.dtype = np.dtype(dtype)
+        self.n_rows = 0
+        self.n_cols = None
+        self._f = open(npy_file, "wb")
+        self._write_header()
+
+    def append(self, rows):
+        """Appends the given rows (a 2D array) at the end of the array."""
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if self.n_cols is None:
+            self.n_cols = rows.shape[1]
+        assert rows.shape[1] == self.n_cols
+        self._f.write(rows.tobytes())
+        self.n_rows += rows.shape[0]
+
+    def close(self):
+        """Writes the final shape of the array and closes the file."""
+        self._f.seek(0)
+        self._write_header()
+        self._f.close()
+
+    def _write_header(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" \
+            % (self.dtype.str, self.n_rows, self.n_cols or 0)
+        header_len = self.HEADER_LEN - len(np.lib.format.magic(1, 0)) - 2
+        header = header.ljust(header_len - 1) + "\n"
+        self._f.write(np.lib.format.magic(1, 0))
+        self._f.write(struct.pack("<H", header_len))
+        self._f.write(header.encode("latin1"))
 
 
 class FileStruct:
@@ -193,6 +323,371 @@ def read_ref_bound_frames(audio_path, beats):
     return bound_frames
 
 
+def resolve_features_file(features_file):
+    """Gets the path to the existing features of a track, falling back to the
+    legacy JSON file if the binary feature store does not exist.
+
+    Parameters
+    ----------
+    features_file: str
+        Path to the (binary) features file.
+
+    Returns
+    -------
+    features_file: str
+        Path to the features file that should be read.
+    """
+    if os.path.exists(features_file):
+        return features_file
+    legacy_file = os.path.splitext(features_file)[0] + \
+        msaf.Dataset.legacy_features_ext
+    if os.path.isfile(legacy_file):
+        return legacy_file
+    return features_file
+
+
+def features_exist(features_file):
+    """Checks whether the features of a track have already been computed,
+    either in a binary feature store or in a legacy JSON file."""
+    return os.path.exists(resolve_features_file(features_file))
+
+
+def get_features_fingerprint(features_file, feat_names, annot_beats=False,
+                             framesync=False):
+    """Computes a fingerprint of the features of a track that an estimation
+    depends on: the beats, the analysis parameters and the content of the
+    given features, in the section read by `get_features`. It changes
+    whenever any of them is computed again (e.g., with other analysis
+    parameters), but not when other features are added to the store.
+
+    Parameters
+    ----------
+    features_file: str
+        Path to the (binary) features file.
+    feat_names: list
+        Names of the features used by the estimation (see
+        `get_required_features`).
+    annot_beats: bool
+        Whether the estimation uses the features synchronized to the
+        annotated beats.
+    framesync: bool
+        Whether the estimation uses the frame-synchronous features.
+
+    Returns
+    -------
+    fingerprint: str
+        Hexadecimal SHA-1 digest of the features, 16 characters (legacy JSON
+        files, which are never updated, are digested whole). `None` if the
+        features do not exist.
+    """
+    features_file = resolve_features_file(features_file)
+    if not os.path.isdir(features_file):
+        if not os.path.isfile(features_file):
+            return None
+        return cache.get_audio_digest(features_file)[:16]
+
+    if framesync:
+        section = "framesync"
+    elif annot_beats:
+        section = "ann_beatsync"
+    else:
+        section = "est_beatsync"
+    with open(os.path.join(features_file, FEATURES_METADATA), "r") as f:
+        analysis = json.load(f)["analysis"]
+    sha1 = hashlib.sha1(json.dumps(analysis, sort_keys=True).encode())
+    sha1.update(cache.get_audio_digest(
+        os.path.join(features_file, "beats.npy")).encode())
+    for feat_name in sorted(feat_names):
+        feat_files = glob.glob(os.path.join(features_file, section,
+                                            feat_name + ".np[yz]"))
+        sha1.update(feat_name.encode())
+        for feat_file in feat_files:
+            sha1.update(cache.get_audio_digest(feat_file).encode())
+    return sha1.hexdigest()[:16]
+
+
+def is_legacy_features_file(features_file):
+    """Whether the given path corresponds to a legacy JSON features file."""
+    return features_file.endswith(msaf.Dataset.legacy_features_ext)
+
+
+def write_features_store(out_dir, feats):
+    """Writes the features into a binary feature store.
+
+    The feature store is a directory containing the analysis metadata and one
+    `.npy` file per feature, such that each of them can be memory-mapped
+    independently:
+
+        out_dir/
+        ├── metadata.json
+        ├── beats.npy
+        ├── framesync/{hpcp,mfcc,tonnetz,cqt}.npy
+        ├── est_beatsync/{hpcp,mfcc,tonnetz,cqt}.npy
+        └── ann_beatsync/{hpcp,mfcc,tonnetz,cqt}.npy
+
+    If `msaf.Dataset.features_storage` is "float16" or "uint8", each feature
+    is quantized and compressed into an `.npz` file instead (see
+    `save_feature`).
+
+    Parameters
+    ----------
+    out_dir: str
+        Path to the feature store.
+    feats: dict
+        Features with the same structure as the JSON features files
+        (arrays may be np.arrays or lists).
+    """
+    # Write everything in a temporary directory first, so that we never
+    # leave a half-written store behind
+    tmp_dir = out_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    meta = {}
+    for key in ["metadata", "analysis", "timestamp"]:
+        meta[key] = feats[key]
+    with open(os.path.join(tmp_dir, FEATURES_METADATA), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    np.save(os.path.join(tmp_dir, "beats.npy"),
+            np.asarray(feats["beats"]["times"], dtype=np.float64))
+    for section in FEATURES_SECTIONS:
+        if section not in feats:
+            continue
+        section_dir = os.path.join(tmp_dir, section)
+        os.makedirs(section_dir)
+        for name, values in feats[section].items():
+            save_feature(os.path.join(section_dir, name), values)
+
+    # Replace the previous store, if any
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.rename(tmp_dir, out_dir)
+
+
+def update_features_store(out_dir, feats, remove_sections=None):
+    """Adds features to an existing binary feature store, keeping the ones
+    that it already contains. The beats of the store must be the same as the
+    ones used to compute the new features.
+
+    Parameters
+    ----------
+    out_dir: str
+        Path to the feature store.
+    feats: dict
+        Features with the same structure as the JSON features files
+        (arrays may be np.arrays or lists).
+    remove_sections: list
+        Sections to remove from the feature store (e.g., "ann_beatsync").
+    """
+    if not os.path.isdir(out_dir):
+        write_features_store(out_dir, feats)
+        return
+
+    for section in remove_sections or []:
+        section_dir = os.path.join(out_dir, section)
+        if os.path.isdir(section_dir):
+            shutil.rmtree(section_dir)
+
+    for section in FEATURES_SECTIONS:
+        if section not in feats:
+            continue
+        section_dir = os.path.join(out_dir, section)
+        if not os.path.isdir(section_dir):
+            os.makedirs(section_dir)
+        for name, values in feats[section].items():
+            save_feature(os.path.join(section_dir, name), values)
+
+    # Metadata goes last, so that it's only updated once the features exist
+    meta_file = os.path.join(out_dir, FEATURES_METADATA)
+    with open(meta_file) as f:
+        meta = json.load(f)
+    for key in ["metadata", "analysis", "timestamp"]:
+        meta[key] = feats[key]
+    with open(meta_file + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.rename(meta_file + ".tmp", meta_file)
+
+
+def save_feature(feat_path, values):
+    """Atomically saves a feature of a binary feature store with the storage
+    of `msaf.Dataset.features_storage`:
+
+        - "float64": Raw `.npy` file in the precision of `msaf.Anal.dtype`
+          (i.e., float32 in float32 mode), which can be memory-mapped.
+        - "float16": Half precision values, compressed into an `.npz` file.
+        - "uint8": 8-bit values with a scale and offset per dimension (i.e.,
+          per column), compressed into an `.npz` file.
+
+    Any previous version of the feature with a different storage is removed.
+
+    Parameters
+    ----------
+    feat_path: str
+        Path to the feature file, without extension.
+    values: np.array
+        Feature values.
+    """
+    storage = msaf.Dataset.features_storage
+    values = np.asarray(values, dtype=msaf.Anal.dtype)
+    if storage == "float64":
+        ext = ".npy"
+        _save_npy(feat_path + ext, values)
+    elif storage == "float16":
+        ext = ".npz"
+        _save_npz(feat_path + ext, values=values.astype(np.float16))
+    elif storage == "uint8":
+        ext = ".npz"
+        offset = np.min(values, axis=0) if len(values) > 0 else 0.
+        scale = (np.max(values, axis=0) - offset) / 255. \
+            if len(values) > 0 else 1.
+        scale = np.where(scale > 0, scale, 1.)
+        _save_npz(feat_path + ext,
+                  values=np.round((values - offset) / scale).astype(np.uint8),
+                  scale=scale, offset=offset)
+    else:
+        raise ValueError("Unknown features storage: %s (available storages "
+                         "are %s)" % (storage, FEATURES_STORAGES))
+    for other_ext in [".npy", ".npz"]:
+        if other_ext != ext and os.path.exists(feat_path + other_ext):
+            os.remove(feat_path + other_ext)
+
+
+def load_feature(feat_file, mmap_mode=None):
+    """Loads a feature of a binary feature store (see `save_feature`),
+    dequantizing it if needed.
+
+    Parameters
+    ----------
+    feat_file: str
+        Path to the `.npy` or `.npz` feature file.
+    mmap_mode: str
+        Memory-map mode of the `.npy` files (see `np.load`).
+
+    Returns
+    -------
+    values: np.array
+        Feature values (`msaf.Anal.dtype` if quantized).
+    """
+    if feat_file.endswith(".npy"):
+        return np.load(feat_file, mmap_mode=mmap_mode)
+    with np.load(feat_file) as data:
+        values = np.asarray(data["values"], dtype=msaf.Anal.dtype)
+        if "scale" in data:
+            values *= np.asarray(data["scale"], dtype=msaf.Anal.dtype)
+            values += np.asarray(data["offset"], dtype=msaf.Anal.dtype)
+    return values
+
+
+def _save_npy(npy_file, values):
+    """Atomically saves an array into an `.npy` file."""
+    tmp_file = npy_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, values)
+    os.rename(tmp_file, npy_file)
+
+
+def _save_npz(npz_file, **arrays):
+    """Atomically saves arrays into a compressed `.npz` file."""
+    tmp_file = npz_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.rename(tmp_file, npz_file)
+
+
+def read_features_file(features_file, mmap=True):
+    """Reads a features file, either from a binary feature store or from a
+    legacy JSON file.
+
+    Parameters
+    ----------
+    features_file: str
+        Path to the features file.
+    mmap: bool
+        Whether to memory-map the arrays of the binary feature store. Maps are
+        copy-on-write, so they can be safely modified in memory. Quantized
+        features are always read into memory.
+
+    Returns
+    -------
+    feats: dict
+        Dictionary with the structure of the JSON features files. Features
+        read from JSON files are lists instead of np.arrays. The sections of
+        binary feature stores are `LazyFeatures`, so arrays are only read when
+        accessed.
+    """
+    features_file = resolve_features_file(features_file)
+    if not os.path.isdir(features_file):
+        with open(features_file, "r") as f:
+            return json.load(f)
+
+    mmap_mode = "c" if mmap else None
+    with open(os.path.join(features_file, FEATURES_METADATA), "r") as f:
+        feats = json.load(f)
+    feats["beats"] = {"times": np.load(os.path.join(features_file,
+                                                    "beats.npy"),
+                                       mmap_mode=mmap_mode)}
+    for section in FEATURES_SECTIONS:
+        section_dir = os.path.join(features_file, section)
+        if not os.path.isdir(section_dir):
+            continue
+        feats[section] = LazyFeatures()
+        for feat_file in glob.glob(os.path.join(section_dir, "*.np[yz]")):
+            name = os.path.splitext(os.path.basename(feat_file))[0]
+            feats[section].set_loader(
+                name, functools.partial(load_feature, feat_file,
+                                        mmap_mode=mmap_mode))
+    return feats
+
+
+def convert_features_file(features_file, remove=False):
+    """Converts a legacy JSON features file into a binary feature store.
+
+    Parameters
+    ----------
+    features_file: str
+        Path to the JSON features file.
+    remove: bool
+        Whether to remove the JSON file once converted.
+
+    Returns
+    -------
+    out_dir: str
+        Path to the new binary feature store.
+    """
+    with open(features_file, "r") as f:
+        feats = json.load(f)
+    out_dir = os.path.splitext(features_file)[0] + msaf.Dataset.features_ext
+    logging.info("Converting %s to %s" % (features_file, out_dir))
+    write_features_store(out_dir, feats)
+    if remove:
+        os.remove(features_file)
+    return out_dir
+
+
+def convert_features_dir(features_dir, remove=False):
+    """Converts all the legacy JSON features files of a features directory
+    into binary feature stores.
+
+    Parameters
+    ----------
+    features_dir: str
+        Path to the features directory (e.g., my_dataset/features).
+    remove: bool
+        Whether to remove the JSON files once converted.
+
+    Returns
+    -------
+    out_dirs: list
+        Paths to the new binary feature stores.
+    """
+    features_files = glob.glob(os.path.join(
+        features_dir, "*" + msaf.Dataset.legacy_features_ext))
+    return [convert_features_file(features_file, remove=remove)
+            for features_file in sorted(features_files)]
+
+
 def get_features(audio_path, annot_beats=False, framesync=False):
     """
     Gets the features of an audio file given the audio_path.
@@ -208,8 +703,9 @@ def get_features(audio_path, annot_beats=False, framesync=False):
 
     Return
     ------
-    features : dict
-        A dictionary with the following keys:
+    features : LazyFeatures
+        A dictionary that only reads each feature when it is accessed,
+        with the following keys:
             "hpcp": np.array((N, 12)), Chromagram
             "mfcc": np.array((N, 13)), MFCC
             "tonnetz": np.array((N, 6)), Tonnetz
@@ -220,12 +716,11 @@ def get_features(audio_path, annot_beats=False, framesync=False):
     # Dataset path
     ds_path = os.path.dirname(os.path.dirname(audio_path))
 
-    # Read Estimations
+    # Read Features
     features_path = os.path.join(
         ds_path, msaf.Dataset.features_dir,
         os.path.basename(audio_path)[:-4] + msaf.Dataset.features_ext)
-    with open(features_path, "r") as f:
-        feats = json.load(f)
+    feats = read_features_file(features_path)
 
     # Beat Synchronous Feats
     if framesync:
@@ -257,24 +752,59 @@ def get_features(audio_path, annot_beats=False, framesync=False):
             feat_str = "est_beatsync"
             beats = np.asarray(feats["beats"]["times"])
 
-    # Build actual features dictionary
-    features = {}
-    features["hpcp"] = np.asarray(feats[feat_str]["hpcp"])
-    features["mfcc"] = np.asarray(feats[feat_str]["mfcc"])
-    features["tonnetz"] = np.asarray(feats[feat_str]["tonnetz"])
-    features["cqt"] = np.asarray(feats[feat_str]["cqt"])
-    features["beats"] = np.asarray(feats["beats"]["times"])
-    features["anal"] = feats["analysis"]
-
     # Frame times might be shorter than the actual number of features.
+    n_frames = None
     if framesync:
-        frame_times = utils.get_time_frames(features["anal"]["dur"],
-                                            features["anal"])
-        features["hpcp"] = features["hpcp"][:len(frame_times)]
-        features["mfcc"] = features["mfcc"][:len(frame_times)]
-        features["tonnetz"] = features["tonnetz"][:len(frame_times)]
-        features["cqt"] = features["cqt"][:len(frame_times)]
+        frame_times = utils.get_time_frames(feats["analysis"]["dur"],
+                                            feats["analysis"])
+        n_frames = len(frame_times)
+
+    # Build actual features dictionary (features are read when accessed)
+    features = LazyFeatures(beats=np.asarray(feats["beats"]["times"]),
+                            anal=feats["analysis"])
+    for feat_name in feats[feat_str]:
+        features.set_loader(feat_name, functools.partial(
+            _get_feature, feats[feat_str], feat_name, n_frames))
+
+    return features
+
+
+def _get_feature(section, feat_name, n_frames=None):
+    """Gets a feature from a section of a features file as an np.array of
+    type `msaf.Anal.dtype`, keeping the first n_frames only (None to keep all
+    of them)."""
+    return np.asarray(section[feat_name][:n_frames], dtype=msaf.Anal.dtype)
+
+
+def get_signal_features(all_features, framesync=False):
+    """
+    Gets the features of an in-memory signal, as `get_features` does for
+    an audio file.
 
+    Parameters
+    ----------
+    all_features: dict
+        Features computed by `featextract.compute_features_for_signal`.
+    framesync: bool
+        Whether to use framesync features or not.
+
+    Return
+    ------
+    features : dict
+        A dictionary with the same keys as the one returned by
+        `get_features`.
+    """
+    prefix = "" if framesync else "bs_"
+    n_frames = None
+    if framesync:
+        n_frames = len(utils.get_time_frames(all_features["anal"]["dur"],
+                                             all_features["anal"]))
+    features = {"beats": np.asarray(all_features["beats"]),
+                "anal": all_features["anal"]}
+    for feat_name in msaf.AVAILABLE_FEATS:
+        if prefix + feat_name in all_features:
+            features[feat_name] = _get_feature(
+                all_features, prefix + feat_name, n_frames)
     return features
 
 
@@ -310,7 +840,7 @@ def find_estimation(jam, boundaries_id, labels_id, params):
         ann = jam.search(namespace=namespace).\
             search(**{"Sandbox.boundaries_id": boundaries_id})
     for key, val in zip(params.keys(), params.values()):
-        if isinstance(val, six.string_types):
+        if isinstance(val, str):
             ann = ann.search(**{"Sandbox.%s" % key: val})
         else:
             ann = ann.search(**{"Sandbox.%s" % key: lambda x: x == val})
@@ -350,12 +880,53 @@ def save_estimations(file_struct, times, labels, boundaries_id, labels_id,
     params : dict
         Dictionary with additional parameters for both algorithms.
     """
-    # Remove features if they exist
-    params.pop("features", None)
+    save_all_estimations(file_struct, [(times, labels, boundaries_id,
+                                        labels_id, params)])
+
+
+def save_all_estimations(file_struct, estimations):
+    """Saves the estimations of several algorithms for the same track in its
+    JAMS file, reading and writing the file only once.
 
-    # Get duration
+    Parameters
+    ----------
+    file_struct : FileStruct
+        Object with the different file paths of the current file.
+    estimations : list
+        Tuples of (times, labels, boundaries_id, labels_id, params), with the
+        same meaning as the arguments of `save_estimations`.
+    """
+    # Get duration of the features
     dur = get_duration(file_struct.features_file)
 
+    # Read the previous estimations, if any
+    if os.path.isfile(file_struct.est_file):
+        jam = jams.load(file_struct.est_file, validate=False)
+    else:
+        # Create new JAMS if it doesn't exist
+        jam = jams.JAMS()
+        jam.file_metadata.duration = dur
+
+    for times, labels, boundaries_id, labels_id, params in estimations:
+        # Remove features if they exist
+        params = dict(params)
+        params.pop("features", None)
+        fingerprint = get_features_fingerprint(
+            file_struct.features_file,
+            get_required_features(params["feature"], boundaries_id,
+                                  labels_id),
+            params["annot_beats"], params["framesync"])
+        _add_estimation(jam, times, labels, boundaries_id, labels_id, params,
+                        fingerprint)
+
+    # Write results
+    jam.save(file_struct.est_file)
+
+
+def _add_estimation(jam, times, labels, boundaries_id, labels_id, params,
+                    fingerprint):
+    """Adds an estimation to a JAMS object, overwriting the existing one with
+    the same parameters, if any."""
     # Convert to intervals and sanity check
     if 'numpy' in str(type(times)):
         inters = utils.times_to_intervals(times)
@@ -378,18 +949,11 @@ def save_estimations(file_struct, times, labels, boundaries_id, labels_id,
     ann = jams.Annotation(namespace=namespace)
 
     # Find estimation in file
-    if os.path.isfile(file_struct.est_file):
-        jam = jams.load(file_struct.est_file, validate=False)
-        curr_ann = find_estimation(jam, boundaries_id, labels_id, params)
-        if curr_ann is not None:
-            curr_ann.data = ann.data  # cleanup all data
-            ann = curr_ann  # This will overwrite the existing estimation
-        else:
-            jam.annotations.append(ann)
+    curr_ann = find_estimation(jam, boundaries_id, labels_id, params)
+    if curr_ann is not None:
+        curr_ann.data = ann.data  # cleanup all data
+        ann = curr_ann  # This will overwrite the existing estimation
     else:
-        # Create new JAMS if it doesn't exist
-        jam = jams.JAMS()
-        jam.file_metadata.duration = dur
         jam.annotations.append(ann)
 
     # Save metadata and parameters
@@ -402,6 +966,7 @@ def save_estimations(file_struct, times, labels, boundaries_id, labels_id,
         datetime.datetime.today().strftime("%Y/%m/%d %H:%M:%S")
     for key in params:
         sandbox[key] = params[key]
+    sandbox["features_fingerprint"] = fingerprint
     ann.sandbox = sandbox
 
     # Save actual data
@@ -416,10 +981,7 @@ def save_estimations(file_struct, times, labels, boundaries_id, labels_id,
             else:
                 value = str(int(label))
             ann.append(time=bound_inter[0], duration=dur,
-                       value=six.text_type(value))
-
-    # Write results
-    jam.save(file_struct.est_file)
+                       value=str(value))
 
 
 def get_all_est_boundaries(est_file, annot_beats, algo_ids=None,
@@ -525,12 +1087,8 @@ def get_all_boundary_algorithms():
     algo_ids : list
         List of all the IDs of boundary algorithms (strings).
     """
-    algo_ids = []
-    for name in msaf.algorithms.__all__:
-        module = eval(msaf.algorithms.__name__ + "." + name)
-        if module.is_boundary_type:
-            algo_ids.append(module.algo_id)
-    return algo_ids
+    return [algo_id for algo_id in registry.get_algorithm_ids()
+            if registry.get_metadata(algo_id)["is_boundary_type"]]
 
 
 def get_all_label_algorithms():
@@ -541,12 +1099,8 @@ def get_all_label_algorithms():
     algo_ids : list
         List of all the IDs of label algorithms (strings).
     """
-    algo_ids = []
-    for name in msaf.algorithms.__all__:
-        module = eval(msaf.algorithms.__name__ + "." + name)
-        if module.is_label_type:
-            algo_ids.append(module.algo_id)
-    return algo_ids
+    return [algo_id for algo_id in registry.get_algorithm_ids()
+            if registry.get_metadata(algo_id)["is_label_type"]]
 
 
 def get_configuration(feature, annot_beats, framesync, boundaries_id,
@@ -558,16 +1112,40 @@ def get_configuration(feature, annot_beats, framesync, boundaries_id,
     config["feature"] = feature
     config["framesync"] = framesync
     if boundaries_id != "gt":
-        bound_config = \
-            eval(msaf.algorithms.__name__ + "." + boundaries_id).config
-        config.update(bound_config)
+        config.update(registry.get_config(boundaries_id))
     if labels_id is not None:
-        label_config = \
-            eval(msaf.algorithms.__name__ + "." + labels_id).config
-        config.update(label_config)
+        config.update(registry.get_config(labels_id))
     return config
 
 
+def get_required_features(feature, boundaries_id, labels_id):
+    """Gets the list of features needed to run the given algorithms with the
+    given feature.
+
+    Parameters
+    ----------
+    feature: str
+        Identifier of the feature selected by the user (e.g., "hpcp").
+    boundaries_id: str
+        Identifier of the boundaries algorithm ("gt" for ground truth).
+    labels_id: str
+        Identifier of the labels algorithm (None for no labels).
+
+    Returns
+    -------
+    feat_names: list
+        Names of the features required, in the order of
+        `msaf.AVAILABLE_FEATS`.
+    """
+    required = set([feature])
+    for algo_id in [boundaries_id, labels_id]:
+        if algo_id is None or algo_id == "gt":
+            continue
+        required.update(registry.get_metadata(algo_id)["required_features"])
+    return [feat_name for feat_name in msaf.AVAILABLE_FEATS
+            if feat_name in required]
+
+
 def filter_by_artist(file_structs, artist_name="The Beatles"):
     """Filters data set files by artist name."""
     new_file_structs = []
@@ -699,13 +1277,132 @@ def get_duration(features_file):
     Parameters
     ----------
     features_file: str
-        Path to the JSON file containing the features.
+        Path to the feature store (or legacy JSON file) containing the
+        features.
 
     Returns
     -------
     dur: float
         Duration of the analyzed file.
     """
+    features_file = resolve_features_file(features_file)
+    if os.path.isdir(features_file):
+        features_file = os.path.join(features_file, FEATURES_METADATA)
     with open(features_file) as f:
         feats = json.load(f)
     return float(feats["analysis"]["dur"])
+
+
+def read_audio_duration(audio_file):
+    """Reads the duration of an audio file from its header, without decoding
+    it.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+
+    Returns
+    -------
+    dur: float
+        Duration of the audio file, in seconds.
+    """
+    with audioread.audio_open(os.path.realpath(audio_file)) as f:
+        return float(f.duration)
+
+
+def read_audio_sample_rate(audio_file):
+    """Reads the native sample rate of an audio file from its header.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+
+    Returns
+    -------
+    sr: int
+        Sample rate of the audio file.
+    """
+    with audioread.audio_open(os.path.realpath(audio_file)) as f:
+        return f.samplerate
+
+
+def load_audio(audio_file, sr):
+    """Loads an audio file as a mono signal, like `librosa.load`.
+
+    If the decoded audio cache is enabled (see `msaf.Cache.audio_dir`), the
+    file is only decoded and resampled the first time it is loaded at a
+    given sample rate, and the cached samples are memory-mapped afterwards.
+
+    Parameters
+    ----------
+    audio_file: str
+        Path to the audio file.
+    sr: int
+        Sample rate to resample the audio to (`None` for its native rate).
+
+    Returns
+    -------
+    y: np.array
+        Audio samples (float32).
+    sr: int
+        Sample rate of the audio samples.
+    """
+    if not cache.is_audio_enabled():
+        return _decode_audio(audio_file, sr)
+    if sr is None:
+        sr = read_audio_sample_rate(audio_file)
+    y = cache.fetch_audio(audio_file, sr)
+    if y is None:
+        y, sr = _decode_audio(audio_file, sr)
+        cache.store_audio(audio_file, sr, y)
+    return y, sr
+
+
+def _decode_audio(audio_file, sr):
+    """Decodes an audio file as a mono signal, resampled with `resample`."""
+    y, sr_native = librosa.load(audio_file, sr=None)
+    if sr is None:
+        return y, sr_native
+    return resample(y, sr_native, sr), sr
+
+
+def resample(y, orig_sr, target_sr):
+    """Resamples a signal with the resampler of `msaf.Anal.resample_type`:
+
+        - "kaiser_best": High quality band-limited sinc interpolation (the
+          default of `librosa.resample` and `librosa.load`).
+        - "kaiser_fast": Faster, lower quality sinc interpolation.
+        - "polyphase": Polyphase filtering with the integer ratio of the
+          sample rates (`scipy.signal.resample_poly`), the fastest one.
+
+    Parameters
+    ----------
+    y: np.array
+        Audio samples.
+    orig_sr: int
+        Sample rate of the signal.
+    target_sr: int
+        Sample rate to resample the signal to.
+
+    Returns
+    -------
+    y_hat: np.array
+        Resampled audio samples (float32), with exactly
+        `ceil(len(y) * target_sr / orig_sr)` samples.
+    """
+    if orig_sr == target_sr:
+        return np.asarray(y, dtype=np.float32)
+    if msaf.Anal.resample_type in ["kaiser_best", "kaiser_fast"]:
+        y_hat = librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr,
+                                 res_type=msaf.Anal.resample_type)
+    elif msaf.Anal.resample_type == "polyphase":
+        ratio = fractions.Fraction(int(target_sr), int(orig_sr))
+        y_hat = librosa.util.fix_length(
+            scipy.signal.resample_poly(y, ratio.numerator, ratio.denominator),
+            int(np.ceil(len(y) * ratio)))
+    else:
+        raise ValueError("Unknown resample type: %s" %
+                         msaf.Anal.resample_type)
+    return np.ascontiguousarray(y_hat, dtype=np.float32)
@@ -0,0 +1,138 @@
+"""
+Journal of the runs of MSAF on a collection.
+
+The journal is a JSON-lines file in the estimations folder of the dataset
+(see `msaf.Dataset.journal_file`), with one entry per processed track:
+
+    {"track": "01-Sargon-Mindless.mp3", "boundaries_id": "sf",
+     "labels_id": null, "config_hash": "...", "status": "done",
+     "time": 12.3, "timestamp": "2015/01/01 00:00:00"}
+
+Entries are appended (and flushed) as soon as each track finishes, so the
+journal survives if the run dies, and a new run with the same parameters can
+skip the tracks that were already completed and retry the failed ones.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+import msaf
+
+# Status of the tracks in the journal
+DONE = "done"
+FAILED = "failed"
+
+
+def get_journal_file(in_path):
+    """Gets the path to the journal of a dataset.
+
+    Parameters
+    ----------
+    in_path: str
+        Path to the dataset.
+
+    Returns
+    -------
+    journal_file: str
+        Path to the journal file (it may not exist).
+    """
+    return os.path.join(in_path, msaf.Dataset.estimations_dir,
+                        msaf.Dataset.journal_file)
+
+
+def get_config_hash(params):
+    """Computes the hash of the parameters of a run.
+
+    Parameters
+    ----------
+    params: dict
+        Parameters of the run (algorithm identifiers, configuration, analysis
+        parameters...). Values that can not be serialized to JSON are hashed
+        by their string representation.
+
+    Returns
+    -------
+    config_hash: str
+        Hexadecimal SHA-1 digest of the parameters (16 characters).
+    """
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(params_json.encode("utf-8")).hexdigest()[:16]
+
+
+def get_key(track, boundaries_id, labels_id, config_hash):
+    """Gets the key that identifies a track in a run."""
+    return (track, boundaries_id, labels_id, config_hash)
+
+
+def read_journal(journal_file):
+    """Reads the last entry of each track of a journal.
+
+    Parameters
+    ----------
+    journal_file: str
+        Path to the journal file.
+
+    Returns
+    -------
+    entries: dict
+        Last entry of each track, indexed by the key of the track (see
+        `get_key`). Lines that can not be parsed (e.g., the last one, if the
+        run died while writing it) are ignored.
+    """
+    entries = {}
+    if not os.path.isfile(journal_file):
+        return entries
+    with open(journal_file) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                key = get_key(entry["track"], entry["boundaries_id"],
+                              entry["labels_id"], entry["config_hash"])
+            except (ValueError, KeyError, TypeError):
+                logging.warning("Ignoring invalid line in the journal %s" %
+                                journal_file)
+                continue
+            entries[key] = entry
+    return entries
+
+
+def append_entry(journal_file, track, boundaries_id, labels_id, config_hash,
+                 status, time, error=None):
+    """Appends the entry of a track to a journal.
+
+    Parameters
+    ----------
+    journal_file: str
+        Path to the journal file.
+    track: str
+        Name of the audio file of the track.
+    boundaries_id: str
+        Identifier of the boundaries algorithm.
+    labels_id: str
+        Identifier of the labels algorithm.
+    config_hash: str
+        Hash of the parameters of the run (see `get_config_hash`).
+    status: str
+        `DONE` or `FAILED`.
+    time: float
+        Time to process the track, in seconds.
+    error: str
+        Error message (or traceback), if the track failed.
+    """
+    entry = {"track": track,
+             "boundaries_id": boundaries_id,
+             "labels_id": labels_id,
+             "config_hash": config_hash,
+             "status": status,
+             "time": time,
+             "timestamp": datetime.datetime.today().strftime(
+                 "%Y/%m/%d %H:%M:%S")}
+    if error is not None:
+        entry["error"] = error
+    with open(journal_file, "a") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
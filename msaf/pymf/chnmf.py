@@ -129,10 +129,12 @@ class CHNMF(AA):
             self._base_sel = self.data.shape[0]
 
     def init_h(self):
-        self.H = np.zeros((self._num_bases, self._num_samples))
+        self.H = np.zeros((self._num_bases, self._num_samples),
+                          dtype=self._dtype)
 
     def init_w(self):
-        self.W = np.zeros((self._data_dimension, self._num_bases))
+        self.W = np.zeros((self._data_dimension, self._num_bases),
+                          dtype=self._dtype)
 
     def _map_w_to_data(self):
         """ Return data points that are most similar to basis vectors W
@@ -78,7 +78,8 @@ class CNMF(NMF):
     def init_h(self):
         if not hasattr(self, 'H'):
             # init basic matrices
-            self.H = np.zeros((self._num_bases, self._num_samples))
+            self.H = np.zeros((self._num_bases, self._num_samples),
+                              dtype=self._dtype)
 
             # initialize using k-means
             km = Kmeans(self.data[:,:], num_bases=self._num_bases)
@@ -90,10 +91,12 @@ class CNMF(NMF):
                 num_i[i] = len(np.where(assign == i)[0])
 
             self.H.T[range(len(assign)), assign] = 1.0
-            self.H += 0.2*np.ones((self._num_bases, self._num_samples))
+            self.H += 0.2*np.ones((self._num_bases, self._num_samples),
+                                  dtype=self._dtype)
 
         if not hasattr(self, 'G'):
-            self.G = np.zeros((self._num_samples, self._num_bases))
+            self.G = np.zeros((self._num_samples, self._num_bases),
+                              dtype=self._dtype)
 
             self.G[range(len(assign)), assign] = 1.0
             self.G += 0.01
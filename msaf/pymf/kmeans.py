@@ -61,7 +61,8 @@ class Kmeans(NMF):
     """
     def init_h(self):
         # W has to be present for H to be initialized
-        self.H = np.zeros((self._num_bases, self._num_samples))
+        self.H = np.zeros((self._num_bases, self._num_samples),
+                          dtype=self._dtype)
         self.update_h()
 
     def init_w(self):
@@ -75,7 +76,7 @@ class Kmeans(NMF):
     def update_h(self):
         # and assign samples to the best matching centers
         self.assigned = dist.vq(self.W, self.data)
-        self.H = np.zeros(self.H.shape)
+        self.H = np.zeros(self.H.shape, dtype=self._dtype)
         self.H[self.assigned, range(self._num_samples)] = 1.0
 
 
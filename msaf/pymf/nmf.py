@@ -93,6 +93,10 @@ class NMF():
         self.data = data
         self._num_bases = num_bases
 
+        # factorization buffers have the same precision as the data
+        self._dtype = self.data.dtype if self.data.dtype.kind == "f" \
+            else np.float64
+
         # initialize H and W to random values
         (self._data_dimension, self._num_samples) = self.data.shape
 
@@ -114,10 +118,12 @@ class NMF():
         return err
 
     def init_w(self):
-        self.W = np.random.random((self._data_dimension, self._num_bases))
+        self.W = np.random.random((self._data_dimension,
+                                   self._num_bases)).astype(self._dtype)
 
     def init_h(self):
-        self.H = np.random.random((self._num_bases, self._num_samples))
+        self.H = np.random.random((self._num_bases,
+                                   self._num_samples)).astype(self._dtype)
 
     def update_h(self):
             # pre init H1, and H2 (necessary for storing matrices on disk)
@@ -6,15 +6,21 @@ import librosa
 import logging
 import numpy as np
 import os
-
-from joblib import Parallel, delayed
+import time
+import traceback
 
 import msaf
 from msaf import input_output as io
 from msaf import utils
 from msaf import featextract
-from msaf import plotting
-import msaf.algorithms as algorithms
+from msaf import journal
+from msaf import scheduling
+from msaf import similarity
+from msaf.algorithms import registry
+
+# Maximum rate of the beats (240 BPM), to estimate the number of beats of
+# tracks whose features have not been computed yet
+MAX_BEATS_PER_SECOND = 4
 
 
 def get_boundaries_module(boundaries_id):
@@ -33,15 +39,10 @@ def get_boundaries_module(boundaries_id):
     """
     if boundaries_id == "gt":
         return None
-    try:
-        module = eval(algorithms.__name__ + "." + boundaries_id)
-    except AttributeError:
-        raise RuntimeError("Algorithm %s can not be found in msaf!" %
-                           boundaries_id)
-    if not module.is_boundary_type:
+    if not registry.get_metadata(boundaries_id)["is_boundary_type"]:
         raise RuntimeError("Algorithm %s can not identify boundaries!" %
                            boundaries_id)
-    return module
+    return registry.get_module(boundaries_id)
 
 
 def get_labels_module(labels_id):
@@ -60,15 +61,10 @@ def get_labels_module(labels_id):
     """
     if labels_id is None:
         return None
-    try:
-        module = eval(algorithms.__name__ + "." + labels_id)
-    except AttributeError:
-        raise RuntimeError("Algorithm %s can not be found in msaf!" %
-                           labels_id)
-    if not module.is_label_type:
+    if not registry.get_metadata(labels_id)["is_label_type"]:
         raise RuntimeError("Algorithm %s can not label segments!" %
                            labels_id)
-    return module
+    return registry.get_module(labels_id)
 
 
 def run_hierarchical(audio_file, bounds_module, labels_module, frame_times,
@@ -96,7 +92,8 @@ def run_hierarchical(audio_file, bounds_module, labels_module, frame_times,
     for level in range(len(est_idxs)):
         est_level_times, est_level_labels = \
             utils.process_segmentation_level(
-                est_idxs[level], est_labels[level], features["hpcp"].shape[0],
+                est_idxs[level], est_labels[level],
+                features[config["feature"]].shape[0],
                 frame_times, features["anal"]["dur"])
         est_times.append(est_level_times)
         cleaned_est_labels.append(est_level_labels)
@@ -132,9 +129,9 @@ def run_flat(audio_file, bounds_module, labels_module, frame_times, config,
                 est_idxs = io.align_times(est_times, frame_times[:-1])
                 if est_idxs[0] != 0:
                     est_idxs = np.concatenate(([0], est_idxs))
-                if est_idxs[-1] != features["hpcp"].shape[0] - 1:
+                if est_idxs[-1] != features[config["feature"]].shape[0] - 1:
                     est_idxs = np.concatenate((
-                        est_idxs, [features["hpcp"].shape[0] - 1]))
+                        est_idxs, [features[config["feature"]].shape[0] - 1]))
             except:
                 logging.warning("No references found for file: %s" %
                                 audio_file)
@@ -152,14 +149,14 @@ def run_flat(audio_file, bounds_module, labels_module, frame_times, config,
 
     # Make sure the first and last boundaries are included
     est_times, est_labels = utils.process_segmentation_level(
-        est_idxs, est_labels, features["hpcp"].shape[0], frame_times,
-        features["anal"]["dur"])
+        est_idxs, est_labels, features[config["feature"]].shape[0],
+        frame_times, features["anal"]["dur"])
 
     return est_times, est_labels
 
 
 def run_algorithms(audio_file, boundaries_id, labels_id, config,
-                   annotator_id=0):
+                   annotator_id=0, features=None):
     """Runs the algorithms with the specified identifiers on the audio_file.
 
     Parameters
@@ -174,6 +171,9 @@ def run_algorithms(audio_file, boundaries_id, labels_id, config,
         Dictionary containing the custom parameters of the algorithms to use.
     annotator_id: int
         Annotator identificator in the ground truth.
+    features: dict
+        Features of the track (see `io.get_features`). `None` to read them
+        from the features file of the audio file.
 
     Returns
     -------
@@ -187,18 +187,23 @@ def run_algorithms(audio_file, boundaries_id, labels_id, config,
         layer.
     """
     # Features should have already been computed, let's read them
-    features = io.get_features(audio_file, config["annot_beats"],
-                               config["framesync"])
+    if features is None:
+        features = io.get_features(audio_file, config["annot_beats"],
+                                   config["framesync"])
     config["features"] = features
 
     # Check that there are enough audio frames
-    if features["hpcp"].shape[0] <= msaf.minimum__frames:
+    if features[config["feature"]].shape[0] <= msaf.minimum__frames:
         logging.warning("Audio file too short, or too many few beats "
                         "estimated. Returning empty estimations.")
         return np.asarray([0, features["anal"]["dur"]]), \
             np.asarray([0], dtype=int)
 
     # Get the corresponding modules
+    if config["hier"] and boundaries_id != "gt" and \
+            not registry.get_metadata(boundaries_id)["supports_hier"]:
+        raise RuntimeError("Algorithm %s can not segment hierarchically!" %
+                           boundaries_id)
     bounds_module = get_boundaries_module(boundaries_id)
     labels_module = get_labels_module(labels_id)
 
@@ -216,8 +221,19 @@ def run_algorithms(audio_file, boundaries_id, labels_id, config,
     return est_times, est_labels
 
 
+def has_annotated_beats(file_struct):
+    """Checks whether the reference file of a track contains beats."""
+    jam = jams.load(file_struct.ref_file)
+    annots = jam.search(namespace="beat.*")
+    if not annots:
+        logging.warning("No beat information in file %s" %
+                        file_struct.ref_file)
+        return False
+    return True
+
+
 def process_track(file_struct, boundaries_id, labels_id, config,
-                  annotator_id=0):
+                  annotator_id=0, skip_estimated=False):
     """Prepares the parameters, runs the algorithms, and saves results.
 
     Parameters
@@ -233,6 +249,10 @@ def process_track(file_struct, boundaries_id, labels_id, config,
         Dictionary containing the custom parameters of the algorithms to use.
     annotator_id: int
         Annotator identificator in the ground truth.
+    skip_estimated: bool
+        Whether to return the estimations already saved in the estimations
+        file, without running the algorithms, if they were computed with the
+        same parameters and features (see `get_saved_estimations`).
 
     Returns
     -------
@@ -242,19 +262,24 @@ def process_track(file_struct, boundaries_id, labels_id, config,
         List of all the labels associated segments.
     """
     # Only analize files with annotated beats
-    if config["annot_beats"]:
-        jam = jams.load(file_struct.ref_file)
-        annots = jam.search(namespace="beat.*")
-        if not annots:
-            logging.warning("No beat information in file %s" %
-                            file_struct.ref_file)
-            return np.array([]), np.array([])
+    if config["annot_beats"] and not has_annotated_beats(file_struct):
+        return np.array([]), np.array([])
 
     logging.info("Segmenting %s" % file_struct.audio_file)
 
-    # Compute features if needed
-    if not os.path.isfile(file_struct.features_file):
-        featextract.compute_all_features(file_struct)
+    # Compute the features needed by the algorithms, if they are missing
+    featextract.compute_all_features(
+        file_struct, feat_names=io.get_required_features(
+            config["feature"], boundaries_id, labels_id))
+
+    # Reuse the saved estimations, if they are up to date
+    if skip_estimated:
+        est_times, est_labels = get_saved_estimations(
+            file_struct, boundaries_id, labels_id, config)
+        if len(est_times) > 0:
+            logging.info("Skipping %s, already estimated" %
+                         file_struct.audio_file)
+            return est_times, est_labels
 
     # Get estimations
     est_times, est_labels = run_algorithms(file_struct.audio_file,
@@ -269,11 +294,247 @@ def process_track(file_struct, boundaries_id, labels_id, config,
     return est_times, est_labels
 
 
+def process_track_algorithms(file_struct, algorithms, annotator_id=0):
+    """Runs several combinations of algorithms on a track, computing and
+    reading its features only once, sharing the self-similarity matrices
+    that they have in common (see `msaf.similarity`), and saves all the
+    estimations with a single update of its estimations file.
+
+    Parameters
+    ----------
+    file_struct: Object
+        FileStruct containing the paths of the input files (audio file,
+        features file, reference file, output estimation file).
+    algorithms: list
+        Tuples of (boundaries_id, labels_id, config) with the combinations of
+        algorithms to run (see `process_track`).
+    annotator_id: int
+        Annotator identificator in the ground truth.
+
+    Returns
+    -------
+    results: list
+        Tuples of (est_times, est_labels) for each combination of
+        algorithms.
+    """
+    logging.info("Segmenting %s with %d algorithms" % (file_struct.audio_file,
+                                                       len(algorithms)))
+
+    # Compute all the features needed by the algorithms, if they are missing
+    feat_names = set()
+    for boundaries_id, labels_id, config in algorithms:
+        feat_names.update(io.get_required_features(
+            config["feature"], boundaries_id, labels_id))
+    featextract.compute_all_features(file_struct,
+                                     feat_names=sorted(feat_names))
+
+    # Get estimations, reading each type of features and computing each
+    # self-similarity matrix once
+    all_features = {}
+    results = []
+    estimations = []
+    beats_annotated = None
+    with similarity.track_cache():
+        for boundaries_id, labels_id, config in algorithms:
+            if config["annot_beats"]:
+                if beats_annotated is None:
+                    beats_annotated = has_annotated_beats(file_struct)
+                if not beats_annotated:
+                    results.append((np.array([]), np.array([])))
+                    continue
+            key = (config["annot_beats"], config["framesync"])
+            if key not in all_features:
+                all_features[key] = io.get_features(
+                    file_struct.audio_file, annot_beats=key[0],
+                    framesync=key[1])
+            config = dict(config)
+            est_times, est_labels = run_algorithms(
+                file_struct.audio_file, boundaries_id, labels_id, config,
+                annotator_id=annotator_id, features=all_features[key])
+            results.append((est_times, est_labels))
+            estimations.append((est_times, est_labels, boundaries_id,
+                                labels_id, config))
+
+    # Save
+    if estimations:
+        logging.info("Writing results in: %s" % file_struct.est_file)
+        io.save_all_estimations(file_struct, estimations)
+
+    return results
+
+
+def process_signal(audio, sr, feature="hpcp", framesync=False,
+                   boundaries_id=msaf.DEFAULT_BOUND_ID,
+                   labels_id=msaf.DEFAULT_LABEL_ID, hier=False, n_threads=1,
+                   config=None, features=None):
+    """Segments an audio signal that is already in memory, without reading or
+    writing any file.
+
+    Parameters
+    ----------
+    audio: np.array(N) or np.array(n_channels, N)
+        Audio samples (see `featextract.compute_features_for_signal`).
+    sr: int
+        Sampling rate of the signal.
+    feature: str
+        String representing the feature to be used (e.g. hpcp, mfcc, tonnetz)
+    framesync: str
+        Whether to use framesync features or not (default: False -> beatsync)
+    boundaries_id: str
+        Identifier of the boundaries algorithm (ground truth is not available
+        for signals)
+    labels_id: str
+        Identifier of the labels algorithm (use None to not compute labels)
+    hier : bool
+        Whether to compute a hierarchical or flat segmentation.
+    n_threads: int
+        Number of threads to compute the features of the signal.
+    config: dict
+        Dictionary containing custom configuration parameters for the
+        algorithms.  If None, the default parameters are used.
+    features: dict
+        Features previously computed with
+        `featextract.compute_features_for_signal` (`None` to compute them).
+
+    Returns
+    -------
+    est_times: np.array or list
+        List of estimated times for the segment boundaries.
+    est_labels: np.array or list
+        List of all the labels associated segments.
+    features: dict
+        All the features computed for the signal, to reuse them.
+    """
+    # Seed random to reproduce results
+    np.random.seed(123)
+
+    # Make sure that the features used are correct
+    assert feature in msaf.AVAILABLE_FEATS
+    if boundaries_id == "gt":
+        raise RuntimeError("Ground truth boundaries are not available when "
+                           "segmenting a signal.")
+
+    # Set up configuration based on algorithms parameters
+    if config is None:
+        config = io.get_configuration(feature, False, framesync,
+                                      boundaries_id, labels_id)
+    config["hier"] = hier
+
+    # Compute the features needed by the algorithms, if they are missing
+    feat_names = io.get_required_features(feature, boundaries_id, labels_id)
+    if features is None or \
+            any(feat_name not in features for feat_name in feat_names):
+        features = featextract.compute_features_for_signal(
+            audio, sr, feat_names=feat_names, n_threads=n_threads)
+
+    # And run the algorithms
+    est_times, est_labels = run_algorithms(
+        None, boundaries_id, labels_id, config,
+        features=io.get_signal_features(features, framesync))
+
+    return est_times, est_labels, features
+
+
+def estimate_track_memory(file_struct, boundaries_id, labels_id, config,
+                          dur=None):
+    """Estimates the peak memory of processing a track (see `process_track`),
+    from its duration and the algorithms to run.
+
+    Parameters
+    ----------
+    file_struct: Object
+        FileStruct containing the paths of the input files.
+    boundaries_id: str
+        Identifier of the boundaries algorithm to use ("gt" for ground truth).
+    labels_id: str
+        Identifier of the labels algorithm to use (None for not labeling).
+    config: dict
+        Dictionary containing the custom parameters of the algorithms to use.
+    dur: float
+        Duration of the track, in seconds (read from the header of its audio
+        file if `None`, see `scheduling.get_cost`).
+
+    Returns
+    -------
+    memory: int
+        Estimated peak memory, in bytes.
+    """
+    if dur is None:
+        dur = scheduling.get_cost(file_struct)
+    memory = 0
+    if config["framesync"]:
+        n_frames = utils.get_num_frames(dur,
+                                        featextract.get_analysis_params())
+    elif io.features_exist(file_struct.features_file):
+        n_frames = len(io.read_features_file(
+            file_struct.features_file)["beats"]["times"])
+    else:
+        n_frames = int(dur * MAX_BEATS_PER_SECOND)
+    if not io.features_exist(file_struct.features_file):
+        memory = scheduling.estimate_extraction_memory(dur)
+    return max(memory, scheduling.estimate_segmentation_memory(
+        n_frames, [boundaries_id, labels_id]))
+
+
+def process_algorithms(in_path, algorithms, annot_beats=False, feature="hpcp",
+                       ds_name="*", framesync=False, hier=False, n_jobs=4,
+                       annotator_id=0):
+    """Segments a collection of files with several combinations of
+    algorithms, in a single pass over the dataset: each process runs all the
+    combinations on a track, reading its features and updating its
+    estimations file only once (see `process_track_algorithms`).
+
+    Parameters
+    ----------
+    in_path: str
+        Path to the dataset.
+    algorithms: list
+        Tuples of (boundaries_id, labels_id, config) with the combinations of
+        algorithms to run. If a config is `None`, the default configuration
+        of the algorithms is used, with the given `annot_beats`, `feature`
+        and `framesync` parameters.
+    The rest of parameters are the same as in `process`.
+
+    Returns
+    -------
+    results: list
+        For each track of the dataset, a list with the tuples of
+        (est_times, est_labels) of each combination of algorithms.
+    """
+    # Seed random to reproduce results
+    np.random.seed(123)
+
+    # Make sure that the features used are correct
+    assert feature in msaf.AVAILABLE_FEATS
+
+    # Set up configuration based on algorithms parameters
+    algorithms = list(algorithms)
+    for i, (boundaries_id, labels_id, config) in enumerate(algorithms):
+        if config is None:
+            config = io.get_configuration(feature, annot_beats, framesync,
+                                          boundaries_id, labels_id)
+            config["features"] = None
+        config["hier"] = hier
+        algorithms[i] = (boundaries_id, labels_id, config)
+    file_structs = io.get_dataset_files(in_path, ds_name)
+
+    # Call in parallel, longest tracks first, within the memory budget
+    durs = scheduling.get_costs(file_structs)
+    return scheduling.run_longest_first(
+        process_track_algorithms, file_structs, n_jobs, args=(algorithms,),
+        kwargs={"annotator_id": annotator_id},
+        memory=lambda i: max(estimate_track_memory(
+            file_structs[i], boundaries_id, labels_id, config, durs[i])
+            for boundaries_id, labels_id, config in algorithms),
+        costs=durs)
+
+
 def process(in_path, annot_beats=False, feature="hpcp", ds_name="*",
             framesync=False, boundaries_id=msaf.DEFAULT_BOUND_ID,
             labels_id=msaf.DEFAULT_LABEL_ID, hier=False, sonify_bounds=False,
             plot=False, n_jobs=4, annotator_id=0, config=None,
-            out_bounds="out_bounds.wav", out_sr=22050):
+            out_bounds="out_bounds.wav", out_sr=22050, resume=False,
+            skip_estimated=False):
     """Main process to segment a file or a collection of files.
 
     Parameters
@@ -302,8 +563,10 @@ def process(in_path, annot_beats=False, feature="hpcp", ds_name="*",
     plot: bool
         Whether to plot the boundaries and labels against the ground truth.
     n_jobs: int
-        Number of processes to run in parallel. Only available in collection
-        mode.
+        Maximum number of processes to run in parallel in collection mode
+        (tracks are dispatched longest first, within
+        `msaf.Resources.memory_budget`, see `msaf.scheduling`). In single file
+        mode, number of threads to compute the features of the file.
     annotator_id: int
         Annotator identificator in the ground truth.
     config: dict
@@ -314,6 +577,15 @@ def process(in_path, annot_beats=False, feature="hpcp", ds_name="*",
         mode, when sonify_bounds is True.
     out_sr : int
         Sampling rate for the sonified bounds.
+    resume: bool
+        Whether to skip the tracks that were already completed by a previous
+        run with the same parameters, according to the journal of the
+        dataset (only in collection mode, see `iter_process`).
+    skip_estimated: bool
+        Whether to reuse the estimations already saved in the estimations
+        files, instead of running the algorithms again, when they were
+        computed with the same parameters and features (e.g., to only segment
+        the tracks added to a dataset since the previous run).
 
     Returns
     -------
@@ -343,41 +615,224 @@ def process(in_path, annot_beats=False, feature="hpcp", ds_name="*",
         # Single file mode
         # Get (if they exitst) or compute features
         file_struct = msaf.io.FileStruct(in_path)
-        if not os.path.exists(file_struct.features_file):
-            # Compute and save features
-            all_features = featextract.compute_features_for_audio_file(in_path)
-            msaf.utils.ensure_dir(os.path.dirname(file_struct.features_file))
-            msaf.featextract.save_features(file_struct.features_file,
-                                           all_features)
+        msaf.utils.ensure_dir(os.path.dirname(file_struct.features_file))
+        featextract.compute_all_features(
+            file_struct, feat_names=io.get_required_features(
+                feature, boundaries_id, labels_id), n_threads=n_jobs)
         # Get correct features
         config["features"] = msaf.io.get_features(
             in_path, annot_beats=annot_beats, framesync=framesync)
 
-        # And run the algorithms
-        est_times, est_labels = run_algorithms(in_path, boundaries_id,
-                                               labels_id, config,
-                                               annotator_id=annotator_id)
+        # And run the algorithms, unless they were already run
+        est_times, est_labels = np.array([]), np.array([])
+        if skip_estimated:
+            est_times, est_labels = get_saved_estimations(
+                file_struct, boundaries_id, labels_id, config)
+        if len(est_times) == 0:
+            est_times, est_labels = run_algorithms(in_path, boundaries_id,
+                                                   labels_id, config,
+                                                   annotator_id=annotator_id)
+
+            # Save estimations
+            msaf.utils.ensure_dir(os.path.dirname(file_struct.est_file))
+            io.save_estimations(file_struct, est_times, est_labels,
+                                boundaries_id, labels_id, **config)
 
         if sonify_bounds:
             logging.info("Sonifying boundaries in %s..." % out_bounds)
-            audio_hq, sr = librosa.load(in_path, sr=out_sr)
+            audio_hq, sr = io.load_audio(in_path, sr=out_sr)
             utils.sonify_clicks(audio_hq, est_times, out_bounds, out_sr)
 
         if plot:
-            plotting.plot_one_track(file_struct, est_times, est_labels,
+            msaf.plotting.plot_one_track(file_struct, est_times, est_labels,
                                     boundaries_id, labels_id, ds_name)
 
-        # Save estimations
-        msaf.utils.ensure_dir(os.path.dirname(file_struct.est_file))
-        io.save_estimations(file_struct, est_times, est_labels,
-                            boundaries_id, labels_id, **config)
-
         return est_times, est_labels
     else:
         # Collection mode
-        file_structs = io.get_dataset_files(in_path, ds_name)
+        results = {}
+        for file_struct, est_times, est_labels in iter_process(
+                in_path, annot_beats, feature, ds_name, framesync,
+                boundaries_id, labels_id, hier, n_jobs, annotator_id, config,
+                resume, skip_estimated):
+            results[file_struct.audio_file] = (est_times, est_labels)
+        return [results[file_struct.audio_file]
+                for file_struct in io.get_dataset_files(in_path, ds_name)]
+
+
+def iter_process(in_path, annot_beats=False, feature="hpcp", ds_name="*",
+                 framesync=False, boundaries_id=msaf.DEFAULT_BOUND_ID,
+                 labels_id=msaf.DEFAULT_LABEL_ID, hier=False, n_jobs=4,
+                 annotator_id=0, config=None, resume=False,
+                 skip_estimated=False):
+    """Segments a collection of files, yielding the estimations of each track
+    as soon as it is finished.
+
+    The status and running time of each track are appended to the journal of
+    the dataset (see `msaf.journal`), so that the run can be resumed if it
+    dies. Tracks that fail are recorded in the journal and do not stop the
+    run; a RuntimeError is raised at the end if any of them failed.
 
-        # Call in parallel
-        return Parallel(n_jobs=n_jobs)(delayed(process_track)(
-            file_struct, boundaries_id, labels_id, config,
-            annotator_id=annotator_id) for file_struct in file_structs[:])
+    Parameters
+    ----------
+    in_path: str
+        Path to the dataset.
+    resume: bool
+        Whether to skip the tracks that were already completed by a previous
+        run with the same parameters (their estimations are read from their
+        estimation files instead). Failed tracks are always run again.
+    The rest of parameters are the same as in `process`.
+
+    Yields
+    ------
+    file_struct: FileStruct
+        Paths of the files of the track.
+    est_times: np.array or list
+        List of estimated times for the segment boundaries.
+    est_labels: np.array or list
+        List of all the labels associated segments.
+    """
+    # Seed random to reproduce results
+    np.random.seed(123)
+
+    # Make sure that the features used are correct
+    assert feature in msaf.AVAILABLE_FEATS
+
+    # Set up configuration based on algorithms parameters
+    if config is None:
+        config = io.get_configuration(feature, annot_beats, framesync,
+                                      boundaries_id, labels_id)
+        config["features"] = None
+    config["hier"] = hier
+    file_structs = io.get_dataset_files(in_path, ds_name)
+
+    # Skip the tracks already completed
+    journal_file = journal.get_journal_file(in_path)
+    utils.ensure_dir(os.path.dirname(journal_file))
+    config_hash = get_config_hash(boundaries_id, labels_id, config,
+                                  annotator_id)
+    entries = journal.read_journal(journal_file) if resume else {}
+    pending = []
+    for file_struct in file_structs:
+        entry = entries.get(journal.get_key(
+            os.path.basename(file_struct.audio_file), boundaries_id,
+            labels_id, config_hash))
+        if entry is not None and entry["status"] == journal.DONE:
+            est_times, est_labels = read_track_estimations(
+                file_struct, boundaries_id, labels_id, config)
+            if len(est_times) > 0:
+                yield file_struct, est_times, est_labels
+                continue
+        pending.append(file_struct)
+    if resume:
+        logging.info("Resuming run: %d of %d tracks already completed" %
+                     (len(file_structs) - len(pending), len(file_structs)))
+
+    # Call in parallel, longest tracks first, within the memory budget
+    durs = scheduling.get_costs(pending)
+    n_failed = 0
+    for i, (status, result, track_time) in scheduling.iter_longest_first(
+            _process_track_safe, pending, n_jobs,
+            args=(boundaries_id, labels_id, config, annotator_id,
+                  skip_estimated),
+            memory=lambda i: estimate_track_memory(
+                pending[i], boundaries_id, labels_id, config, durs[i]),
+            costs=durs):
+        track = os.path.basename(pending[i].audio_file)
+        if status == journal.DONE:
+            journal.append_entry(journal_file, track, boundaries_id,
+                                 labels_id, config_hash, status, track_time)
+            yield pending[i], result[0], result[1]
+        else:
+            n_failed += 1
+            logging.error("Error processing %s:\n%s" %
+                          (pending[i].audio_file, result))
+            journal.append_entry(journal_file, track, boundaries_id,
+                                 labels_id, config_hash, status, track_time,
+                                 error=result)
+    if n_failed > 0:
+        raise RuntimeError("%d tracks failed, see the journal %s" %
+                           (n_failed, journal_file))
+
+
+def _process_track_safe(file_struct, boundaries_id, labels_id, config,
+                        annotator_id, skip_estimated):
+    """Runs `process_track`, and returns its status (see `msaf.journal`),
+    its result (or the traceback of its error), and its running time."""
+    start_time = time.time()
+    try:
+        result = process_track(file_struct, boundaries_id, labels_id, config,
+                               annotator_id=annotator_id,
+                               skip_estimated=skip_estimated)
+    except Exception:
+        return journal.FAILED, traceback.format_exc(), \
+            time.time() - start_time
+    return journal.DONE, result, time.time() - start_time
+
+
+def get_config_hash(boundaries_id, labels_id, config, annotator_id=0):
+    """Computes the hash of the parameters of a run, including the current
+    analysis parameters of the features (see `journal.get_config_hash`)."""
+    return journal.get_config_hash({
+        "boundaries_id": boundaries_id,
+        "labels_id": labels_id,
+        "config": dict((key, value) for key, value in config.items()
+                       if key != "features"),
+        "anal": featextract.get_analysis_params(),
+        "annotator_id": annotator_id})
+
+
+def get_saved_estimations(file_struct, boundaries_id, labels_id, config):
+    """Gets the estimations saved in the estimations file of a track, only if
+    they were computed with the same algorithms, parameters and features
+    (according to the fingerprint of the features, see
+    `io.get_features_fingerprint`) as the ones given.
+
+    Returns
+    -------
+    est_times: np.array or list
+        Estimated boundary times (list of np.arrays if hierarchical). Empty
+        if there are no up to date estimations.
+    est_labels: np.array or list
+        Estimated labels (list of np.arrays if hierarchical).
+    """
+    fingerprint = io.get_features_fingerprint(
+        file_struct.features_file,
+        io.get_required_features(config["feature"], boundaries_id, labels_id),
+        config["annot_beats"], config["framesync"])
+    if fingerprint is None or not os.path.isfile(file_struct.est_file):
+        return np.array([]), np.array([])
+    params = dict((key, value) for key, value in config.items()
+                  if key != "features")
+    params["features_fingerprint"] = fingerprint
+    jam = jams.load(file_struct.est_file, validate=False)
+    if io.find_estimation(jam, boundaries_id, labels_id, params) is None:
+        return np.array([]), np.array([])
+    return read_track_estimations(file_struct, boundaries_id, labels_id,
+                                  config)
+
+
+def read_track_estimations(file_struct, boundaries_id, labels_id, config):
+    """Reads the estimations of a track saved by `process_track`.
+
+    Returns
+    -------
+    est_times: np.array or list
+        Estimated boundary times (list of np.arrays if hierarchical). Empty
+        if the estimations can not be found.
+    est_labels: np.array or list
+        Estimated labels (list of np.arrays if hierarchical).
+    """
+    params = dict((key, value) for key, value in config.items()
+                  if key != "features")
+    est_inters, est_labels = io.read_estimations(
+        file_struct.est_file, boundaries_id, labels_id, **params)
+    if len(est_inters) == 0:
+        return np.array([]), np.array([])
+    if config["hier"]:
+        return [utils.intervals_to_times(np.asarray(level_inters))
+                for level_inters in est_inters], \
+            [np.asarray(level_labels, dtype=int)
+             for level_labels in est_labels]
+    return utils.intervals_to_times(np.asarray(est_inters)), \
+        np.asarray(est_labels, dtype=int)
@@ -0,0 +1,352 @@
+"""
+Scheduling of the tracks of a dataset across parallel processes.
+
+The tracks are dispatched longest first, with their cost estimated from the
+duration in the header of their audio files (without decoding them), and one
+at a time, such that each process takes the next pending track as soon as it
+finishes the previous one. This way, the longest tracks do not start last and
+delay the end of the whole run.
+
+If `msaf.Resources.memory_budget` is set, jobs are only admitted while the
+sum of the estimated peak memory of the running ones stays under the budget,
+so that several long tracks (whose self-similarity matrices grow
+quadratically with their number of frames) do not run at the same time.
+"""
+
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import time
+import traceback
+
+# Local stuff
+import msaf
+from msaf import input_output as io
+from msaf.algorithms import registry
+
+# Estimated memory of a job besides its audio and matrices (interpreter,
+# libraries, features), in bytes
+JOB_BASE_MEMORY = 300 * 1024 ** 2
+
+# Estimated peak memory to extract the features of a second of audio, in bytes
+EXTRACTION_MEMORY_PER_SECOND = 4 * 1024 ** 2
+
+
+def get_cost(file_struct):
+    """Estimates the cost of processing a track from the duration of its
+    audio file.
+
+    Parameters
+    ----------
+    file_struct: FileStruct
+        Paths of the files of the track.
+
+    Returns
+    -------
+    cost: float
+        Duration of the audio file, in seconds (0 if its header can not be
+        read).
+    """
+    try:
+        return io.read_audio_duration(file_struct.audio_file)
+    except Exception:
+        logging.warning("Could not read the duration of %s" %
+                        file_struct.audio_file)
+        return 0.
+
+
+def get_costs(file_structs):
+    """Estimates the cost of processing each track (see `get_cost`)."""
+    return [get_cost(file_struct) for file_struct in file_structs]
+
+
+def sort_longest_first(file_structs, costs=None):
+    """Gets the order in which the tracks should be dispatched.
+
+    Parameters
+    ----------
+    file_structs: list
+        FileStructs of the tracks.
+    costs: list
+        Cost of each track (see `get_costs`), if it is already known, so
+        that the headers of the audio files are not read again.
+
+    Returns
+    -------
+    order: list
+        Indices of the tracks, from the longest to the shortest one (ties
+        keep the original order).
+    """
+    if costs is None:
+        costs = get_costs(file_structs)
+    return sorted(range(len(file_structs)), key=lambda i: -costs[i])
+
+
+def get_n_workers(n_jobs, n_tasks):
+    """Gets the number of processes of the pool for the given `n_jobs`
+    (negative values count back from the number of CPUs) and tasks."""
+    if n_jobs < 0:
+        n_jobs = max(multiprocessing.cpu_count() + 1 + n_jobs, 1)
+    return max(min(n_jobs, n_tasks), 1)
+
+
+def get_utilization(task_times, n_workers, wall_time):
+    """Computes the utilization of a pool of workers.
+
+    Parameters
+    ----------
+    task_times: list
+        Running time of each task, in seconds.
+    n_workers: int
+        Number of workers of the pool.
+    wall_time: float
+        Elapsed time of the whole run, in seconds.
+
+    Returns
+    -------
+    utilization: float
+        Fraction of the time that the workers were busy, in [0, 1].
+    """
+    if wall_time <= 0:
+        return 1.
+    return min(sum(task_times) / (n_workers * wall_time), 1.)
+
+
+def estimate_extraction_memory(dur):
+    """Estimates the peak memory of a job that extracts the features of a
+    track.
+
+    Parameters
+    ----------
+    dur: float
+        Duration of the track, in seconds.
+
+    Returns
+    -------
+    memory: int
+        Estimated peak memory, in bytes.
+    """
+    return int(JOB_BASE_MEMORY + EXTRACTION_MEMORY_PER_SECOND * dur)
+
+
+def estimate_segmentation_memory(n_frames, algo_ids):
+    """Estimates the peak memory of a job that segments a track, from the
+    number of N x N matrices that each algorithm allocates at its peak (see
+    `ssm_memory_factor` in their configs).
+
+    Parameters
+    ----------
+    n_frames: int
+        Number of frames (or beats) of the features of the track.
+    algo_ids: list
+        Identifiers of the algorithms run on the track (`None` and "gt" are
+        ignored).
+
+    Returns
+    -------
+    memory: int
+        Estimated peak memory, in bytes.
+    """
+    factor = 0
+    for algo_id in algo_ids:
+        if algo_id is None or algo_id == "gt":
+            continue
+        factor = max(factor,
+                     registry.get_metadata(algo_id)["ssm_memory_factor"])
+    return int(JOB_BASE_MEMORY + factor * n_frames ** 2 * 8)
+
+
+class _LazyEstimates(dict):
+    """Estimates of the jobs, indexed like a list, that are computed the
+    first time they are accessed."""
+    def __init__(self, estimate):
+        super(_LazyEstimates, self).__init__()
+        self.estimate = estimate
+
+    def __missing__(self, i):
+        self[i] = self.estimate(i)
+        return self[i]
+
+
+def _indexed_call(i, fun, args, kwargs):
+    """Calls the function in a process of the pool, and returns the index of
+    the job, the error (with its traceback) if any, its result, and its
+    running time."""
+    start_time = time.time()
+    try:
+        result = fun(*args, **kwargs)
+    except Exception as e:
+        return i, (e, traceback.format_exc()), None, time.time() - start_time
+    return i, None, result, time.time() - start_time
+
+
+def run_longest_first(fun, file_structs, n_jobs, args=(), kwargs=None,
+                      memory=None, costs=None):
+    """Runs `fun(file_struct, *args, **kwargs)` for each track in parallel,
+    and waits for all of them (see `iter_longest_first`).
+
+    Returns
+    -------
+    results: list
+        Results of the function, in the order of `file_structs`.
+    """
+    results = [None] * len(file_structs)
+    for i, result in iter_longest_first(fun, file_structs, n_jobs, args,
+                                        kwargs, memory, costs):
+        results[i] = result
+    return results
+
+
+def iter_longest_first(fun, file_structs, n_jobs, args=(), kwargs=None,
+                       memory=None, costs=None):
+    """Runs `fun(file_struct, *args, **kwargs)` for each track in parallel,
+    dispatching them longest first, and yields their results as soon as
+    they finish. The utilization of the pool is logged at the end of the
+    run.
+
+    Parameters
+    ----------
+    fun: function
+        Function to run on each track (it must be picklable).
+    file_structs: list
+        FileStructs of the tracks.
+    n_jobs: int
+        Maximum number of processes (negative values count back from the
+        number of CPUs, like in `joblib.Parallel`).
+    args: tuple
+        Additional positional arguments of the function.
+    kwargs: dict
+        Additional keyword arguments of the function.
+    memory: list or function
+        Estimated peak memory of each job, in bytes, or a function that
+        estimates it from the index of the job, called only when the job is
+        about to be admitted (so that the estimates that need to read the
+        files of a track are not computed for all of them before the run
+        starts). Jobs are only admitted while the memory of the running ones
+        stays under `msaf.Resources.memory_budget` (a job that exceeds the
+        budget by itself runs alone, as soon as the running ones finish).
+        `None` to ignore the budget.
+    costs: list
+        Cost of each track (see `get_costs`), or `None` to read them from
+        the headers of the audio files.
+
+    Yields
+    ------
+    i: int
+        Index of the track in `file_structs`.
+    result: object
+        Result of the function for the track.
+    """
+    args = tuple(args)
+    kwargs = kwargs or {}
+    budget = msaf.Resources.memory_budget
+    if memory is None or budget is None:
+        memory = [0] * len(file_structs)
+        budget = 0
+    elif callable(memory):
+        memory = _LazyEstimates(memory)
+    order = sort_longest_first(file_structs, costs)
+    n_workers = get_n_workers(n_jobs, len(file_structs))
+    task_times = []
+    start_time = time.time()
+    if n_workers == 1:
+        # Run the jobs in this process
+        for i in order:
+            job_start_time = time.time()
+            result = fun(file_structs[i], *args, **kwargs)
+            task_times.append(time.time() - job_start_time)
+            yield i, result
+    else:
+        for i, result, task_time in _iter_admitted(
+                fun, file_structs, order, n_workers, args, kwargs, memory,
+                budget):
+            task_times.append(task_time)
+            yield i, result
+    wall_time = time.time() - start_time
+
+    logging.info("Processed %d tracks in %.2f seconds with %d processes "
+                 "(utilization: %.1f%%)" % (
+                     len(file_structs), wall_time, n_workers,
+                     100 * get_utilization(task_times, n_workers, wall_time)))
+
+
+def _get_failure(i, error):
+    """Gets the record of a job that failed outside of the function (e.g.,
+    its arguments or result could not be pickled)."""
+    return i, (error, "".join(traceback.format_exception_only(type(error),
+                                                             error))), None, 0.
+
+
+def _fits(i, running, memory, budget):
+    """Checks whether job `i` can be admitted next to the running ones
+    without exceeding the memory budget."""
+    return not running or sum(running.values()) + memory[i] <= budget
+
+
+def _iter_admitted(fun, file_structs, order, n_workers, args, kwargs, memory,
+                   budget):
+    """Runs the jobs in a pool of processes, admitting the longest pending
+    job that fits in the memory budget whenever a process is free, and
+    yields their index, result and running time as they finish.
+
+    A job that exceeds the budget by itself is admitted as soon as the
+    running ones finish: no shorter job is admitted after it is the longest
+    pending one that does not fit, so that they can not keep it waiting.
+
+    Raises
+    ------
+    RuntimeError
+        If a process of the pool dies (e.g., it is killed for running out of
+        memory), since its job would never finish.
+    """
+    pending = list(order)
+    running = {}
+    futures = {}
+    executor = concurrent.futures.ProcessPoolExecutor(n_workers)
+    try:
+        while pending or running:
+            for i in list(pending):
+                if len(running) >= n_workers:
+                    break
+                if not _fits(i, running, memory, budget):
+                    if memory[i] > budget:
+                        # Wait for the running jobs to finish
+                        break
+                    continue
+                if budget and memory[i] > budget:
+                    logging.warning("The estimated memory of %s (%.1f MB) "
+                                    "exceeds the budget, running it alone" %
+                                    (file_structs[i].audio_file,
+                                     memory[i] / 1024. ** 2))
+                pending.remove(i)
+                running[i] = memory[i]
+                futures[executor.submit(
+                    _indexed_call, i, fun, (file_structs[i],) + args,
+                    kwargs)] = i
+
+            done, _ = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                i = futures.pop(future)
+                try:
+                    i, error, result, task_time = future.result()
+                except BrokenProcessPool:
+                    raise RuntimeError(
+                        "A process died while running %s" % ", ".join(
+                            file_structs[j].audio_file for j in running))
+                except Exception as e:
+                    i, error, result, task_time = _get_failure(i, e)
+                del running[i]
+                if error is not None:
+                    logging.error("Error processing %s:\n%s" %
+                                  (file_structs[i].audio_file, error[1]))
+                    raise error[0]
+                yield i, result, task_time
+    except:
+        # Do not wait for the jobs that are still running
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+        raise
+    executor.shutdown()
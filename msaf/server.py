@@ -0,0 +1,548 @@
+"""
+Segmentation server, to segment tracks on demand without paying the start-up
+costs of MSAF on each of them.
+
+The server is a (threaded) HTTP server that holds a pool of warm worker
+processes, which import the algorithms (and load their models) only once,
+and keeps the features of the last segmented tracks in memory (bounded by
+`msaf.Cache.server_max_size`, in bytes), so that segmenting a track again
+with other algorithms or parameters does not compute its features again.
+The cache lives in the server process, so that any process of the pool can
+segment any track: the cached features are pickled to the process on each
+request (`benchmarks/bench_server.py` reports this cost, which is small
+compared to segmenting the track). The references of the tracks (for
+ground truth boundaries and annotated beats) are not cached: they are read
+from small JAMS files in a fraction of a millisecond, which is negligible
+next to segmenting the track.
+
+Audio files are only read from the root directory of the server (requests
+with paths are rejected if it is not set), and a track that is not
+segmented within `segment_timeout` seconds terminates its process, which
+the pool replaces, so that stuck requests can not exhaust the pool.
+
+Endpoints:
+
+    GET /status
+        Workers, preloaded algorithms and statistics of the server.
+
+    POST /segment
+        Segments a track, and returns its boundaries and labels as JSON:
+
+            {"boundaries": [0.0, 12.3, ...], "labels": [0, 1, ...],
+             "time": 1.2}
+
+        The track is either the path to an audio file under the root
+        directory of the server (absolute, or relative to it), in a JSON
+        body:
+
+            {"path": "/data/track.mp3", "boundaries_id": "sf",
+             "labels_id": "fmc2d", "feature": "hpcp", "framesync": false,
+             "hier": false, "annot_beats": false, "config": {}}
+
+        or its PCM samples, as the raw body (Content-Type:
+        application/octet-stream), with the rest of parameters in the
+        query string (e.g., `/segment?sr=44100&dtype=int16&channels=2&
+        boundaries_id=foote`). Tracks of an MSAF dataset whose features have
+        already been computed are segmented from their features file (and
+        they can use annotated beats and ground truth boundaries).
+
+Example:
+
+    >> ./examples/run_server.py -p 8000 -j 4 -r /data
+    >> curl -d '{"path": "/data/track.mp3"}' http://localhost:8000/segment
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import multiprocessing
+import numpy as np
+import os
+import signal
+import socketserver
+import threading
+import time
+import traceback
+from http import server as BaseHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stuff
+import msaf
+from msaf import input_output as io
+from msaf import run
+from msaf import scheduling
+from msaf.algorithms import registry
+
+# Parameters of a segmentation request, with their default values
+REQUEST_DEFAULTS = {
+    "path": None,
+    "feature": "hpcp",
+    "framesync": False,
+    "boundaries_id": msaf.DEFAULT_BOUND_ID,
+    "labels_id": msaf.DEFAULT_LABEL_ID,
+    "hier": False,
+    "annot_beats": False,
+    "config": {}
+}
+
+# Boolean parameters of a request
+BOOLEAN_PARAMS = ["framesync", "hier", "annot_beats"]
+
+# Maximum time to segment a track, in seconds (e.g., if its process dies, its
+# result never arrives)
+SEGMENT_TIMEOUT = 600.
+
+
+def _init_worker(algo_ids):
+    """Imports the algorithms in a process of the pool."""
+    # Interruptions are handled by the server, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Jobs that miss their deadline terminate the process (see
+    # `_call_before_deadline`)
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    for algo_id in algo_ids:
+        try:
+            registry.get_module(algo_id)
+        except Exception:
+            logging.warning("Could not import the algorithm %s:\n%s" %
+                            (algo_id, traceback.format_exc()))
+
+
+def _call_before_deadline(deadline, fun, *args):
+    """Calls the function in a process of the pool, which is terminated (by
+    SIGALRM) if it does not return before the deadline (a time in seconds
+    since the epoch), so that the pool replaces it instead of keeping it
+    busy after the server gave up on the job."""
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise multiprocessing.TimeoutError("The deadline of the job passed "
+                                           "before it started")
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        return fun(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _parse_bool(value):
+    """Parses a boolean parameter of a query string."""
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ["1", "true", "yes"]:
+        return True
+    if value.lower() in ["0", "false", "no"]:
+        return False
+    raise ValueError("Invalid boolean value %s" % value)
+
+
+def parse_request(query, content_type, body, root_dir=None):
+    """Parses a segmentation request.
+
+    Parameters
+    ----------
+    query: str
+        Query string of the URL of the request.
+    content_type: str
+        Content type of the body: "application/octet-stream" for PCM samples,
+        JSON otherwise.
+    body: bytes
+        Body of the request.
+    root_dir: str
+        Directory of the audio files that can be requested by their path
+        (`None` to reject requests with paths).
+
+    Returns
+    -------
+    request: dict
+        Parameters of the request (see `REQUEST_DEFAULTS`), with the samples
+        of the track (`audio`, as an np.array(n_channels, N)) and their
+        sampling rate (`sr`) for PCM requests.
+    """
+    request = dict(REQUEST_DEFAULTS)
+    request["audio"], request["sr"] = None, None
+    params = dict((key, values[-1]) for key, values in
+                  parse_qs(query).items())
+    if content_type == "application/octet-stream":
+        if "sr" not in params:
+            raise ValueError("The sampling rate (sr) of the samples is "
+                             "missing")
+        try:
+            dtype = np.dtype(params.pop("dtype", "float32"))
+            channels = int(params.pop("channels", 1))
+            request["sr"] = int(params.pop("sr"))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid format of the samples")
+        if channels < 1 or request["sr"] <= 0:
+            raise ValueError("The number of channels and the sampling rate "
+                             "must be positive")
+        if len(body) % (dtype.itemsize * channels) != 0:
+            raise ValueError("The length of the body does not match the "
+                             "format of the samples")
+        request["audio"] = np.frombuffer(body, dtype=dtype).reshape(
+            -1, channels).T
+    else:
+        try:
+            params.update(json.loads(body.decode("utf-8")) if body else {})
+        except ValueError:
+            raise ValueError("The body is not valid JSON")
+
+    for key, value in params.items():
+        if key not in REQUEST_DEFAULTS:
+            raise ValueError("Unknown parameter %s" % key)
+        if key in BOOLEAN_PARAMS:
+            value = _parse_bool(value)
+        elif key == "labels_id" and value in ["", "none", "None"]:
+            value = None
+        request[key] = value
+    validate_request(request, root_dir)
+    if request["path"] is not None:
+        request["path"] = os.path.join(root_dir, request["path"])
+    return request
+
+
+def validate_request(request, root_dir=None):
+    """Checks the parameters of a segmentation request, raising a ValueError
+    if they are not valid (see `parse_request`)."""
+    if (request["path"] is None) == (request["audio"] is None):
+        raise ValueError("Either the path or the samples of the track are "
+                         "required")
+    if request["path"] is not None:
+        if root_dir is None:
+            raise ValueError("The server does not read audio files, send "
+                             "the samples of the track instead")
+        root_dir = os.path.realpath(root_dir)
+        path = os.path.realpath(os.path.join(root_dir, request["path"]))
+        if os.path.commonpath([root_dir, path]) != root_dir:
+            raise ValueError("Audio file %s is outside of the root directory"
+                             % request["path"])
+        if not os.path.isfile(path):
+            raise ValueError("Audio file %s not found" % request["path"])
+    if request["feature"] not in msaf.AVAILABLE_FEATS:
+        raise ValueError("Invalid feature %s" % request["feature"])
+    boundaries_id, labels_id = request["boundaries_id"], request["labels_id"]
+    if boundaries_id != "gt" and \
+            boundaries_id not in io.get_all_boundary_algorithms():
+        raise ValueError("Invalid boundaries algorithm %s" % boundaries_id)
+    if labels_id is not None and \
+            labels_id not in io.get_all_label_algorithms():
+        raise ValueError("Invalid labels algorithm %s" % labels_id)
+    if request["hier"] and boundaries_id != "gt" and \
+            not registry.get_metadata(boundaries_id)["supports_hier"]:
+        raise ValueError("Algorithm %s can not segment hierarchically" %
+                         boundaries_id)
+    if not isinstance(request["config"], dict):
+        raise ValueError("The config must be a dictionary")
+    if (boundaries_id == "gt" or request["annot_beats"]) and \
+            not has_features_file(request):
+        raise ValueError("Ground truth boundaries and annotated beats are "
+                         "only available for tracks of an MSAF dataset")
+
+
+def has_features_file(request):
+    """Checks whether the track of a request is in an MSAF dataset, with its
+    features already computed."""
+    if request["path"] is None:
+        return False
+    file_struct = io.FileStruct(request["path"])
+    return io.features_exist(file_struct.features_file)
+
+
+def get_features_key(request):
+    """Gets the key of the features of the track of a request in the cache of
+    the server: its path, size and modification time, or the digest of its
+    samples."""
+    if request["path"] is not None:
+        stat = os.stat(request["path"])
+        return ("path", os.path.realpath(request["path"]), stat.st_size,
+                stat.st_mtime)
+    audio = np.ascontiguousarray(request["audio"])
+    return ("pcm", hashlib.sha1(audio.view(np.uint8)).hexdigest(),
+            audio.shape, audio.dtype.str, request["sr"])
+
+
+def get_features_size(features):
+    """Gets the size of the arrays of the features of a track, in bytes."""
+    return sum(value.nbytes for value in features.values()
+               if isinstance(value, np.ndarray))
+
+
+def get_config(request):
+    """Gets the configuration of the algorithms of a request."""
+    config = io.get_configuration(request["feature"], request["annot_beats"],
+                                  request["framesync"],
+                                  request["boundaries_id"],
+                                  request["labels_id"])
+    config.update(request["config"])
+    config["hier"] = request["hier"]
+    return config
+
+
+def segment_track(request, features=None):
+    """Segments the track of a request (in a process of the pool).
+
+    Parameters
+    ----------
+    request: dict
+        Parameters of the request (see `parse_request`).
+    features: dict
+        Features of the track, from the cache of the server (`None` if they
+        are not cached).
+
+    Returns
+    -------
+    est_times: np.array or list
+        Estimated boundary times (a list of them if `hier`).
+    est_labels: np.array or list
+        Estimated labels (a list of them if `hier`).
+    features: dict
+        Features of the track if they were computed, to cache them (`None`
+        otherwise).
+    """
+    config = get_config(request)
+    if features is None and has_features_file(request):
+        np.random.seed(123)
+        est_times, est_labels = run.run_algorithms(
+            request["path"], request["boundaries_id"], request["labels_id"],
+            config)
+        return est_times, est_labels, None
+
+    audio, sr = request["audio"], request["sr"]
+    feat_names = io.get_required_features(
+        request["feature"], request["boundaries_id"], request["labels_id"])
+    if request["path"] is not None and (features is None or any(
+            feat_name not in features for feat_name in feat_names)):
+        audio, sr = io.load_audio(request["path"], sr=msaf.Anal.sample_rate)
+    est_times, est_labels, new_features = run.process_signal(
+        audio, sr, feature=request["feature"],
+        framesync=request["framesync"],
+        boundaries_id=request["boundaries_id"],
+        labels_id=request["labels_id"], hier=request["hier"], config=config,
+        features=features)
+    return est_times, est_labels, \
+        None if new_features is features else new_features
+
+
+def _to_json(values, hier):
+    """Converts the estimated times or labels to JSON lists."""
+    if hier:
+        return [np.asarray(level).tolist() for level in values]
+    return np.asarray(values).tolist()
+
+
+class SegmentationServer(socketserver.ThreadingMixIn,
+                         BaseHTTPServer.HTTPServer):
+    """HTTP server with a pool of processes to segment tracks.
+
+    Parameters
+    ----------
+    address: tuple
+        Host and port of the server (port 0 to pick a free one).
+    n_workers: int
+        Number of processes of the pool (negative values count back from the
+        number of CPUs, like in `joblib.Parallel`).
+    preload: list
+        Identifiers of the algorithms to import in the processes when they
+        start (`None` for all of them).
+    segment_timeout: float
+        Maximum time to segment a track, in seconds. The process of a track
+        that exceeds it is terminated, and replaced by a new one.
+    root_dir: str
+        Directory of the audio files that can be requested by their path
+        (`None` to only accept the samples of the tracks).
+    """
+    daemon_threads = True
+
+    def __init__(self, address, n_workers=4, preload=None,
+                 segment_timeout=SEGMENT_TIMEOUT, root_dir=None):
+        if preload is None:
+            preload = registry.get_algorithm_ids()
+        self.preload = list(preload)
+        self.segment_timeout = segment_timeout
+        self.root_dir = root_dir
+        self.n_workers = scheduling.get_n_workers(
+            n_workers, multiprocessing.cpu_count())
+        self.pool = multiprocessing.Pool(self.n_workers, _init_worker,
+                                         (self.preload,))
+        self.lock = threading.Lock()
+        self.features = collections.OrderedDict()  # LRU cache of features
+        self.stats = {"requests": 0, "errors": 0, "timeouts": 0,
+                      "cache_hits": 0}
+        try:
+            BaseHTTPServer.HTTPServer.__init__(self, address, RequestHandler)
+        except:
+            self.pool.terminate()
+            raise
+
+    def get_cached_features(self, key):
+        """Gets the features of a track from the cache (`None` if they are
+        not cached)."""
+        with self.lock:
+            features = self.features.pop(key, None)
+            if features is not None:
+                self.features[key] = features  # Most recently used
+                self.stats["cache_hits"] += 1
+            return features
+
+    def cache_features(self, key, features):
+        """Puts the features of a track in the cache, evicting the least
+        recently used ones if it exceeds `msaf.Cache.server_max_size`."""
+        if get_features_size(features) > msaf.Cache.server_max_size:
+            return
+        with self.lock:
+            self.features.pop(key, None)
+            self.features[key] = features
+            while sum(get_features_size(value) for value in
+                      self.features.values()) > msaf.Cache.server_max_size:
+                self.features.popitem(last=False)
+
+    def segment(self, request):
+        """Segments the track of a request in the pool, sending it the
+        cached features of the track, if any.
+
+        Parameters
+        ----------
+        request: dict
+            Parameters of the request (see `parse_request`).
+
+        Returns
+        -------
+        result: dict
+            Estimated boundaries and labels, and time to segment the track,
+            in seconds.
+
+        Raises
+        ------
+        multiprocessing.TimeoutError
+            If the track is not segmented within `segment_timeout` (e.g., its
+            process died). Its process is terminated when the time is up.
+        """
+        start_time = time.time()
+        key = get_features_key(request)
+        features = self.get_cached_features(key)
+        if features is not None and request["audio"] is not None:
+            # Do not send the samples if they are not needed
+            feat_names = io.get_required_features(
+                request["feature"], request["boundaries_id"],
+                request["labels_id"])
+            if all(feat_name in features for feat_name in feat_names):
+                request = dict(request, audio=None)
+        est_times, est_labels, features = self.pool.apply_async(
+            _call_before_deadline,
+            (start_time + self.segment_timeout, segment_track, request,
+             features)).get(self.segment_timeout)
+        if features is not None:
+            self.cache_features(key, features)
+        return {"boundaries": _to_json(est_times, request["hier"]),
+                "labels": _to_json(est_labels, request["hier"]),
+                "time": time.time() - start_time}
+
+    def get_status(self):
+        """Gets the status of the server."""
+        with self.lock:
+            status = {"workers": self.n_workers,
+                      "algorithms": self.preload,
+                      "cached_tracks": len(self.features),
+                      "cache_size": sum(get_features_size(value) for value
+                                        in self.features.values())}
+            status.update(self.stats)
+            return status
+
+    def count(self, stat):
+        """Increments a statistic of the server."""
+        with self.lock:
+            self.stats[stat] += 1
+
+    def server_close(self):
+        """Closes the server and terminates the pool."""
+        BaseHTTPServer.HTTPServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handler of the requests of the segmentation server."""
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/status":
+            self.send_json(404, {"error": "Not found"})
+            return
+        self.send_json(200, self.server.get_status())
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/segment":
+            self.send_json(404, {"error": "Not found"})
+            return
+        self.server.count("requests")
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            request = parse_request(url.query,
+                                    self.headers.get("Content-Type"), body,
+                                    self.server.root_dir)
+        except ValueError as e:
+            self.server.count("errors")
+            self.send_json(400, {"error": str(e)})
+            return
+        try:
+            result = self.server.segment(request)
+        except multiprocessing.TimeoutError:
+            self.server.count("timeouts")
+            logging.error("Timeout segmenting %s" %
+                          (request["path"] or "samples"))
+            self.send_json(503, {"error": "The track was not segmented in "
+                                 "%g seconds" % self.server.segment_timeout})
+            return
+        except Exception as e:
+            self.server.count("errors")
+            logging.error("Error segmenting %s:\n%s" %
+                          (request["path"] or "samples",
+                           traceback.format_exc()))
+            self.send_json(500, {"error": "%s: %s" % (type(e).__name__, e)})
+            return
+        self.send_json(200, result)
+
+    def send_json(self, code, data):
+        """Sends a JSON response."""
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s" % (self.address_string(), format % args))
+
+
+def serve(host="localhost", port=8000, n_workers=4, preload=None,
+          segment_timeout=SEGMENT_TIMEOUT, root_dir=None):
+    """Runs the segmentation server until it is interrupted.
+
+    Parameters
+    ----------
+    host: str
+        Host name or address to listen on.
+    port: int
+        Port to listen on.
+    n_workers: int
+        Number of processes of the pool.
+    preload: list
+        Identifiers of the algorithms to import when the processes start
+        (`None` for all of them).
+    segment_timeout: float
+        Maximum time to segment a track, in seconds.
+    root_dir: str
+        Directory of the audio files that can be requested by their path
+        (`None` to only accept the samples of the tracks).
+    """
+    server = SegmentationServer((host, port), n_workers, preload,
+                                segment_timeout, root_dir)
+    logging.info("Serving on http://%s:%d with %d processes" %
+                 (host, server.server_address[1], server.n_workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,88 @@
+"""
+Cache of the self-similarity and recurrence matrices of a track, shared
+across segmenters.
+
+Several algorithms (or several configurations of the same one) run on the
+same track often build the same pairwise distance matrices, which take
+O(N^2) time and memory on N frames. Within a `track_cache()` block, the
+functions decorated with `memoize` (e.g., `recurrence_matrix`) compute each
+distinct matrix once: entries are addressed by the function, the content of
+the input feature matrix (so they depend on the feature, the sync mode and
+any embedding or filtering applied to it) and the rest of arguments (metric,
+number of neighbors...).
+
+The cache is bounded by `msaf.Cache.ssm_max_size` (in bytes), evicting the
+least recently used matrices first. Cached matrices are read-only, since they
+are shared by all the segmenters. Outside of a `track_cache()` block, the
+decorated functions just compute the matrices.
+"""
+import collections
+import contextlib
+import functools
+import hashlib
+import logging
+import numpy as np
+
+import librosa
+
+import msaf
+
+# Current cache (None if disabled), an LRU dictionary of matrices
+_cache = None
+
+
+@contextlib.contextmanager
+def track_cache():
+    """Enables the cache of matrices within a block of code (e.g., while
+    running several algorithms on a track), and clears it at the end."""
+    global _cache
+    prev_cache = _cache
+    _cache = collections.OrderedDict()
+    try:
+        yield
+    finally:
+        _cache = prev_cache
+
+
+def get_cache_size():
+    """Gets the size of the matrices in the cache, in bytes."""
+    if _cache is None:
+        return 0
+    return sum(value.nbytes for value in _cache.values())
+
+
+def get_key(fun, X, args, kwargs):
+    """Gets the key of the matrix computed by calling `fun(X, *args,
+    **kwargs)`."""
+    X = np.ascontiguousarray(X)
+    digest = hashlib.sha1(X.view(np.uint8)).hexdigest()
+    return (fun.__module__, fun.__name__, X.shape, X.dtype.str, digest,
+            args, tuple(sorted(kwargs.items())))
+
+
+def memoize(fun):
+    """Decorates a function that computes a matrix from a feature matrix
+    (its first argument) to use the cache of matrices, if enabled."""
+    @functools.wraps(fun)
+    def wrapper(X, *args, **kwargs):
+        if _cache is None or msaf.Cache.ssm_max_size <= 0:
+            return fun(X, *args, **kwargs)
+        key = get_key(fun, X, args, kwargs)
+        if key in _cache:
+            logging.debug("Reusing the cached %s matrix" % fun.__name__)
+            value = _cache.pop(key)
+            _cache[key] = value  # Most recently used
+            return value
+        value = fun(X, *args, **kwargs)
+        if value.nbytes > msaf.Cache.ssm_max_size:
+            return value
+        value.flags.writeable = False
+        _cache[key] = value
+        while get_cache_size() > msaf.Cache.ssm_max_size:
+            _cache.popitem(last=False)
+        return value
+    return wrapper
+
+
+# Recurrence matrix (see `librosa.segment.recurrence_matrix`)
+recurrence_matrix = memoize(librosa.segment.recurrence_matrix)
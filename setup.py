@@ -23,18 +23,18 @@ setup(
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
         "Topic :: Multimedia :: Sound/Audio :: Analysis",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.7"
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.4"
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.7"
     ],
+    python_requires='>=3.7',
     keywords='audio music sound',
     license='MIT',
     install_requires=[
         'audioread',
         'jams',
         'numpy >= 1.8.0',
-        'scipy >= 0.13.0',
+        'scipy >= 0.18.0',
         'scikit-learn >= 0.14.0',
         'seaborn',  # For notebook example (but everyone should have this :-))
         'matplotlib',
@@ -42,7 +42,7 @@ setup(
         'decorator',
         'cvxopt',
         'joblib',
-        'librosa >= 0.4.2',
+        'librosa >= 0.5.0',
         'mir_eval',
         'pandas'
     ],
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import nottest, eq_, raises, assert_equals
+import numpy as np
+import numpy.testing as npt
+import os
+import shutil
+import time
+
+# Msaf imports
+import msaf
+import msaf.cache
+
+# Global vars
+audio_file = os.path.join("fixtures", "chirp.mp3")
+cache_dir = "tmp_cache"
+
+
+def _write_store(features_file, value):
+    feats = {"metadata": {}, "analysis": {"dur": 1.0}, "timestamp": "",
+             "beats": {"times": np.arange(4)},
+             "framesync": {"mfcc": np.ones((10, 14)) * value}}
+    msaf.io.write_features_store(features_file, feats)
+
+
+def test_cache():
+    features_file = "tmp" + msaf.Dataset.features_ext
+    copy_file = "tmp_copy" + msaf.Dataset.features_ext
+    for path in [cache_dir, features_file, copy_file]:
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    features_dir = msaf.Cache.features_dir
+    msaf.Cache.features_dir = cache_dir
+    try:
+        anal = {"hop_size": 1024}
+        assert not msaf.cache.fetch_features(audio_file, anal, copy_file)
+
+        # Store and fetch
+        _write_store(features_file, 1)
+        msaf.cache.store_features(audio_file, anal, features_file)
+        assert msaf.cache.fetch_features(audio_file, anal, copy_file)
+        feats = msaf.io.read_features_file(copy_file)
+        npt.assert_array_equal(feats["framesync"]["mfcc"], 1)
+        shutil.rmtree(copy_file)
+
+        # Different analysis parameters are different entries
+        assert not msaf.cache.fetch_features(audio_file, {"hop_size": 512},
+                                             copy_file)
+
+        # So are different storages
+        features_storage = msaf.Dataset.features_storage
+        msaf.Dataset.features_storage = "float16"
+        try:
+            assert not msaf.cache.fetch_features(audio_file, anal, copy_file)
+        finally:
+            msaf.Dataset.features_storage = features_storage
+
+        # Evict the least recently used entry
+        entry = msaf.cache.get_entry(audio_file, anal)
+        os.utime(entry, (time.time() - 60, time.time() - 60))
+        msaf.cache.store_features(audio_file, {"hop_size": 512},
+                                  features_file)
+        msaf.cache.evict(msaf.cache._get_size(entry) + 1)
+        assert not os.path.exists(entry)
+        assert os.path.exists(msaf.cache.get_entry(audio_file,
+                                                   {"hop_size": 512}))
+    finally:
+        msaf.Cache.features_dir = features_dir
+        for path in [cache_dir, features_file, copy_file]:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+
+def test_audio_cache():
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    audio_dir = msaf.Cache.audio_dir
+    msaf.Cache.audio_dir = cache_dir
+    try:
+        assert msaf.cache.fetch_audio(audio_file, 11025) is None
+
+        # The first load decodes the file, the next ones map the cache
+        y, sr = msaf.io.load_audio(audio_file, sr=11025)
+        assert_equals(sr, 11025)
+        entry = msaf.cache.get_audio_entry(audio_file, sr)
+        assert os.path.isfile(entry)
+        cached_y, cached_sr = msaf.io.load_audio(audio_file, sr=11025)
+        assert isinstance(cached_y, np.memmap)
+        assert_equals(cached_sr, sr)
+        npt.assert_array_equal(cached_y, y)
+
+        # Each resampler has its own entries
+        resample_type = msaf.Anal.resample_type
+        msaf.Anal.resample_type = "polyphase"
+        try:
+            assert msaf.cache.get_audio_entry(audio_file, sr) != entry
+            assert msaf.cache.fetch_audio(audio_file, sr) is None
+        finally:
+            msaf.Anal.resample_type = resample_type
+
+        # Native sample rate
+        y, sr = msaf.io.load_audio(audio_file, sr=None)
+        assert_equals(sr, msaf.io.read_audio_sample_rate(audio_file))
+
+        # Evict the least recently used entry
+        native_entry = msaf.cache.get_audio_entry(audio_file, sr)
+        os.utime(entry, (time.time() - 60, time.time() - 60))
+        msaf.cache._evict(cache_dir, ".npy", os.path.getsize(native_entry))
+        assert not os.path.exists(entry)
+        assert os.path.exists(native_entry)
+    finally:
+        msaf.Cache.audio_dir = audio_dir
+        if os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir)
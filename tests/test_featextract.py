@@ -8,8 +8,11 @@ import glob
 import json
 import librosa
 from nose.tools import nottest, eq_, raises, assert_equals
+import numpy as np
 import numpy.testing as npt
 import os
+import scipy.io.wavfile
+import shutil
 
 # Msaf imports
 import msaf.featextract
@@ -37,6 +40,94 @@ def test_compute_features():
     assert_equals(hpcp.shape[0], tonnetz.shape[0])
 
 
+def test_feature_engine():
+    engine = msaf.featextract.FeatureEngine(audio, harmonic=y_harmonic)
+    hpcp = engine.get("hpcp")
+    assert hpcp.shape[1] == 12
+    assert not engine.is_computed("hpss")
+    assert not engine.is_computed("cqt_spectrum")
+
+    # The CQT is shared
+    cqt = engine.get("cqt")
+    assert engine.is_computed("cqt_spectrum")
+    assert_equals(cqt.shape[1], msaf.Anal.cqt_bins)
+
+    # Take the chroma from the same CQT
+    msaf.Anal.chroma_from_cqt = True
+    try:
+        engine = msaf.featextract.FeatureEngine(audio)
+        cqt_hpcp = engine.get("hpcp")
+        assert engine.is_computed("cqt_spectrum")
+        assert not engine.is_computed("harmonic")
+        assert_equals(cqt_hpcp.shape, hpcp.shape)
+    finally:
+        msaf.Anal.chroma_from_cqt = False
+
+
+def test_feature_engine_threads():
+    feat_names = ["mfcc", "hpcp", "tonnetz", "cqt"]
+    engine = msaf.featextract.FeatureEngine(audio)
+    graph = engine.get_graph(["tonnetz"])
+    assert_equals(graph["tonnetz"], set(["hpcp"]))
+    assert_equals(graph["harmonic"], set(["hpss"]))
+    assert "cqt" not in graph
+    engine.compute(feat_names, n_threads=4)
+    for name in feat_names + ["hpss", "stft", "cqt_spectrum"]:
+        assert engine.is_computed(name)
+    assert_equals(engine.get_graph(feat_names), {})
+
+    # Same results as computing them serially
+    serial_engine = msaf.featextract.FeatureEngine(audio)
+    for feat_name in feat_names:
+        npt.assert_array_equal(engine.get(feat_name),
+                               serial_engine.get(feat_name))
+
+
+def test_feature_engine_spectral_hpss():
+    engine = msaf.featextract.FeatureEngine(audio)
+    msaf.Anal.hpss_mode = "spectral"
+    try:
+        spectral_engine = msaf.featextract.FeatureEngine(audio)
+    finally:
+        msaf.Anal.hpss_mode = "signal"
+    hpcp = spectral_engine.get("hpcp")
+    assert spectral_engine.is_computed("harmonic_spectrum")
+    assert not spectral_engine.is_computed("hpss")
+    assert_equals(hpcp.shape, engine.get("hpcp").shape)
+
+    # The percussive spectrogram is aligned with the signal one
+    S_db = spectral_engine.get("percussive_mel_db")
+    assert_equals(S_db.shape, engine.get("percussive_mel_db").shape)
+    onset_envelope = msaf.featextract.compute_onset_envelope(S_db, sr=sr)
+    assert_equals(len(onset_envelope), S_db.shape[1])
+    assert not spectral_engine.is_computed("percussive")
+
+
+@raises(ValueError)
+def test_feature_engine_unknown_hpss_mode():
+    msaf.Anal.hpss_mode = "unknown"
+    try:
+        msaf.featextract.FeatureEngine(audio)
+    finally:
+        msaf.Anal.hpss_mode = "signal"
+
+
+class StageError(Exception):
+    """Error raised by a failing stage of the feature engine."""
+    pass
+
+
+def _failing_stage():
+    raise StageError("Failing stage")
+
+
+@raises(StageError)
+def test_feature_engine_threads_error():
+    engine = msaf.featextract.FeatureEngine(audio)
+    engine._compute_stft = _failing_stage
+    engine.compute(["mfcc", "cqt"], n_threads=2)
+
+
 def test_save_features():
     # Read audio and compute features
     tmp_file = "temp.json"
@@ -72,6 +163,59 @@ def test_compute_beat_sync_features():
     assert_equals(bs_hpcp.shape[0], bs_tonnetz.shape[0])
 
 
+def test_sync_features_grids():
+    rng = np.random.RandomState(0)
+    features = {"mfcc": rng.rand(100, 14), "hpcp": rng.rand(100, 12)}
+    grids = {"beats": np.array([0, 3, 10, 11, 40, 77, 99]),
+             "ann_beats": np.array([5, 5, 20, 50, 120]),
+             "empty": np.array([], dtype=int)}
+    for aggregate, agg_fun in [("mean", np.mean), ("median", np.median)]:
+        sync_feats = msaf.featextract.sync_features_grids(
+            features, grids, ["mfcc", "hpcp"], aggregate=aggregate)
+        for grid_name, idx in grids.items():
+            for feat_name, feat in features.items():
+                ref = librosa.feature.sync(feat.T, idx, aggregate=agg_fun,
+                                           pad=True).T[:len(idx)]
+                npt.assert_allclose(sync_feats[grid_name][feat_name], ref)
+
+    # All the features are views of the same buffer
+    assert sync_feats["beats"]["mfcc"].base is \
+        sync_feats["ann_beats"]["hpcp"].base
+
+    # Which keeps the precision of the features
+    features = dict((feat_name, feat.astype(np.float32))
+                    for feat_name, feat in features.items())
+    sync_feats = msaf.featextract.sync_features_grids(
+        features, grids, ["mfcc", "hpcp"])
+    assert_equals(sync_feats["beats"]["mfcc"].dtype, np.float32)
+
+
+def test_sync_all_grids():
+    rng = np.random.RandomState(0)
+    features = {"mfcc": rng.rand(100, 14), "hpcp": rng.rand(100, 12),
+                "beats_idx": np.array([0, 3, 10, 11, 40, 77, 99])}
+    annot_beats = np.array([0.5, 1.2, 2.0])
+    msaf.featextract.sync_all_grids(features, ["mfcc", "hpcp"], annot_beats)
+    annot_beats_idx = librosa.time_to_frames(
+        annot_beats, sr=msaf.Anal.sample_rate, hop_length=msaf.Anal.hop_size)
+    for feat_name in ["mfcc", "hpcp"]:
+        npt.assert_allclose(features["bs_" + feat_name],
+                            msaf.featextract.sync_features(
+                                features, features["beats_idx"],
+                                [feat_name])[feat_name])
+        npt.assert_allclose(features["ann_" + feat_name],
+                            msaf.featextract.sync_features(
+                                features, annot_beats_idx,
+                                [feat_name])[feat_name])
+
+
+@raises(ValueError)
+def test_sync_features_grids_aggregate():
+    features = {"mfcc": np.ones((10, 14))}
+    msaf.featextract.sync_features_grids(features, {"beats": [2, 5]},
+                                         ["mfcc"], aggregate="max")
+
+
 def test_compute_features_for_audio_file():
     features = msaf.featextract.compute_features_for_audio_file(audio_file)
     keys = ["mfcc", "hpcp", "tonnetz", "cqt", "beats_idx", "beats", "bs_mfcc",
@@ -84,6 +228,33 @@ def test_compute_features_for_audio_file():
         assert anal_key in features["anal"].keys()
 
 
+def test_compute_features_for_signal():
+    beats = np.arange(0.5, 2.5, 0.5)
+    features = msaf.featextract.compute_features_for_audio_file(
+        audio_file, beats=beats)
+    signal_features = msaf.featextract.compute_features_for_signal(
+        audio, sr, beats=beats)
+    assert_equals(sorted(features.keys()), sorted(signal_features.keys()))
+    for feat_name in msaf.AVAILABLE_FEATS:
+        npt.assert_array_equal(features[feat_name],
+                               signal_features[feat_name])
+        npt.assert_array_equal(features["bs_" + feat_name],
+                               signal_features["bs_" + feat_name])
+    assert_equals(features["anal"], signal_features["anal"])
+
+    # Integer PCM, multichannel, and resampled signals
+    pcm = (np.vstack((audio, audio)) * 2 ** 15).astype(np.int16)
+    pcm_features = msaf.featextract.compute_features_for_signal(
+        pcm, sr, feat_names=["mfcc"], beats=beats)
+    npt.assert_allclose(pcm_features["mfcc"], features["mfcc"], atol=1e-1)
+    resampled_features = msaf.featextract.compute_features_for_signal(
+        librosa.resample(audio, orig_sr=sr, target_sr=2 * sr), 2 * sr,
+        feat_names=["mfcc"], beats=beats)
+    assert_equals(resampled_features["mfcc"].shape, features["mfcc"].shape)
+    npt.assert_almost_equal(resampled_features["anal"]["dur"],
+                            features["anal"]["dur"], decimal=3)
+
+
 def test_compute_all_features():
     # Create file struct
     file_struct = FileStruct(audio_file)
@@ -124,6 +295,203 @@ def test_compute_all_features():
     os.remove(beats_file)
 
 
+def test_compute_all_features_incremental():
+    # Create file struct
+    file_struct = FileStruct(audio_file)
+    feat_file = "tmp" + msaf.Dataset.features_ext
+    file_struct.features_file = feat_file
+    if os.path.exists(feat_file):
+        shutil.rmtree(feat_file)
+
+    # Compute a subset of the features
+    msaf.featextract.compute_all_features(file_struct, feat_names=["mfcc"])
+    feats = msaf.io.read_features_file(feat_file)
+    assert_equals(list(feats["framesync"].keys()), ["mfcc"])
+    beats = np.array(feats["beats"]["times"])
+    mfcc = np.array(feats["est_beatsync"]["mfcc"])
+
+    # Add the missing ones, synchronized to the same beats
+    msaf.featextract.compute_all_features(file_struct,
+                                          feat_names=["mfcc", "hpcp"])
+    feats = msaf.io.read_features_file(feat_file)
+    assert_equals(sorted(feats["framesync"].keys()), ["hpcp", "mfcc"])
+    npt.assert_array_equal(feats["beats"]["times"], beats)
+    npt.assert_array_equal(feats["est_beatsync"]["mfcc"], mfcc)
+    assert_equals(feats["est_beatsync"]["hpcp"].shape[0], len(beats))
+
+    # Clean up
+    shutil.rmtree(feat_file)
+
+
+def test_compute_all_features_legacy():
+    # Legacy JSON files are left untouched, without reading the annotations
+    file_struct = FileStruct(audio_file)
+    file_struct.features_file = "tmp" + msaf.Dataset.legacy_features_ext
+    with open(file_struct.features_file, "w") as f:
+        json.dump({}, f)
+    read_annot_beats = msaf.featextract.read_annot_beats
+    msaf.featextract.read_annot_beats = lambda ref_file: _failing_stage()
+    try:
+        msaf.featextract.compute_all_features(file_struct)
+    finally:
+        msaf.featextract.read_annot_beats = read_annot_beats
+        os.remove(file_struct.features_file)
+
+
+def test_find_stale_features():
+    anal = msaf.featextract.get_analysis_params()
+    feat_names = ["mfcc", "hpcp", "tonnetz", "cqt"]
+    stale_beats, stale_feats = msaf.featextract.find_stale_features(
+        anal, feat_names)
+    assert not stale_beats
+    assert_equals(stale_feats, [])
+
+    # Chroma parameters only affect the chroma-based features
+    anal["chroma_from_cqt"] = not anal["chroma_from_cqt"]
+    stale_beats, stale_feats = msaf.featextract.find_stale_features(
+        anal, feat_names)
+    assert not stale_beats
+    assert_equals(stale_feats, ["hpcp", "tonnetz"])
+
+    # Parameters missing in older files are assumed to be up to date
+    del anal["chroma_from_cqt"]
+    stale_beats, stale_feats = msaf.featextract.find_stale_features(
+        anal, feat_names)
+    assert_equals(stale_feats, [])
+
+    # The hop size changes the beats, so everything is stale
+    anal["hop_size"] *= 2
+    stale_beats, stale_feats = msaf.featextract.find_stale_features(
+        anal, feat_names)
+    assert stale_beats
+    assert_equals(stale_feats, feat_names)
+
+    # And so does the resampler
+    anal = msaf.featextract.get_analysis_params()
+    anal["resample_type"] = "polyphase"
+    stale_beats, stale_feats = msaf.featextract.find_stale_features(
+        anal, feat_names)
+    assert stale_beats
+
+
+def test_compute_all_features_stale():
+    file_struct = FileStruct(audio_file)
+    feat_file = "tmp" + msaf.Dataset.features_ext
+    file_struct.features_file = feat_file
+    if os.path.exists(feat_file):
+        shutil.rmtree(feat_file)
+    msaf.featextract.compute_all_features(file_struct,
+                                          feat_names=["mfcc", "cqt"])
+    cqt = np.array(msaf.io.read_features_file(feat_file)["framesync"]["cqt"])
+
+    # Changing the MFCC parameters only recomputes the MFCCs
+    mfcc_coeff = msaf.Anal.mfcc_coeff
+    msaf.Anal.mfcc_coeff = mfcc_coeff + 1
+    try:
+        msaf.featextract.compute_all_features(file_struct,
+                                              feat_names=["cqt"])
+        feats = msaf.io.read_features_file(feat_file)
+        assert_equals(feats["framesync"]["mfcc"].shape[1], mfcc_coeff + 1)
+        assert_equals(feats["analysis"]["mfcc_coeff"], mfcc_coeff + 1)
+        npt.assert_array_equal(feats["framesync"]["cqt"], cqt)
+    finally:
+        msaf.Anal.mfcc_coeff = mfcc_coeff
+
+    # Clean up
+    shutil.rmtree(feat_file)
+
+
+def test_overlapping_blocks():
+    signal = np.arange(1000, dtype=np.float32)
+    chunks = [signal[i:i + 64] for i in range(0, len(signal), 64)]
+    blocks = list(msaf.featextract._overlapping_blocks(chunks, 300, 50))
+    assert_equals(len(blocks), 4)
+    samples = []
+    for i, (window, offset, is_last) in enumerate(blocks):
+        start = i * 300
+        assert_equals(is_last, i == 3)
+        assert_equals(window[0], max(0, start - 50))
+        assert_equals(window[offset], start)
+        samples.append(window[offset:None if is_last else offset + 300])
+    npt.assert_array_equal(np.concatenate(samples), signal)
+
+
+def _write_stream_track(wav_file, sr=44100, dur=12):
+    """Writes a synthetic track with three sections and clicks every half a
+    second, at a sampling rate that needs to be resampled."""
+    t = np.arange(dur * sr) / float(sr)
+    audio = np.zeros(len(t))
+    for i, f0 in enumerate([220, 330, 262]):
+        section = (t >= 4 * i) & (t < 4 * (i + 1))
+        audio[section] += 0.3 * np.sin(2 * np.pi * f0 * t[section])
+    rng = np.random.RandomState(0)
+    for beat in np.arange(0.25, dur, 0.5):
+        start = int(beat * sr)
+        audio[start:start + 2000] += 0.5 * rng.randn(2000) * \
+            np.exp(-np.arange(2000) / 400.)
+    audio = audio / np.max(np.abs(audio)) * 30000
+    scipy.io.wavfile.write(wav_file, sr, audio.astype(np.int16))
+
+
+def _stream_and_compute(wav_file, stream_dir):
+    """Computes the features of a file with and without streaming it."""
+    os.makedirs(stream_dir)
+    stream_block_dur = msaf.Anal.stream_block_dur
+    msaf.Anal.stream_block_dur = 3
+    try:
+        features = msaf.featextract.compute_features_for_audio_file(wav_file)
+        stream_features = msaf.featextract.stream_features_for_audio_file(
+            wav_file, stream_dir)
+    finally:
+        msaf.Anal.stream_block_dur = stream_block_dur
+    return features, stream_features
+
+
+def test_stream_features_for_audio_file():
+    work_dir = "tmp_stream"
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    try:
+        wav_file = os.path.join(work_dir, "track.wav")
+        _write_stream_track(wav_file)
+
+        # The tunings are estimated from the whole track, so all the
+        # features match
+        stream_dir = os.path.join(work_dir, "stream")
+        features, stream_features = _stream_and_compute(wav_file, stream_dir)
+        assert_equals(features["anal"]["dur"],
+                      stream_features["anal"]["dur"])
+        npt.assert_array_equal(features["beats"], stream_features["beats"])
+        for feat_name in msaf.AVAILABLE_FEATS:
+            for prefix in ["", "bs_"]:
+                npt.assert_allclose(features[prefix + feat_name],
+                                    stream_features[prefix + feat_name],
+                                    atol=1e-8)
+
+        # Only the features are left in the work directory
+        assert_equals(sorted(glob.glob(os.path.join(stream_dir, "*_*.npy"))),
+                      sorted(os.path.join(stream_dir, stage + ".npy")
+                             for stage in ["cqt_db", "mel_db",
+                                           "percussive_mel_db"]))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_tuning_accumulator():
+    # A tone 30 cents above A4
+    y = np.sin(2 * np.pi * 440 * 2 ** (0.3 / 12) * np.arange(2 * sr) /
+               float(sr))
+    pitches, mags = librosa.piptrack(y=y, sr=sr, n_fft=2048)
+    accumulator = msaf.featextract.TuningAccumulator("tmp_peaks.npy")
+    for i in range(0, pitches.shape[1], 10):
+        accumulator.append(pitches[:, i:i + 10], mags[:, i:i + 10])
+    tuning = accumulator.estimate()
+    npt.assert_almost_equal(tuning, librosa.estimate_tuning(y=y, sr=sr))
+    npt.assert_almost_equal(tuning, 0.3, decimal=1)
+    assert not os.path.exists("tmp_peaks.npy")
+
+
 def test_process():
     # Set output file
     feat_file = "tmp.json"
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import assert_raises, assert_equals
+import json
+import subprocess
+import sys
+from types import ModuleType
+
+# Msaf imports
+import msaf
+
+# Modules that `import msaf` should not import
+heavy_modules = ["librosa", "matplotlib", "pandas", "pylab", "mir_eval",
+                 "msaf.run", "msaf.featextract", "msaf.eval",
+                 "msaf.plotting", "msaf.algorithms.foote",
+                 "msaf.algorithms.foote.segmenter",
+                 "msaf.algorithms.fmc2d.segmenter"]
+
+
+def _get_imported_modules(code):
+    """Runs the code in a new interpreter, and gets the heavy modules that
+    it imported."""
+    code += "; import json, sys; print(json.dumps([m for m in %r " \
+        "if m in sys.modules]))" % heavy_modules
+    out = subprocess.check_output([sys.executable, "-W", "ignore", "-c",
+                                   code])
+    return json.loads(out.decode().strip().split("\n")[-1])
+
+
+def test_lazy_import():
+    assert_equals(_get_imported_modules("import msaf"), [])
+
+    # The algorithms are only imported when used
+    imported = _get_imported_modules("import msaf.run")
+    assert "msaf.run" in imported
+    assert "msaf.algorithms.foote" not in imported
+    assert "pylab" not in imported
+    imported = _get_imported_modules(
+        "import msaf; msaf.run.get_boundaries_module('foote')")
+    assert "msaf.algorithms.foote" in imported
+    assert "pylab" not in imported
+
+    # Their metadata does not import their segmenters
+    imported = _get_imported_modules(
+        "import msaf; msaf.io.get_all_boundary_algorithms(); "
+        "msaf.io.get_configuration('hpcp', False, False, 'foote', 'fmc2d')")
+    assert "msaf.algorithms.foote.segmenter" not in imported
+    assert "msaf.algorithms.fmc2d.segmenter" not in imported
+
+
+def test_lazy_attributes():
+    assert isinstance(msaf.io, ModuleType)
+    assert msaf.io is msaf.input_output
+    assert msaf.process is msaf.run.process
+    assert msaf.process_signal is msaf.run.process_signal
+    assert "featextract" in dir(msaf)
+    assert "foote" in dir(msaf.algorithms)
+    assert isinstance(msaf.algorithms.foote, ModuleType)
+    assert_raises(AttributeError, getattr, msaf, "fake_name_module")
+    assert_raises(AttributeError, getattr, msaf.algorithms,
+                  "fake_name_module")
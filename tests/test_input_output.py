@@ -8,8 +8,11 @@ import glob
 import json
 import librosa
 from nose.tools import nottest, eq_, raises, assert_equals
+import numpy as np
 import numpy.testing as npt
 import os
+import scipy.io.wavfile
+import shutil
 
 # Msaf imports
 import msaf
@@ -27,6 +30,146 @@ def test_get_features():
     pass
 
 
+def test_features_store():
+    # Small set of fake features
+    n_frames, n_beats = 40, 10
+    feats = {"metadata": {"version": {"librosa": librosa.__version__}},
+             "analysis": {"dur": 2.0, "sample_rate": sr},
+             "timestamp": "2015/01/01 00:00:00",
+             "beats": {"times": np.linspace(0, 2, n_beats)},
+             "framesync": {"hpcp": np.random.random((n_frames, 12))},
+             "est_beatsync": {"hpcp": np.random.random((n_beats, 12))}}
+
+    # Legacy JSON file
+    json_file = "tmp" + msaf.Dataset.legacy_features_ext
+    store_file = "tmp" + msaf.Dataset.features_ext
+    with open(json_file, "w") as f:
+        json.dump({"metadata": feats["metadata"],
+                   "analysis": feats["analysis"],
+                   "timestamp": feats["timestamp"],
+                   "beats": {"times": feats["beats"]["times"].tolist()},
+                   "framesync": {"hpcp": feats["framesync"]["hpcp"].tolist()},
+                   "est_beatsync": {
+                       "hpcp": feats["est_beatsync"]["hpcp"].tolist()}}, f)
+
+    # Falls back to the legacy file if the store doesn't exist
+    assert msaf.io.features_exist(store_file)
+    assert msaf.io.resolve_features_file(store_file) == json_file
+    eq_(msaf.io.get_duration(store_file), 2.0)
+
+    # Convert it to a binary store
+    out_dir = msaf.io.convert_features_file(json_file, remove=True)
+    eq_(out_dir, store_file)
+    assert os.path.isdir(store_file) and not os.path.isfile(json_file)
+
+    # Read it back
+    read_feats = msaf.io.read_features_file(store_file)
+    eq_(read_feats["analysis"], feats["analysis"])
+    eq_(msaf.io.get_duration(store_file), 2.0)
+    npt.assert_almost_equal(read_feats["beats"]["times"],
+                            feats["beats"]["times"])
+    npt.assert_almost_equal(read_feats["framesync"]["hpcp"],
+                            feats["framesync"]["hpcp"])
+    npt.assert_almost_equal(read_feats["est_beatsync"]["hpcp"],
+                            feats["est_beatsync"]["hpcp"])
+    assert "ann_beatsync" not in read_feats
+
+    # Memory-maps can be modified without touching the store
+    read_feats["framesync"]["hpcp"][:] = 0
+    read_feats = msaf.io.read_features_file(store_file)
+    npt.assert_almost_equal(read_feats["framesync"]["hpcp"],
+                            feats["framesync"]["hpcp"])
+
+    # The store is written in the configured precision
+    msaf.Anal.dtype = "float32"
+    try:
+        msaf.io.write_features_store(store_file, feats)
+    finally:
+        msaf.Anal.dtype = "float64"
+    eq_(np.load(os.path.join(store_file, "framesync", "hpcp.npy")).dtype,
+        np.float32)
+
+    # But the beat times are always stored in double precision
+    read_feats = msaf.io.read_features_file(store_file)
+    eq_(read_feats["beats"]["times"].dtype, np.float64)
+    npt.assert_array_equal(read_feats["beats"]["times"],
+                           feats["beats"]["times"])
+
+    # Clean up
+    shutil.rmtree(store_file)
+
+
+def test_features_store_quantized():
+    feats = {"metadata": {"version": {"librosa": librosa.__version__}},
+             "analysis": {"dur": 2.0, "sample_rate": sr},
+             "timestamp": "2015/01/01 00:00:00",
+             "beats": {"times": np.linspace(0, 2, 10)},
+             "framesync": {"cqt": np.random.random((40, 84)) * 80 - 80,
+                           "mfcc": np.zeros((40, 14))}}
+    store_file = "tmp" + msaf.Dataset.features_ext
+    cqt_file = os.path.join(store_file, "framesync", "cqt")
+    storage = msaf.Dataset.features_storage
+    try:
+        for quantized_storage, decimal in [("float16", 1), ("uint8", 0)]:
+            msaf.Dataset.features_storage = quantized_storage
+            try:
+                msaf.io.write_features_store(store_file, feats)
+            finally:
+                msaf.Dataset.features_storage = storage
+            assert os.path.isfile(cqt_file + ".npz")
+            assert not os.path.isfile(cqt_file + ".npy")
+            read_feats = msaf.io.read_features_file(store_file)
+            npt.assert_almost_equal(read_feats["beats"]["times"],
+                                    feats["beats"]["times"])
+            for name in ["cqt", "mfcc"]:
+                values = read_feats["framesync"][name]
+                eq_(values.dtype, np.dtype(msaf.Anal.dtype))
+                npt.assert_almost_equal(values, feats["framesync"][name],
+                                        decimal=decimal)
+
+        # Updating with a different storage replaces the files
+        msaf.Dataset.features_storage = "float64"
+        msaf.io.update_features_store(
+            store_file, {"metadata": feats["metadata"],
+                         "analysis": feats["analysis"],
+                         "timestamp": feats["timestamp"],
+                         "framesync": {"cqt": feats["framesync"]["cqt"]}})
+        assert os.path.isfile(cqt_file + ".npy")
+        assert not os.path.isfile(cqt_file + ".npz")
+        read_feats = msaf.io.read_features_file(store_file)
+        npt.assert_array_equal(read_feats["framesync"]["cqt"],
+                               feats["framesync"]["cqt"])
+        assert "mfcc" in read_feats["framesync"]
+
+        msaf.Dataset.features_storage = "int4"
+        npt.assert_raises(ValueError, msaf.io.write_features_store,
+                          store_file, feats)
+    finally:
+        msaf.Dataset.features_storage = storage
+        for path in [store_file, store_file + ".tmp"]:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+
+def test_get_required_features():
+    assert_equals(msaf.io.get_required_features("cqt", "sf", None), ["cqt"])
+    assert_equals(msaf.io.get_required_features("hpcp", "gt", "fmc2d"),
+                  ["hpcp"])
+    assert_equals(msaf.io.get_required_features("cqt", "foote", "scluster"),
+                  ["hpcp", "mfcc", "cqt"])
+
+
+def test_npy_appender():
+    npy_file = "tmp.npy"
+    X = np.random.random((25, 7))
+    appender = msaf.io.NpyAppender(npy_file)
+    for i in range(0, len(X), 10):
+        appender.append(X[i:i + 10])
+    appender.close()
+    npt.assert_array_equal(np.load(npy_file), X)
+    os.remove(npy_file)
+
+
 def test_read_hier_references():
     one_jams = os.path.join("..", "datasets", "Sargon", "references",
                             "01-Sargon-Mindless.jams")
@@ -46,3 +189,77 @@ def test_read_hier_references():
     assert len(hier_bounds) == len(hier_labels) and \
         len(hier_labels) == len(hier_levels)
     assert len(hier_levels) == 3
+
+
+def test_lazy_features():
+    calls = []
+
+    def load_hpcp():
+        calls.append("hpcp")
+        return np.ones((10, 12))
+
+    features = msaf.io.LazyFeatures({"hpcp": load_hpcp}, beats=np.arange(3))
+    eq_(sorted(features.keys()), ["beats", "hpcp"])
+    assert not features.is_loaded("hpcp")
+    eq_(calls, [])
+
+    # Only loaded once
+    eq_(features["hpcp"].shape, (10, 12))
+    eq_(features["hpcp"].shape, (10, 12))
+    eq_(calls, ["hpcp"])
+    assert features.is_loaded("hpcp")
+
+    # Behaves like a regular dictionary
+    features["mfcc"] = np.zeros((10, 14))
+    eq_(len(features), 3)
+    del features["mfcc"]
+    assert "mfcc" not in features
+
+
+def test_get_feature_dtype():
+    section = {"hpcp": np.random.random((10, 12))}
+    eq_(msaf.io._get_feature(section, "hpcp").dtype, np.float64)
+    msaf.Anal.dtype = "float32"
+    try:
+        hpcp = msaf.io._get_feature(section, "hpcp", n_frames=5)
+    finally:
+        msaf.Anal.dtype = "float64"
+    eq_(hpcp.dtype, np.float32)
+    npt.assert_allclose(hpcp, section["hpcp"][:5], rtol=1e-6)
+
+
+def test_resample():
+    sr = 44100
+    y = np.sin(2 * np.pi * 440 * np.arange(sr) / float(sr)).astype(np.float32)
+    resample_type = msaf.Anal.resample_type
+
+    # The default resampler is the one of librosa.load
+    y_hat = msaf.io.resample(y, sr, 22050)
+    npt.assert_array_equal(y_hat, librosa.resample(y, orig_sr=sr,
+                                                   target_sr=22050))
+    wav_file = "tmp_resample.wav"
+    scipy.io.wavfile.write(wav_file, sr, (y * 2 ** 14).astype(np.int16))
+    try:
+        npt.assert_array_equal(msaf.io.load_audio(wav_file, 22050)[0],
+                               librosa.load(wav_file, sr=22050)[0])
+    finally:
+        os.remove(wav_file)
+
+    for res_type in ["kaiser_fast", "polyphase"]:
+        msaf.Anal.resample_type = res_type
+        try:
+            y_fast = msaf.io.resample(y, sr, 22050)
+        finally:
+            msaf.Anal.resample_type = resample_type
+        assert_equals(y_fast.dtype, np.float32)
+        assert_equals(y_fast.shape, y_hat.shape)
+        npt.assert_allclose(y_fast[1000:-1000], y_hat[1000:-1000], atol=1e-2)
+
+    # Arbitrary ratios
+    assert_equals(len(msaf.io.resample(y[:1001], sr, 22000)), 500)
+
+    msaf.Anal.resample_type = "unknown"
+    try:
+        npt.assert_raises(ValueError, msaf.io.resample, y, sr, 22050)
+    finally:
+        msaf.Anal.resample_type = resample_type
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import assert_equals
+import os
+import shutil
+import tempfile
+
+# Msaf imports
+import msaf
+from msaf import journal
+
+
+def test_get_journal_file():
+    journal_file = journal.get_journal_file("my_dataset")
+    assert_equals(journal_file, os.path.join(
+        "my_dataset", msaf.Dataset.estimations_dir, msaf.Dataset.journal_file))
+
+
+def test_get_config_hash():
+    params = {"boundaries_id": "sf", "config": {"M_gaussian": 27}}
+    config_hash = journal.get_config_hash(params)
+    assert_equals(len(config_hash), 16)
+
+    # Independent of the order of the keys
+    assert_equals(config_hash, journal.get_config_hash(
+        {"config": {"M_gaussian": 27}, "boundaries_id": "sf"}))
+
+    # Any change in the parameters changes the hash
+    assert config_hash != journal.get_config_hash(
+        {"boundaries_id": "sf", "config": {"M_gaussian": 28}})
+
+
+def test_journal():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        journal_file = os.path.join(tmp_dir, "journal.jsonl")
+
+        # Missing journal
+        assert_equals(journal.read_journal(journal_file), {})
+
+        journal.append_entry(journal_file, "a.mp3", "sf", None, "hash",
+                             journal.FAILED, 1., error="Traceback")
+        journal.append_entry(journal_file, "b.mp3", "sf", None, "hash",
+                             journal.DONE, 2.)
+        journal.append_entry(journal_file, "a.mp3", "sf", None, "hash",
+                             journal.DONE, 3.)
+        journal.append_entry(journal_file, "a.mp3", "foote", None, "hash",
+                             journal.FAILED, 4.)
+
+        # Truncated line (e.g., the run died while writing it)
+        with open(journal_file, "a") as f:
+            f.write('{"track": "c.mp3", "bound')
+
+        entries = journal.read_journal(journal_file)
+        assert_equals(len(entries), 3)
+
+        # The last entry of each track is kept
+        entry = entries[journal.get_key("a.mp3", "sf", None, "hash")]
+        assert_equals(entry["status"], journal.DONE)
+        assert_equals(entry["time"], 3.)
+        assert "error" not in entry
+        entry = entries[journal.get_key("a.mp3", "foote", None, "hash")]
+        assert_equals(entry["status"], journal.FAILED)
+        assert journal.get_key("c.mp3", "sf", None, "hash") not in entries
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import assert_raises, assert_equals
+import numpy as np
+
+# Msaf imports
+import msaf
+from msaf.algorithms import registry
+
+# Global vars
+fake_module_name = "fake_name_module"
+
+
+def test_builtin_algorithms():
+    algo_ids = registry.get_algorithm_ids()
+    assert_equals(algo_ids, sorted(msaf.algorithms.__all__))
+    for algo_id in algo_ids:
+        metadata = registry.get_metadata(algo_id)
+        module = registry.get_module(algo_id)
+        assert module is getattr(msaf.algorithms, algo_id)
+        assert metadata["config"] is module.config
+        assert_equals(metadata["is_boundary_type"], module.is_boundary_type)
+        assert_equals(metadata["is_label_type"], module.is_label_type)
+        assert_equals(metadata["supports_hier"],
+                      "processHierarchical" in vars(module.Segmenter))
+
+    # The metadata is only read once, and the configs are copied
+    assert registry.get_metadata("sf") is registry.get_metadata("sf")
+    config = registry.get_config("sf")
+    config["M_gaussian"] = -1
+    assert registry.get_config("sf")["M_gaussian"] != -1
+
+    # Non-existent algorithms
+    assert_raises(RuntimeError, registry.get_metadata, fake_module_name)
+    assert_raises(RuntimeError, registry.get_module, fake_module_name)
+    assert_raises(AttributeError, getattr, msaf.algorithms, fake_module_name)
+
+
+def test_register():
+    # Algorithm living outside of msaf.algorithms, with a separate config
+    registry.register("my_algo", "msaf.algorithms.example.segmenter",
+                      "msaf.algorithms.example.config")
+    try:
+        assert "my_algo" in msaf.io.get_all_boundary_algorithms()
+        assert "my_algo" not in msaf.io.get_all_label_algorithms()
+        metadata = registry.get_metadata("my_algo")
+        assert_equals(metadata["required_features"], [])
+        assert_equals(metadata["ssm_memory_factor"], 0)
+        assert_equals(msaf.io.get_configuration(
+            "hpcp", False, False, "my_algo", None)["my_param1"], 1.0)
+        module = msaf.run.get_boundaries_module("my_algo")
+        assert module is msaf.algorithms.my_algo
+        assert hasattr(module, "Segmenter")
+        assert_raises(RuntimeError, msaf.run.get_labels_module, "my_algo")
+
+        # Dispatch
+        audio = np.random.RandomState(0).randn(22050 * 10) * 0.1
+        est_times, est_labels, _ = msaf.run.process_signal(
+            audio, 22050, boundaries_id="my_algo", labels_id=None)
+        ref_times, ref_labels, _ = msaf.run.process_signal(
+            audio, 22050, boundaries_id="example", labels_id=None)
+        assert np.array_equal(est_times, ref_times)
+    finally:
+        registry.unregister("my_algo")
+    assert "my_algo" not in msaf.io.get_all_boundary_algorithms()
+    assert_raises(RuntimeError, msaf.run.get_boundaries_module, "my_algo")
+
+
+def test_supports_hier():
+    audio = np.random.RandomState(0).randn(22050 * 10) * 0.1
+    assert_raises(RuntimeError, msaf.run.process_signal, audio, 22050,
+                  boundaries_id="foote", hier=True)
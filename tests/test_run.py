@@ -4,13 +4,19 @@
 # cd tests/
 # nosetests
 
-from nose.tools import assert_raises
+from nose.tools import assert_raises, assert_equals
 from types import ModuleType
+import numpy as np
+import json
+import librosa
 import numpy.testing as npt
 import os
+import shutil
+import tempfile
 
 # Msaf imports
 import msaf
+from msaf import journal, scheduling
 
 # Global vars
 audio_file = os.path.join("fixtures", "chirp.mp3")
@@ -133,3 +139,240 @@ def test_run_algorithms():
             continue
         for label_id in label_ids:
             yield (_test_run_msaf, bound_id, label_id)
+
+
+def test_float32_algorithms():
+    # Factorization buffers follow the precision of the data
+    X = np.random.random((12, 50)).astype(np.float32)
+    F, G = msaf.algorithms.cnmf.segmenter.cnmf(X, 3, niter=10)
+    assert_equals(F.dtype, np.float32)
+    assert_equals(G.dtype, np.float32)
+
+    # The self-similarity matrices keep the precision of the features
+    S = msaf.algorithms.foote.segmenter.compute_ssm(X.T)
+    assert_equals(S.dtype, np.float32)
+    A = msaf.algorithms.scluster.main.self_similarity(X, k=3)
+    assert_equals(A.dtype, np.float32)
+
+    # Features are converted when running the algorithms
+    features = {"hpcp": np.random.random((50, 12)), "beats": np.arange(50)}
+    msaf.Anal.dtype = "float32"
+    try:
+        segmenter = msaf.algorithms.sf.segmenter.Segmenter(
+            audio_file, features=features,
+            **msaf.algorithms.sf.config)
+        assert_equals(segmenter._preprocess().dtype, np.float32)
+    finally:
+        msaf.Anal.dtype = "float64"
+
+
+def _synthetic_track():
+    """Synthetic track: chords changing every 5 seconds, with kicks at 120
+    bpm."""
+    sr = 22050
+    t = np.arange(20 * sr) / float(sr)
+    audio = np.zeros(len(t))
+    for i, f0 in enumerate([220, 330, 262, 196]):
+        section = (t >= 5 * i) & (t < 5 * (i + 1))
+        for ratio in [1, 1.25, 1.5]:
+            audio[section] += 0.1 * np.sin(2 * np.pi * f0 * ratio * t[section])
+    rng = np.random.RandomState(0)
+    for beat in np.arange(0.25, 20, 0.5):
+        start = int(beat * sr)
+        audio[start:start + 1000] += 0.5 * np.exp(-np.arange(1000) / 200.) * \
+            rng.randn(1000)
+    return audio, sr
+
+
+def test_process_signal():
+    audio, sr = _synthetic_track()
+    est_times, est_labels, features = msaf.run.process_signal(
+        audio, sr, boundaries_id="foote", labels_id=None)
+    assert_equals(features["hpcp"].shape[1], 12)
+    assert "mfcc" not in features
+    npt.assert_almost_equal(est_times[0], 0.0, decimal=2)
+    npt.assert_almost_equal(est_times[-1], 20.0, decimal=1)
+    assert_equals(len(est_times) - 1, len(est_labels))
+
+    # Features are reused, and computed again if any is missing
+    est_times2, est_labels2, features2 = msaf.run.process_signal(
+        audio, sr, boundaries_id="foote", labels_id=None, features=features)
+    assert features2 is features
+    npt.assert_array_equal(est_times, est_times2)
+    est_times3, est_labels3, features3 = msaf.run.process_signal(
+        audio, sr, feature="mfcc", framesync=True, boundaries_id="foote",
+        labels_id=None, features=features)
+    assert "mfcc" in features3
+    npt.assert_almost_equal(est_times3[-1], 20.0, decimal=1)
+
+    # No ground truth for signals
+    assert_raises(RuntimeError, msaf.run.process_signal, audio, sr,
+                  boundaries_id="gt")
+
+
+def test_process_resume():
+    # Dataset with a valid track and a corrupted one
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        audio_dir = os.path.join(tmp_dir, msaf.Dataset.audio_dir)
+        msaf.utils.ensure_dir(audio_dir)
+        audio, sr = _synthetic_track()
+        librosa.output.write_wav(os.path.join(audio_dir, "track.wav"),
+                                 audio.astype(np.float32), sr)
+        with open(os.path.join(audio_dir, "corrupted.wav"), "w") as f:
+            f.write("Not a wav file")
+        journal_file = journal.get_journal_file(tmp_dir)
+
+        def _process(results, **kwargs):
+            for result in msaf.run.iter_process(
+                    tmp_dir, boundaries_id="foote", labels_id=None, n_jobs=1,
+                    **kwargs):
+                results.append(result)
+
+        def _read_journal():
+            with open(journal_file) as f:
+                return [(entry["track"], entry["status"])
+                        for entry in map(json.loads, f)]
+
+        # Failed tracks do not stop the run, and are recorded in the journal
+        results = []
+        assert_raises(RuntimeError, _process, results)
+        assert_equals(len(results), 1)
+        assert_equals(sorted(_read_journal()),
+                      [("corrupted.wav", journal.FAILED),
+                       ("track.wav", journal.DONE)])
+
+        # Resuming only retries the failed track, and reads the estimations
+        # of the completed one
+        resumed_results = []
+        assert_raises(RuntimeError, _process, resumed_results, resume=True)
+        assert_equals(len(resumed_results), 1)
+        npt.assert_almost_equal(resumed_results[0][1], results[0][1],
+                                decimal=3)
+        assert_equals(_read_journal()[2:],
+                      [("corrupted.wav", journal.FAILED)])
+
+        # Runs with other parameters are not resumed
+        assert_raises(RuntimeError, _process, [], feature="mfcc",
+                      resume=True)
+        assert_equals(sorted(_read_journal()[3:]),
+                      [("corrupted.wav", journal.FAILED),
+                       ("track.wav", journal.DONE)])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_process_skip_estimated():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        audio_dir = os.path.join(tmp_dir, msaf.Dataset.audio_dir)
+        msaf.utils.ensure_dir(audio_dir)
+        audio, sr = _synthetic_track()
+        librosa.output.write_wav(os.path.join(audio_dir, "track.wav"),
+                                 audio.astype(np.float32), sr)
+        file_struct = msaf.io.FileStruct(os.path.join(audio_dir, "track.wav"))
+        est_times, est_labels = msaf.run.process(
+            tmp_dir, boundaries_id="foote", labels_id=None, n_jobs=1)[0]
+        feat_names = msaf.io.get_required_features("hpcp", "foote", None)
+        fingerprint = msaf.io.get_features_fingerprint(
+            file_struct.features_file, feat_names)
+        assert fingerprint is not None
+
+        # The saved estimations are reused, without writing them again
+        os.utime(file_struct.est_file, (0, 0))
+        est_times2, est_labels2 = msaf.run.process(
+            tmp_dir, boundaries_id="foote", labels_id=None, n_jobs=1,
+            skip_estimated=True)[0]
+        npt.assert_almost_equal(est_times2, est_times, decimal=3)
+        assert_equals(len(est_labels2), len(est_labels))
+        assert_equals(os.path.getmtime(file_struct.est_file), 0)
+
+        # But not if they were computed with other parameters or features
+        msaf.run.process(tmp_dir, boundaries_id="foote", labels_id=None,
+                         n_jobs=1, framesync=True, skip_estimated=True)
+        assert os.path.getmtime(file_struct.est_file) > 0
+        os.utime(file_struct.est_file, (0, 0))
+
+        # Adding features that the algorithms do not use keeps them valid
+        msaf.featextract.compute_all_features(file_struct,
+                                              feat_names=["cqt"])
+        assert "cqt" not in feat_names
+        assert_equals(msaf.io.get_features_fingerprint(
+            file_struct.features_file, feat_names), fingerprint)
+        msaf.run.process(tmp_dir, boundaries_id="foote", labels_id=None,
+                         n_jobs=1, skip_estimated=True)
+        assert_equals(os.path.getmtime(file_struct.est_file), 0)
+
+        # Unlike computing again the features they use
+        hpcp_file = os.path.join(file_struct.features_file, "est_beatsync",
+                                 "hpcp.npy")
+        np.save(hpcp_file, np.load(hpcp_file)[::-1])
+        assert msaf.io.get_features_fingerprint(
+            file_struct.features_file, feat_names) != fingerprint
+        msaf.run.process(tmp_dir, boundaries_id="foote", labels_id=None,
+                         n_jobs=1, skip_estimated=True)
+        assert os.path.getmtime(file_struct.est_file) > 0
+
+        # Same in single file mode
+        os.utime(file_struct.est_file, (0, 0))
+        est_times3, est_labels3 = msaf.run.process(
+            file_struct.audio_file, boundaries_id="foote", labels_id=None,
+            skip_estimated=True)
+        npt.assert_almost_equal(est_times3, est_times, decimal=3)
+        assert_equals(os.path.getmtime(file_struct.est_file), 0)
+        msaf.run.process(file_struct.audio_file, boundaries_id="foote",
+                         labels_id=None, feature="mfcc", skip_estimated=True)
+        assert os.path.getmtime(file_struct.est_file) > 0
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_process_algorithms():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        audio_dir = os.path.join(tmp_dir, msaf.Dataset.audio_dir)
+        msaf.utils.ensure_dir(audio_dir)
+        audio, sr = _synthetic_track()
+        librosa.output.write_wav(os.path.join(audio_dir, "track.wav"),
+                                 audio.astype(np.float32), sr)
+        algorithms = [("foote", None, None), ("cnmf", None, None),
+                      ("foote", "fmc2d", None)]
+
+        # The duration of the track is read only once for all the algorithms
+        get_cost = scheduling.get_cost
+        calls = []
+        scheduling.get_cost = lambda file_struct: \
+            calls.append(file_struct) or get_cost(file_struct)
+        try:
+            results = msaf.run.process_algorithms(tmp_dir, algorithms,
+                                                  n_jobs=1)
+        finally:
+            scheduling.get_cost = get_cost
+        assert_equals(len(calls), 1)
+        assert_equals(len(results), 1)
+        assert_equals(len(results[0]), len(algorithms))
+
+        # All the estimations are saved in the estimations file, and they are
+        # the same as running each combination separately
+        file_struct = msaf.io.FileStruct(os.path.join(audio_dir, "track.wav"))
+        for (bound_id, label_id, config), (est_times, est_labels) in \
+                zip(algorithms, results[0]):
+            config = msaf.io.get_configuration("hpcp", False, False,
+                                               bound_id, label_id)
+            config["hier"] = False
+            params = dict(config)
+            params.pop("features", None)
+            est_inters, _ = msaf.io.read_estimations(
+                file_struct.est_file, bound_id, label_id, **params)
+            npt.assert_almost_equal(
+                msaf.utils.intervals_to_times(est_inters), est_times,
+                decimal=3)
+            if bound_id == "cnmf":
+                # Random initialization
+                continue
+            est_times2, est_labels2 = msaf.run.process_track(
+                file_struct, bound_id, label_id, config)
+            npt.assert_almost_equal(est_times, est_times2, decimal=3)
+            npt.assert_array_equal(est_labels, est_labels2)
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+import numpy as np
+import numpy.testing as npt
+import os
+from nose.tools import assert_equals
+import scipy.io.wavfile
+import shutil
+import time
+
+# Msaf imports
+import msaf
+import msaf.scheduling
+from msaf.input_output import FileStruct
+
+# Global vars
+tmp_dir = "tmp_scheduling"
+durs = [1., 3., 0.5, 2.]
+
+
+def _make_file_structs():
+    """Writes silent audio files with the durations of `durs`."""
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    file_structs = []
+    for i, dur in enumerate(durs):
+        audio_file = os.path.join(tmp_dir, "track%d.wav" % i)
+        scipy.io.wavfile.write(audio_file, 8000,
+                               np.zeros(int(dur * 8000), dtype=np.int16))
+        file_structs.append(FileStruct(audio_file))
+    return file_structs
+
+
+def test_sort_longest_first():
+    try:
+        file_structs = _make_file_structs()
+        assert_equals(msaf.scheduling.sort_longest_first(file_structs),
+                      [1, 3, 0, 2])
+
+        # Unreadable files go last
+        file_structs.insert(0, FileStruct(os.path.join(tmp_dir, "no.wav")))
+        assert_equals(msaf.scheduling.get_cost(file_structs[0]), 0.)
+        assert_equals(msaf.scheduling.sort_longest_first(file_structs),
+                      [2, 4, 1, 3, 0])
+
+        # Known costs are used instead of reading the headers again
+        assert_equals(msaf.scheduling.sort_longest_first(
+            file_structs, [5., 1., 2., 3., 4.]), [0, 4, 3, 2, 1])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_run_longest_first():
+    try:
+        file_structs = _make_file_structs()
+        for n_jobs in [1, 2]:
+            # Results are in the original order
+            results = msaf.scheduling.run_longest_first(
+                getattr, file_structs, n_jobs, args=("audio_file",))
+            assert_equals(results, [file_struct.audio_file
+                                    for file_struct in file_structs])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _sleep(file_struct, dur):
+    """Sleeps, and returns the time interval of the sleep."""
+    start_time = time.time()
+    time.sleep(dur)
+    return start_time, time.time()
+
+
+def test_run_longest_first_memory():
+    memory_budget = msaf.Resources.memory_budget
+    msaf.Resources.memory_budget = 3
+    try:
+        file_structs = _make_file_structs()
+
+        # The longest track (1) takes the whole budget, and runs alone,
+        # like track 2 that exceeds it
+        intervals = msaf.scheduling.run_longest_first(
+            _sleep, file_structs, 4, args=(0.2,), memory=[1, 3, 5, 2])
+        for i in [1, 2]:
+            for j in range(len(durs)):
+                if j != i:
+                    assert intervals[j][1] <= intervals[i][0] or \
+                        intervals[i][1] <= intervals[j][0]
+
+        # Shorter tracks do not keep a track that exceeds the budget (3)
+        # waiting: it starts as soon as the running one (1) finishes
+        intervals = msaf.scheduling.run_longest_first(
+            _sleep, file_structs, 4, args=(0.2,), memory=[1, 1, 1, 5])
+        for j in [0, 1, 2]:
+            assert intervals[j][1] <= intervals[3][0] or \
+                intervals[3][1] <= intervals[j][0]
+        for j in [0, 2]:
+            assert intervals[3][1] <= intervals[j][0]
+
+        # Estimates are only computed when the jobs are about to be admitted
+        estimated = {}
+
+        def estimate(i):
+            assert i not in estimated
+            estimated[i] = time.time()
+            return 1
+
+        intervals = msaf.scheduling.run_longest_first(
+            _sleep, file_structs, 2, args=(0.2,), memory=estimate)
+        assert_equals(sorted(estimated), [0, 1, 2, 3])
+        for i in [0, 2]:
+            assert estimated[i] >= min(intervals[1][1], intervals[3][1])
+
+        # Errors are raised
+        npt.assert_raises(AttributeError, msaf.scheduling.run_longest_first,
+                          getattr, file_structs, 2, args=("no_attr",),
+                          memory=[1, 1, 1, 1])
+    finally:
+        msaf.Resources.memory_budget = memory_budget
+        shutil.rmtree(tmp_dir)
+
+
+def _crash(file_struct):
+    """Kills the process of the job, like running out of memory would."""
+    os._exit(1)
+
+
+def _unpicklable(file_struct):
+    """Returns a result that can not be sent back to the parent process."""
+    return lambda: file_struct
+
+
+def test_run_longest_first_failures():
+    try:
+        file_structs = _make_file_structs()
+
+        # Dead processes and results that can not be pickled raise errors
+        # instead of hanging the run
+        npt.assert_raises(RuntimeError, msaf.scheduling.run_longest_first,
+                          _crash, file_structs, 2)
+        npt.assert_raises(Exception, msaf.scheduling.run_longest_first,
+                          _unpicklable, file_structs, 2)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_estimate_memory():
+    base = msaf.scheduling.JOB_BASE_MEMORY
+    assert_equals(msaf.scheduling.estimate_segmentation_memory(100, [None]),
+                  base)
+    assert_equals(msaf.scheduling.estimate_segmentation_memory(
+        100, ["foote", "gt"]),
+        base + msaf.algorithms.foote.ssm_memory_factor * 100 ** 2 * 8)
+    assert msaf.scheduling.estimate_segmentation_memory(
+        100, ["foote", "scluster"]) > \
+        msaf.scheduling.estimate_segmentation_memory(100, ["foote"])
+    assert msaf.scheduling.estimate_extraction_memory(60) > \
+        msaf.scheduling.estimate_extraction_memory(30) > base
+
+
+def test_get_utilization():
+    assert_equals(msaf.scheduling.get_n_workers(4, 2), 2)
+    assert_equals(msaf.scheduling.get_n_workers(2, 10), 2)
+    assert msaf.scheduling.get_n_workers(-1, 1000) >= 1
+    assert_equals(msaf.scheduling.get_utilization([2., 2.], 2, 2.), 1.)
+    assert_equals(msaf.scheduling.get_utilization([3., 1.], 2, 4.), 0.5)
+    assert_equals(msaf.scheduling.get_utilization([], 2, 0.), 1.)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import assert_raises, assert_equals
+import json
+import numpy as np
+import numpy.testing as npt
+import multiprocessing
+import os
+import scipy.io.wavfile
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# Msaf imports
+import msaf
+from msaf import server
+
+
+def _synthetic_audio(sr=22050, dur=15):
+    """Synthetic track: three sections with different chords."""
+    t = np.arange(dur * sr) / float(sr)
+    audio = np.zeros(len(t))
+    for i, f0 in enumerate([220, 330, 262]):
+        section = (t >= 5 * i) & (t < 5 * (i + 1))
+        audio[section] += 0.3 * np.sin(2 * np.pi * f0 * t[section])
+    audio += 0.05 * np.random.RandomState(0).randn(len(t))
+    return audio.astype(np.float32), sr
+
+
+def _post(url, body, content_type="application/json"):
+    """Posts a request, and returns the code and JSON data of the
+    response."""
+    try:
+        response = urlopen(Request(url, body, {"Content-Type": content_type}))
+    except HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8"))
+    return response.getcode(), json.loads(response.read().decode("utf-8"))
+
+
+def test_parse_request():
+    # JSON
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+    request = server.parse_request(
+        "", "application/json",
+        json.dumps({"path": __file__, "boundaries_id": "foote",
+                    "framesync": True}).encode("utf-8"), root_dir)
+    assert_equals(request["path"], os.path.join(root_dir, __file__))
+    assert_equals(request["boundaries_id"], "foote")
+    assert request["framesync"]
+    assert_equals(request["labels_id"], msaf.DEFAULT_LABEL_ID)
+    assert request["audio"] is None
+
+    # PCM samples, interleaved
+    samples = np.arange(8, dtype=np.int16)
+    request = server.parse_request(
+        "sr=44100&dtype=int16&channels=2&labels_id=none&hier=false",
+        "application/octet-stream", samples.tobytes())
+    assert_equals(request["sr"], 44100)
+    npt.assert_array_equal(request["audio"], [[0, 2, 4, 6], [1, 3, 5, 7]])
+    assert request["labels_id"] is None
+    assert not request["hier"]
+
+    # Invalid requests
+    pcm = "application/octet-stream"
+    assert_raises(ValueError, server.parse_request, "", pcm, b"\0" * 8)
+    assert_raises(ValueError, server.parse_request, "sr=1&dtype=int16", pcm,
+                  b"\0" * 3)
+    for query in ["sr=1&channels=0", "sr=0", "sr=-1", "sr=fast",
+                  "sr=1&channels=two", "sr=1&dtype=fake"]:
+        assert_raises(ValueError, server.parse_request, query, pcm, b"\0" * 8)
+    assert_raises(ValueError, server.parse_request, "sr=1&boundaries_id=gt",
+                  pcm, b"\0" * 8)
+    assert_raises(ValueError, server.parse_request, "sr=1&hier=1&"
+                  "boundaries_id=foote", pcm, b"\0" * 8)
+    assert_raises(ValueError, server.parse_request, "sr=1&fake=1", pcm,
+                  b"\0" * 8)
+    assert_raises(ValueError, server.parse_request, "", "application/json",
+                  b"{")
+    assert_raises(ValueError, server.parse_request, "", "application/json",
+                  b'{"path": "fake_file.wav"}', root_dir)
+
+    # Only the files under the root directory can be read
+    body = json.dumps({"path": os.path.basename(__file__)}).encode("utf-8")
+    assert_equals(server.parse_request("", "application/json", body,
+                                       root_dir)["path"],
+                  os.path.join(root_dir, os.path.basename(__file__)))
+    assert_raises(ValueError, server.parse_request, "", "application/json",
+                  body)
+    for path in [os.path.join("..", "setup.py"),
+                 os.path.abspath(os.path.join("..", "setup.py"))]:
+        assert_raises(ValueError, server.parse_request, "",
+                      "application/json",
+                      json.dumps({"path": path}).encode("utf-8"), root_dir)
+    assert_raises(ValueError, server.parse_request, "sr=1&labels_id=fake",
+                  pcm, b"\0" * 8)
+
+
+def test_server():
+    audio, sr = _synthetic_audio()
+    tmp_dir = tempfile.mkdtemp()
+    audio_file = os.path.join(tmp_dir, "track.wav")
+    scipy.io.wavfile.write(audio_file, sr, (audio * 30000).astype(np.int16))
+    s = server.SegmentationServer(("localhost", 0), n_workers=1,
+                                  preload=["foote"], root_dir=tmp_dir)
+    thread = threading.Thread(target=s.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        url = "http://localhost:%d" % s.server_address[1]
+        status = json.loads(urlopen(url + "/status").read().decode("utf-8"))
+        assert_equals(status["workers"], 1)
+        assert_equals(status["algorithms"], ["foote"])
+
+        # Samples, the second time from the cached features
+        est_times, est_labels, _ = msaf.run.process_signal(
+            audio, sr, boundaries_id="foote", labels_id=None)
+        for i in range(2):
+            code, result = _post(url + "/segment?sr=%d&boundaries_id=foote"
+                                 "&labels_id=none" % sr, audio.tobytes(),
+                                 "application/octet-stream")
+            assert_equals(code, 200)
+            npt.assert_almost_equal(result["boundaries"], est_times)
+            npt.assert_almost_equal(result["labels"], est_labels)
+        assert_equals(s.get_status()["cache_hits"], 1)
+
+        # Path to an audio file, with other algorithms
+        body = json.dumps({"path": audio_file, "boundaries_id": "foote",
+                           "labels_id": "cnmf"}).encode("utf-8")
+        code, result = _post(url + "/segment", body)
+        assert_equals(code, 200)
+        assert_equals(len(result["boundaries"]) - 1, len(result["labels"]))
+        npt.assert_almost_equal(result["boundaries"][-1], 15, decimal=1)
+        result2 = _post(url + "/segment", body)[1]
+        assert_equals(result["boundaries"], result2["boundaries"])
+        assert_equals(result["labels"], result2["labels"])
+        assert_equals(s.get_status()["cached_tracks"], 2)
+
+        # Errors
+        code, result = _post(url + "/segment", b'{"path": "fake_file.wav"}')
+        assert_equals(code, 400)
+        assert "error" in result
+        body = json.dumps({"path": os.path.abspath(__file__)}).encode("utf-8")
+        assert_equals(_post(url + "/segment", body)[0], 400)
+        assert_equals(_post(url + "/fake", b"{}")[0], 404)
+        assert_equals(s.get_status()["errors"], 2)
+    finally:
+        s.shutdown()
+        s.server_close()
+        shutil.rmtree(tmp_dir)
+
+
+def test_server_timeout():
+    audio, sr = _synthetic_audio()
+    s = server.SegmentationServer(("localhost", 0), n_workers=1,
+                                  preload=["foote"], segment_timeout=1e-3)
+    thread = threading.Thread(target=s.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        # Requests do not wait forever for their result
+        url = "http://localhost:%d" % s.server_address[1]
+        code, result = _post(url + "/segment?sr=%d&boundaries_id=foote"
+                             "&labels_id=none" % sr, audio.tobytes(),
+                             "application/octet-stream")
+        assert_equals(code, 503)
+        assert "error" in result
+        assert_equals(s.get_status()["timeouts"], 1)
+
+        # The process is not kept busy by the late job
+        s.segment_timeout = server.SEGMENT_TIMEOUT
+        code, result = _post(url + "/segment?sr=%d&boundaries_id=foote"
+                             "&labels_id=none" % sr, audio.tobytes(),
+                             "application/octet-stream")
+        assert_equals(code, 200)
+    finally:
+        s.shutdown()
+        s.server_close()
+
+
+def test_call_before_deadline():
+    assert_equals(server._call_before_deadline(time.time() + 10, max, 1, 2),
+                  2)
+    assert_raises(multiprocessing.TimeoutError, server._call_before_deadline,
+                  time.time() - 1, max, 1, 2)
+
+    # The process of a job that misses its deadline is terminated
+    process = multiprocessing.Process(
+        target=server._call_before_deadline,
+        args=(time.time() + 0.5, time.sleep, 60))
+    process.start()
+    process.join(30)
+    assert_equals(process.exitcode, -signal.SIGALRM)
+
+
+def test_cache_size():
+    s = server.SegmentationServer(("localhost", 0), n_workers=1, preload=[])
+    prev_max_size = msaf.Cache.server_max_size
+    msaf.Cache.server_max_size = 2000
+    try:
+        for i in range(3):
+            s.cache_features(i, {"hpcp": np.zeros(100), "anal": {}})
+        assert_equals(list(s.features), [1, 2])
+        assert s.get_cached_features(1) is not None
+        s.cache_features(3, {"hpcp": np.zeros(100)})
+        assert_equals(list(s.features), [1, 3])
+
+        # Features larger than the cache are not kept
+        s.cache_features(4, {"hpcp": np.zeros(1000)})
+        assert 4 not in s.features
+    finally:
+        msaf.Cache.server_max_size = prev_max_size
+        s.server_close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Run me as follows:
+# cd tests/
+# nosetests
+
+from nose.tools import assert_raises, assert_equals
+import librosa
+import numpy as np
+import numpy.testing as npt
+
+# Msaf imports
+import msaf
+from msaf import similarity
+
+# Global vars
+n_calls = [0]
+
+
+@similarity.memoize
+def _ssm(X, scale=1.):
+    n_calls[0] += 1
+    return scale * X.T.dot(X)
+
+
+def test_memoize():
+    X = np.random.RandomState(0).rand(12, 100)
+    n_calls[0] = 0
+
+    # No cache outside a track
+    _ssm(X)
+    _ssm(X)
+    assert_equals(n_calls[0], 2)
+
+    with similarity.track_cache():
+        S = _ssm(X)
+        assert_equals(n_calls[0], 3)
+
+        # Same matrix and arguments
+        assert _ssm(X.copy()) is S
+        assert_equals(n_calls[0], 3)
+        assert_equals(similarity.get_cache_size(), S.nbytes)
+
+        # Cached matrices can not be modified
+        assert_raises(ValueError, S.fill, 0)
+
+        # Other matrices or arguments
+        npt.assert_almost_equal(_ssm(X, scale=2.), 2 * S)
+        _ssm(X[:, :50])
+        assert_equals(n_calls[0], 5)
+
+    # The cache is cleared at the end of the track
+    assert_equals(similarity.get_cache_size(), 0)
+    _ssm(X)
+    assert_equals(n_calls[0], 6)
+
+
+def test_memoize_eviction():
+    X = np.random.RandomState(0).rand(12, 100)
+    n_calls[0] = 0
+    prev_max_size = msaf.Cache.ssm_max_size
+    msaf.Cache.ssm_max_size = int(2.5 * 100 * 100 * 8)
+    try:
+        with similarity.track_cache():
+            S = _ssm(X)
+            _ssm(X, scale=2.)
+            _ssm(X)  # Most recently used
+            _ssm(X, scale=3.)
+            assert_equals(n_calls[0], 3)
+            assert_equals(similarity.get_cache_size(), 2 * S.nbytes)
+
+            # The least recently used matrix was evicted
+            assert _ssm(X) is S
+            _ssm(X, scale=2.)
+            assert_equals(n_calls[0], 4)
+
+        # Disabled cache
+        msaf.Cache.ssm_max_size = 0
+        with similarity.track_cache():
+            _ssm(X)
+            _ssm(X)
+            assert_equals(n_calls[0], 6)
+    finally:
+        msaf.Cache.ssm_max_size = prev_max_size
+
+
+def test_recurrence_matrix():
+    X = np.random.RandomState(0).rand(12, 100)
+    with similarity.track_cache():
+        R = similarity.recurrence_matrix(X, k=5, sym=True)
+        assert similarity.recurrence_matrix(X, k=5, sym=True) is R
+        assert similarity.recurrence_matrix(X, k=6, sym=True) is not R
+    npt.assert_array_equal(R, librosa.segment.recurrence_matrix(X, k=5,
+                                                                sym=True))
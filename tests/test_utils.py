@@ -8,6 +8,7 @@ import glob
 import json
 import librosa
 from nose.tools import nottest, eq_, raises, assert_equals
+import numpy as np
 import numpy.testing as npt
 import os
 
@@ -32,3 +33,57 @@ def test_synchronize_labels():
                                                labels,
                                                N)
     assert len(new_labels) == len(new_bound_idxs) - 1
+
+
+def loop_chroma_to_tonnetz(C):
+    """Reference (loop-based) implementation of the Tonnetz transform."""
+    N = C.shape[0]
+    T = np.zeros((N, 6))
+
+    r1 = 1      # Fifths
+    r2 = 1      # Minor
+    r3 = 0.5    # Major
+
+    # Generate Transformation matrix
+    phi = np.zeros((6, 12))
+    for i in range(6):
+        for j in range(12):
+            if i % 2 == 0:
+                fun = np.sin
+            else:
+                fun = np.cos
+
+            if i < 2:
+                phi[i, j] = r1 * fun(j * 7 * np.pi / 6.)
+            elif i >= 2 and i < 4:
+                phi[i, j] = r2 * fun(j * 3 * np.pi / 2.)
+            else:
+                phi[i, j] = r3 * fun(j * 2 * np.pi / 3.)
+
+    # Do the transform to tonnetz
+    for i in range(N):
+        for d in range(6):
+            denom = float(C[i, :].sum())
+            if denom == 0:
+                T[i, d] = 0
+            else:
+                T[i, d] = 1 / denom * (phi[d, :] * C[i, :]).sum()
+
+    return T
+
+
+def test_chroma_to_tonnetz():
+    chroma = librosa.feature.chroma_stft(y=audio, sr=sr).T
+    chroma[:10] = 0  # Silent frames
+    tonnetz = msaf.utils.chroma_to_tonnetz(chroma)
+    assert_equals(tonnetz.shape, (chroma.shape[0], 6))
+    npt.assert_allclose(tonnetz, loop_chroma_to_tonnetz(chroma), atol=1e-12)
+    npt.assert_array_equal(tonnetz[:10], 0)
+
+    # Batch of chromagrams
+    chromas = np.random.random((3, 50, 12))
+    tonnetzs = msaf.utils.chroma_to_tonnetz(chromas)
+    assert_equals(tonnetzs.shape, (3, 50, 6))
+    for chroma, tonnetz in zip(chromas, tonnetzs):
+        npt.assert_allclose(tonnetz, loop_chroma_to_tonnetz(chroma),
+                            atol=1e-12)